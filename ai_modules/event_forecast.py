@@ -11,10 +11,17 @@ from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+from ai_modules.keyword_matcher import get_keyword_matcher
 from ai_modules.metrics import get_metrics
 
 logger = logging.getLogger("event_forecast")
 
+# Confidence indicators in event titles
+STRONG_POSITIVE_KEYWORDS = ["approval", "launch", "breakthrough", "success", "achievement"]
+STRONG_NEGATIVE_KEYWORDS = ["crisis", "crash", "hack", "scandal", "failure"]
+OFFICIAL_KEYWORDS = ["fomc", "ecb", "boe", "decision", "announcement", "policy"]
+CRYPTO_CONFIDENCE_KEYWORDS = ["upgrade", "merge", "listing", "partnership"]
+
 
 class ImpactType(Enum):
     """Enum for impact types."""
@@ -84,6 +91,18 @@ class EventForecastEngine:
             },
         }
 
+        # All keyword lists compiled once: one pass per text instead of one per keyword
+        groups = {
+            "strong_positive": STRONG_POSITIVE_KEYWORDS,
+            "strong_negative": STRONG_NEGATIVE_KEYWORDS,
+            "official": OFFICIAL_KEYWORDS,
+            "crypto_confidence": CRYPTO_CONFIDENCE_KEYWORDS,
+        }
+        for category, patterns in self.impact_patterns.items():
+            for kind, keywords in patterns.items():
+                groups[f"{category}:{kind}"] = keywords
+        self.keyword_matcher = get_keyword_matcher(groups)
+
         # Market reaction templates
         self.market_reactions = {
             ImpactType.POSITIVE: [
@@ -191,16 +210,11 @@ class EventForecastEngine:
         """Predict the impact of an event."""
         text = f"{title} {description}".lower()
 
-        # Get category-specific patterns
-        patterns = self.impact_patterns.get(category, {})
-        positive_keywords = patterns.get("positive_keywords", [])
-        negative_keywords = patterns.get("negative_keywords", [])
-        neutral_keywords = patterns.get("neutral_keywords", [])
-
-        # Count keyword matches
-        positive_score = sum(1 for keyword in positive_keywords if keyword in text)
-        negative_score = sum(1 for keyword in negative_keywords if keyword in text)
-        neutral_score = sum(1 for keyword in neutral_keywords if keyword in text)
+        # Count category-specific keyword matches
+        counts = self.keyword_matcher.count(text)
+        positive_score = counts.get(f"{category}:positive_keywords", 0)
+        negative_score = counts.get(f"{category}:negative_keywords", 0)
+        neutral_score = counts.get(f"{category}:neutral_keywords", 0)
 
         # Adjust scores based on importance
         positive_score *= 1 + importance
@@ -231,28 +245,23 @@ class EventForecastEngine:
             confidence += 0.1
 
         # Higher confidence for events with clear indicators
-        title_lower = title.lower()
+        counts = self.keyword_matcher.count(title.lower())
 
         # Strong positive indicators
-        strong_positive = ["approval", "launch", "breakthrough", "success", "achievement"]
-        if any(word in title_lower for word in strong_positive):
+        if counts["strong_positive"]:
             confidence += 0.1
 
         # Strong negative indicators
-        strong_negative = ["crisis", "crash", "hack", "scandal", "failure"]
-        if any(word in title_lower for word in strong_negative):
+        if counts["strong_negative"]:
             confidence += 0.1
 
         # Central bank or official decisions
-        official_keywords = ["fomc", "ecb", "boe", "decision", "announcement", "policy"]
-        if any(word in title_lower for word in official_keywords):
+        if counts["official"]:
             confidence += 0.1
 
         # Crypto-specific confidence boosters
-        if category == "crypto":
-            crypto_keywords = ["upgrade", "merge", "listing", "partnership"]
-            if any(word in title_lower for word in crypto_keywords):
-                confidence += 0.05
+        if category == "crypto" and counts["crypto_confidence"]:
+            confidence += 0.05
 
         return min(1.0, max(0.0, confidence))
 
@@ -0,0 +1,56 @@
+"""
+Feature schema for the self-tuning local predictor models.
+
+The collector writes these columns to the training dataset, the trainer fits
+the scaler and models on them and LocalPredictor extracts them at inference
+time. The order is part of the model: a scaler fitted on one column order
+silently produces garbage for another, so feature vectors are always built
+from this tuple and never from dict insertion order.
+
+Bump FEATURE_SCHEMA_VERSION whenever a column is added, removed, renamed or
+reordered; the version is stored in the model metadata next to the columns.
+"""
+
+from typing import Mapping, Sequence, Tuple
+
+import numpy as np
+
+FEATURE_SCHEMA_VERSION = 1
+
+FEATURE_COLUMNS: Tuple[str, ...] = (
+    "title_length",
+    "title_word_count",
+    "content_length",
+    "content_word_count",
+    "source_trust_score",
+    "category_crypto",
+    "category_tech",
+    "category_sports",
+    "category_world",
+    "category_markets",
+    "category_unknown",
+    "total_words",
+    "important_words_ratio",
+    "spam_words_ratio",
+    "title_important_words",
+    "title_spam_words",
+    "time_features",
+)
+
+
+def feature_matrix(rows: Sequence[Mapping[str, float]], columns: Sequence[str] = FEATURE_COLUMNS) -> np.ndarray:
+    """
+    Build an (N x F) feature matrix in schema order.
+
+    Missing features are filled with 0.0, as the trainer does with ``fillna(0)``;
+    keys that are not in the schema are ignored.
+
+    Args:
+        rows: Feature dictionaries, one per news item
+        columns: Column order (defaults to the current schema)
+
+    Returns:
+        float64 array of shape (len(rows), len(columns))
+    """
+    values = [[row.get(name, 0.0) for name in columns] for row in rows]
+    return np.array(values, dtype=np.float64).reshape(len(rows), len(columns))
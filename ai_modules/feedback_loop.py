@@ -3,23 +3,322 @@ Feedback Loop — анализ корреляций между параметр
 
 Использует существующие данные: digests.feedback_score, digests.feedback_count.
 Анализирует корреляции и автоматически корректирует параметры генерации.
+
+Статистика считается в FeedbackStats на накопителях (среднее, сумма квадратов
+отклонений и совместный момент по Уэлфорду) для каждого сегмента — общий,
+style, category, source. Новое наблюдение обновляет их за O(1), пакет
+сливается векторно (формулы Чана), а корреляции, средние и кривые калибровки
+по любому сегменту читаются из накопителей без пересчёта по всем строкам.
 """
 
+import bisect
 import logging
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping, Optional, Sequence, Tuple
 from datetime import datetime, timezone, timedelta
 import numpy as np
-from scipy import stats
 
 logger = logging.getLogger(__name__)
 
+FEATURES = ("importance", "credibility", "length")
+SEGMENT_FIELDS = ("style", "category", "source")
+OVERALL = ("*", "*")  # сегмент "все наблюдения"
+
+# Корзины кривых калибровки: оценки 0..1 по 0.1, длина - прежние диапазоны optimal_length
+_SCORE_EDGES = np.append(np.linspace(0.0, 0.9, 10), np.inf)
+BIN_EDGES = {
+    "importance": _SCORE_EDGES,
+    "credibility": _SCORE_EDGES,
+    "length": np.array([0, 300, 600, 900, 1500], dtype=np.float64),
+}
+
+SegmentKey = Tuple[str, str]
+
+
+def _number(value: Any, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def digest_observation(digest: Mapping[str, Any]) -> Tuple[Dict[str, float], Dict[str, str]]:
+    """
+    Параметры дайджеста для статистики обратной связи.
+
+    Returns:
+        (значения признаков FEATURES, значения полей сегментов SEGMENT_FIELDS)
+    """
+    # Получаем параметры из meta JSONB
+    meta = digest.get("meta") or {}
+    if isinstance(meta, str):
+        try:
+            meta = json.loads(meta)
+        except (json.JSONDecodeError, TypeError):
+            meta = {}
+
+    # Длина текста
+    content = digest.get("content", "") or digest.get("summary", "")
+    values = {
+        "importance": _number(meta.get("avg_importance"), 0.5),
+        "credibility": _number(meta.get("avg_credibility"), 0.5),
+        "length": len(content.split()) if content else 0,
+    }
+    segments = {
+        "style": digest.get("style") or "analytical",
+        "category": digest.get("category") or meta.get("category") or "unknown",
+        "source": digest.get("source") or meta.get("source") or "unknown",
+    }
+    return values, segments
+
+
+class FeedbackStats:
+    """
+    Накопители статистики обратной связи по сегментам.
+
+    Для каждого сегмента хранятся n, средние признаков и оценки, суммы квадратов
+    отклонений (M2) и совместные моменты признак x оценка, а также счётчики и
+    суммы по корзинам калибровки. Все массивы индексируются номером сегмента.
+
+    Example:
+        stats = FeedbackStats()
+        stats.add({"importance": 0.8, "credibility": 0.7, "length": 450}, 0.9, {"category": "crypto"})
+        stats.pearson("importance", ("category", "crypto"))
+    """
+
+    def __init__(
+        self,
+        features: Sequence[str] = FEATURES,
+        segment_fields: Sequence[str] = SEGMENT_FIELDS,
+        bin_edges: Optional[Mapping[str, np.ndarray]] = None,
+    ):
+        self.features = tuple(features)
+        self.segment_fields = tuple(segment_fields)
+        edges = BIN_EDGES if bin_edges is None else bin_edges
+        self.bin_edges = {name: np.asarray(edges[name], dtype=np.float64) for name in self.features if name in edges}
+        self._edge_lists = {name: edges.tolist() for name, edges in self.bin_edges.items()}
+
+        self.slots: Dict[SegmentKey, int] = {}
+        self._allocate(8)
+
+    def _allocate(self, capacity: int) -> None:
+        width = len(self.features)
+        old = (
+            {name: getattr(self, name) for name in ("n", "mean_x", "mean_y", "m2_x", "m2_y", "c_xy")}
+            if self.slots
+            else {}
+        )
+        self.n = np.zeros(capacity)
+        self.mean_x = np.zeros((capacity, width))
+        self.mean_y = np.zeros(capacity)
+        self.m2_x = np.zeros((capacity, width))
+        self.m2_y = np.zeros(capacity)
+        self.c_xy = np.zeros((capacity, width))
+        for name, values in old.items():
+            getattr(self, name)[: len(values)] = values
+
+        old_bins = getattr(self, "bins", {}) if self.slots else {}
+        # feature -> (сегменты x корзины x [count, sum признака, sum оценки])
+        self.bins = {name: np.zeros((capacity, len(edges) - 1, 3)) for name, edges in self.bin_edges.items()}
+        for name, values in old_bins.items():
+            self.bins[name][: len(values)] = values
+
+    def _slot(self, key: SegmentKey) -> int:
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = len(self.slots)
+            if slot == len(self.n):
+                self._allocate(2 * len(self.n))
+            self.slots[key] = slot
+        return slot
+
+    def _segment_keys(self, segments: Mapping[str, Any]) -> List[SegmentKey]:
+        return [OVERALL] + [(field, str(segments.get(field) or "unknown")) for field in self.segment_fields]
+
+    def _bin(self, name: str, values: np.ndarray) -> np.ndarray:
+        """Номер корзины для каждого значения (-1 - вне диапазона)."""
+        edges = self.bin_edges[name]
+        index = np.searchsorted(edges, values, side="right") - 1
+        return np.where((index >= 0) & (index < len(edges) - 1), index, -1)
+
+    def add(self, values: Mapping[str, float], score: float, segments: Mapping[str, Any]) -> None:
+        """Добавляет одно наблюдение: O(1) - одно обновление Уэлфорда для всех сегментов сразу."""
+        x = np.array([float(values.get(name, 0.0)) for name in self.features])
+        y = float(score)
+        # Ключи сегментов различны, поэтому fancy-индексация обновляет каждую строку ровно раз
+        slots = np.array([self._slot(key) for key in self._segment_keys(segments)])
+
+        n = self.n[slots] + 1
+        dx = x - self.mean_x[slots]
+        dy = y - self.mean_y[slots]
+        mean_x = self.mean_x[slots] + dx / n[:, None]
+        mean_y = self.mean_y[slots] + dy / n
+        self.m2_x[slots] += dx * (x - mean_x)
+        self.c_xy[slots] += dx * (y - mean_y)[:, None]
+        self.m2_y[slots] += dy * (y - mean_y)
+        self.mean_x[slots] = mean_x
+        self.mean_y[slots] = mean_y
+        self.n[slots] = n
+
+        for i, name in enumerate(self.features):
+            if name not in self.bin_edges:
+                continue
+            edges = self._edge_lists[name]
+            index = bisect.bisect_right(edges, x[i]) - 1
+            if 0 <= index < len(edges) - 1:
+                self.bins[name][slots, index] += (1.0, x[i], y)
+
+    def add_batch(self, X: np.ndarray, y: np.ndarray, segments: Mapping[str, Sequence[Any]]) -> None:
+        """
+        Добавляет пакет наблюдений векторно.
+
+        Args:
+            X: Признаки (N x len(features)) в порядке features
+            y: Оценки (N,)
+            segments: Поле сегмента -> значения для каждой строки
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.features))
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+        if not len(y):
+            return
+
+        self._merge(np.full(len(y), self._slot(OVERALL)), X, y)
+        for field in self.segment_fields:
+            column = segments.get(field)
+            if column is None:
+                column = ["unknown"] * len(y)
+            elif isinstance(column, np.ndarray):
+                column = column.tolist()  # хэширование скаляров numpy заметно медленнее
+            # Факторизация словарём: без сортировки строк, как в np.unique
+            codes: Dict[Any, int] = {}
+            inverse = np.fromiter((codes.setdefault(value, len(codes)) for value in column), np.intp, len(y))
+            slots = np.array([self._slot((field, str(value or "unknown"))) for value in codes])
+            self._merge(slots[inverse], X, y)
+
+    def _merge(self, ids: np.ndarray, X: np.ndarray, y: np.ndarray) -> None:
+        size = len(self.n)
+        n_b = np.bincount(ids, minlength=size).astype(np.float64)
+        present = n_b > 0
+        safe_n_b = np.where(present, n_b, 1.0)
+
+        mean_bx = np.column_stack([np.bincount(ids, X[:, i], minlength=size) for i in range(X.shape[1])])
+        mean_bx /= safe_n_b[:, None]
+        mean_by = np.bincount(ids, y, minlength=size) / safe_n_b
+
+        dx = X - mean_bx[ids]
+        dy = y - mean_by[ids]
+        m2_bx = np.column_stack([np.bincount(ids, dx[:, i] ** 2, minlength=size) for i in range(X.shape[1])])
+        c_b = np.column_stack([np.bincount(ids, dx[:, i] * dy, minlength=size) for i in range(X.shape[1])])
+        m2_by = np.bincount(ids, dy**2, minlength=size)
+
+        # Слияние моментов двух выборок (Chan et al.)
+        n_a = self.n
+        n = n_a + n_b
+        safe_n = np.where(n > 0, n, 1.0)
+        weight = n_a * n_b / safe_n
+        delta_x = mean_bx - self.mean_x
+        delta_y = mean_by - self.mean_y
+
+        self.m2_x += m2_bx + delta_x**2 * weight[:, None]
+        self.m2_y += m2_by + delta_y**2 * weight
+        self.c_xy += c_b + delta_x * delta_y[:, None] * weight[:, None]
+        self.mean_x += delta_x * (n_b / safe_n)[:, None]
+        self.mean_y += delta_y * (n_b / safe_n)
+        self.n = n
+
+        for i, name in enumerate(self.features):
+            if name not in self.bin_edges:
+                continue
+            index = self._bin(name, X[:, i])
+            valid = index >= 0
+            width = len(self.bin_edges[name]) - 1
+            flat = ids[valid] * width + index[valid]
+            sums = [np.bincount(flat, weights, minlength=size * width) for weights in (None, X[valid, i], y[valid])]
+            self.bins[name] += np.stack(sums, axis=-1).reshape(size, width, 3)
+
+    @classmethod
+    def from_digests(cls, digests: Sequence[Mapping[str, Any]], **kwargs) -> "FeedbackStats":
+        """Статистика по дайджестам: наблюдение - дайджест и его feedback_score."""
+        stats = cls(**kwargs)
+        observations = [digest_observation(digest) for digest in digests]
+        X = np.array([[values.get(name, 0.0) for name in stats.features] for values, _ in observations], dtype=float)
+        y = np.array([_number(digest.get("feedback_score"), 0.0) for digest in digests])
+        segments = {field: [segment[field] for _, segment in observations] for field in stats.segment_fields}
+        stats.add_batch(X, y, segments)
+        return stats
+
+    def count(self, segment: SegmentKey = OVERALL) -> int:
+        slot = self.slots.get(segment)
+        return 0 if slot is None else int(self.n[slot])
+
+    def pearson(self, feature: str, segment: SegmentKey = OVERALL) -> float:
+        """Корреляция Пирсона признака и оценки в сегменте (0.0, если данных мало или дисперсия нулевая)."""
+        slot = self.slots.get(segment)
+        if slot is None or self.n[slot] < 3:
+            return 0.0
+        i = self.features.index(feature)
+        denominator = np.sqrt(self.m2_x[slot, i] * self.m2_y[slot])
+        # Порог отсекает "дисперсию" из ошибок округления у постоянного признака
+        if not denominator > 1e-12 * max(1.0, self.n[slot]):
+            return 0.0
+        return float(np.clip(self.c_xy[slot, i] / denominator, -1.0, 1.0))
+
+    def mean_score(self, segment: SegmentKey = OVERALL) -> float:
+        slot = self.slots.get(segment)
+        return 0.0 if slot is None else float(self.mean_y[slot])
+
+    def std_score(self, segment: SegmentKey = OVERALL) -> float:
+        """Стандартное отклонение оценки (как np.std, ddof=0)."""
+        slot = self.slots.get(segment)
+        if slot is None or not self.n[slot]:
+            return 0.0
+        return float(np.sqrt(max(self.m2_y[slot], 0.0) / self.n[slot]))
+
+    def segment_values(self, field: str) -> List[str]:
+        return [value for key_field, value in self.slots if key_field == field]
+
+    def segment_summary(self, field: str) -> Dict[str, Dict[str, float]]:
+        """Средняя оценка, число наблюдений и std для каждого значения поля сегмента."""
+        return {
+            value: {
+                "avg_score": round(self.mean_score((field, value)), 3),
+                "count": self.count((field, value)),
+                "std": round(self.std_score((field, value)), 3),
+            }
+            for value in self.segment_values(field)
+        }
+
+    def calibration_curve(self, feature: str, segment: SegmentKey = OVERALL) -> List[Dict[str, float]]:
+        """
+        Кривая калибровки: средняя оценка пользователей по корзинам значения признака.
+
+        Returns:
+            Непустые корзины: {"low", "high", "count", "mean_value", "mean_score"}
+        """
+        slot = self.slots.get(segment)
+        if slot is None or feature not in self.bins:
+            return []
+        edges = self.bin_edges[feature]
+        count, sum_x, sum_y = self.bins[feature][slot].T
+        return [
+            {
+                "low": float(edges[i]),
+                "high": float(edges[i + 1]),
+                "count": int(count[i]),
+                "mean_value": float(sum_x[i] / count[i]),
+                "mean_score": float(sum_y[i] / count[i]),
+            }
+            for i in range(len(count))
+            if count[i] > 0
+        ]
+
 
 class FeedbackAnalyzer:
     """Анализирует feedback пользователей и корректирует параметры генерации."""
 
     def __init__(self, supabase_client):
         self.supabase = supabase_client
+        self.stats: Optional[FeedbackStats] = None
 
     def analyze_correlation(self, days: int = 7) -> Dict[str, Any]:
         """
@@ -69,58 +368,22 @@ class FeedbackAnalyzer:
                 logger.warning(f"Not enough feedback data: {len(digests.data) if digests.data else 0}")
                 return {"error": "insufficient_data", "sample_size": len(digests.data) if digests.data else 0}
 
-            # Извлекаем данные для анализа
-            feedback_scores = []
-            importance_vals = []
-            credibility_vals = []
-            styles = []
-            lengths = []
-
-            for digest in digests.data:
-                feedback_scores.append(digest.get("feedback_score", 0))
-
-                # Получаем параметры из meta JSONB
-                meta = digest.get("meta", {})
-                if isinstance(meta, str):
-                    try:
-                        meta = json.loads(meta)
-                    except (json.JSONDecodeError, TypeError):
-                        meta = {}
-
-                importance_vals.append(meta.get("avg_importance", 0.5))
-                credibility_vals.append(meta.get("avg_credibility", 0.5))
-                styles.append(digest.get("style", "analytical"))
-
-                # Длина текста
-                content = digest.get("content", "") or digest.get("summary", "")
-                word_count = len(content.split()) if content else 0
-                lengths.append(word_count)
+            stats = FeedbackStats.from_digests(digests.data)
+            self.stats = stats
 
             # Вычисляем корреляции
             correlations = {}
 
-            if len(feedback_scores) > 2:
-                correlations["importance_correlation"] = self._pearson_correlation(importance_vals, feedback_scores)
-                correlations["credibility_correlation"] = self._pearson_correlation(credibility_vals, feedback_scores)
-                correlations["length_correlation"] = self._pearson_correlation(lengths, feedback_scores)
+            if stats.count() > 2:
+                correlations["importance_correlation"] = round(stats.pearson("importance"), 3)
+                correlations["credibility_correlation"] = round(stats.pearson("credibility"), 3)
+                correlations["length_correlation"] = round(stats.pearson("length"), 3)
 
             # Анализ по стилям
-            style_performance = {}
-            for style in set(styles):
-                style_scores = [score for score, s in zip(feedback_scores, styles) if s == style]
-                if style_scores:
-                    style_performance[style] = {
-                        "avg_score": round(np.mean(style_scores), 3),
-                        "count": len(style_scores),
-                        "std": round(np.std(style_scores), 3),
-                    }
-
-            correlations["style_performance"] = style_performance
+            correlations["style_performance"] = stats.segment_summary("style")
 
             # Оптимальная длина (находим диапазон с лучшими оценками)
-            if lengths and feedback_scores:
-                optimal_length = self._find_optimal_length(lengths, feedback_scores)
-                correlations["optimal_length"] = optimal_length
+            correlations["optimal_length"] = self._find_optimal_length(stats)
 
             # Генерируем рекомендации
             recommendations = self._generate_recommendations(correlations)
@@ -138,33 +401,42 @@ class FeedbackAnalyzer:
             logger.error(f"Error analyzing feedback correlation: {e}")
             return {"error": "analysis_failed", "message": str(e)}
 
-    def _pearson_correlation(self, x: List[float], y: List[float]) -> float:
-        """Вычисляет корреляцию Пирсона."""
-        if len(x) < 3 or len(y) < 3:
-            return 0.0
-        try:
-            corr, _ = stats.pearsonr(x, y)
-            return round(corr, 3)
-        except (ValueError, TypeError, RuntimeError):
-            return 0.0
-
-    def _find_optimal_length(self, lengths: List[int], scores: List[float]) -> int:
-        """Находит оптимальную длину текста."""
-        # Группируем по диапазонам длины
-        ranges = [(0, 300), (300, 600), (600, 900), (900, 1500)]
+    def _find_optimal_length(self, stats: FeedbackStats, segment: SegmentKey = OVERALL) -> int:
+        """Находит оптимальную длину текста по корзинам длины."""
         best_avg = 0
         best_length = 600
 
-        for low, high in ranges:
-            range_scores = [score for length, score in zip(lengths, scores) if low <= length < high]
-            if range_scores and len(range_scores) >= 3:
-                avg = np.mean(range_scores)
-                if avg > best_avg:
-                    best_avg = avg
-                    best_length = (low + high) // 2
+        for bucket in stats.calibration_curve("length", segment):
+            if bucket["count"] >= 3 and bucket["mean_score"] > best_avg:
+                best_avg = bucket["mean_score"]
+                best_length = int(bucket["low"] + bucket["high"]) // 2
 
         return best_length
 
+    def record_feedback(self, digest: Mapping[str, Any], score: float) -> None:
+        """
+        Учитывает новую оценку дайджеста в статистике за O(1), без повторного запроса.
+
+        Каждая оценка - отдельное наблюдение; до первого analyze_correlation()
+        статистика начинается с нуля.
+        """
+        if self.stats is None:
+            self.stats = FeedbackStats()
+        values, segments = digest_observation(digest)
+        self.stats.add(values, score, segments)
+
+    def segment_correlations(self, field: str, value: str) -> Dict[str, Any]:
+        """Корреляции и калибровка importance для одного сегмента (style, category или source)."""
+        stats = self.stats or FeedbackStats()
+        segment = (field, value)
+        return {
+            "sample_size": stats.count(segment),
+            "avg_score": round(stats.mean_score(segment), 3),
+            **{f"{name}_correlation": round(stats.pearson(name, segment), 3) for name in stats.features},
+            "importance_calibration": stats.calibration_curve("importance", segment),
+            "optimal_length": self._find_optimal_length(stats, segment),
+        }
+
     def _generate_recommendations(self, correlations: Dict) -> List[str]:
         """Генерирует рекомендации на основе анализа."""
         recommendations = []
@@ -0,0 +1,250 @@
+"""
+Shared compiled keyword matcher.
+
+Prefilter, LocalPredictor, EventForecastEngine and ContentQualityScorer used to
+scan every text once per keyword (``any(word in text ...)``, per-pattern
+``re.search``). KeywordMatcher compiles all keyword groups of a consumer into a
+single Aho-Corasick automaton (pyahocorasick) or, when the library is not
+installed, into one trie-shaped regex, and reports the hits of every group in
+one pass over the text. PatternMatcher uses the same pass as a gate for regex
+pattern lists (paywall detection).
+
+Matching keeps the semantics of the ``keyword in text`` checks it replaces:
+plain case-sensitive substrings, overlapping hits included.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+try:
+    import ahocorasick
+
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+logger = logging.getLogger("keyword_matcher")
+
+BACKEND_AHOCORASICK = "aho-corasick"
+BACKEND_REGEX = "regex"
+
+MAX_CACHED_MATCHERS = 64
+DEFAULT_CHECK_INTERVAL = 5.0  # секунд между stat() файла правил
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex в форме префиксного дерева: на каждой позиции одна ветка по первому символу."""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Ветка необязательна - жадно берём самое длинное слово на позиции
+            return (body if len(branches) > 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Группы ключевых слов, скомпилированные в один автомат.
+
+    Example:
+        matcher = KeywordMatcher({"positive": ["launch", "approval"], "negative": ["hack"]})
+        matcher.find("etf approval after hack")  # {"positive": ["approval"], "negative": ["hack"]}
+    """
+
+    def __init__(self, groups: Mapping[str, Iterable[str]]):
+        self.groups: Dict[str, List[str]] = {name: list(words or []) for name, words in groups.items()}
+
+        # keyword -> [(group, позиция в группе)]: дубликаты в группе считаются, как в sum(... for w in words)
+        self._entries: Dict[str, List[Tuple[str, int]]] = {}
+        for name, words in self.groups.items():
+            for index, word in enumerate(words):
+                self._entries.setdefault(word, []).append((name, index))
+
+        # "" in text всегда True
+        self._always = {""} if "" in self._entries else set()
+        keywords = [word for word in self._entries if word]
+
+        self._automaton = None
+        self._regex: Optional[re.Pattern] = None
+        self._prefixes: Dict[str, List[str]] = {}
+        if not keywords:
+            self.backend = BACKEND_REGEX
+        elif AHOCORASICK_AVAILABLE:
+            self.backend = BACKEND_AHOCORASICK
+            self._automaton = ahocorasick.Automaton()
+            for word in keywords:
+                self._automaton.add_word(word, word)
+            self._automaton.make_automaton()
+        else:
+            self.backend = BACKEND_REGEX
+            self._regex = re.compile(_trie_pattern(keywords))
+            # Regex находит на позиции самое длинное слово; более короткие слова,
+            # начинающиеся там же, - его префиксы
+            known = set(keywords)
+            self._prefixes = {
+                word: [word[:i] for i in range(1, len(word) + 1) if word[:i] in known] for word in keywords
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keywords_in(self, text: str) -> Set[str]:
+        """Все ключевые слова (без учёта групп), которые встречаются в тексте."""
+        found = set(self._always)
+        if not text:
+            return found
+        if self._automaton is not None:
+            found.update(word for _, word in self._automaton.iter(text))
+        elif self._regex is not None:
+            search = self._regex.search
+            match = search(text)
+            while match:
+                found.update(self._prefixes[match.group()])
+                match = search(text, match.start() + 1)
+        return found
+
+    def find(self, text: str) -> Dict[str, List[str]]:
+        """Совпавшие слова по группам, в порядке групп (группы без совпадений опускаются)."""
+        hits: Dict[str, List[Tuple[int, str]]] = {}
+        for word in self.keywords_in(text):
+            for group, index in self._entries[word]:
+                hits.setdefault(group, []).append((index, word))
+        return {group: [word for _, word in sorted(found)] for group, found in hits.items()}
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Число совпавших слов по каждой группе (0 для групп без совпадений)."""
+        counts = dict.fromkeys(self.groups, 0)
+        for word in self.keywords_in(text):
+            for group, _ in self._entries[word]:
+                counts[group] += 1
+        return counts
+
+
+# Символы, которые re.IGNORECASE считает равными ASCII-буквам, а str.lower() - нет
+_CASE_EQUIVALENTS = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s"})
+_QUANTIFIERS = "*+?{"
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Буквальное начало паттерна, без которого он не может совпасть ("" - не определить)."""
+    if "|" in pattern:
+        return ""
+    end = 0
+    while end < len(pattern) and (pattern[end].isalnum() or pattern[end] in " -_,:"):
+        end += 1
+    if end < len(pattern) and pattern[end] in _QUANTIFIERS:
+        end -= 1  # Последний символ под квантификатором необязателен
+    return pattern[: max(end, 0)]
+
+
+class PatternMatcher:
+    """
+    Набор regex-паттернов с общим предфильтром.
+
+    Буквальные начала паттернов (``subscribe`` у ``subscribe.*to.*continue``)
+    ищутся одним проходом KeywordMatcher; регулярные выражения, скомпилированные
+    один раз, запускаются только для паттернов, чьё начало нашлось в тексте.
+    Результат тот же, что у перебора ``re.search`` по списку.
+    """
+
+    def __init__(self, patterns: Iterable[str], flags: int = 0):
+        self.patterns = list(patterns)
+        self.flags = flags
+        self._compiled = [re.compile(pattern, flags) for pattern in self.patterns]
+        self._ignorecase = bool(flags & re.IGNORECASE)
+
+        self._always: List[int] = []
+        gate_groups: Dict[str, List[str]] = {}
+        for index, pattern in enumerate(self.patterns):
+            prefix = "" if flags & re.VERBOSE else _literal_prefix(pattern)
+            if prefix:
+                gate_groups[str(index)] = [self._fold(prefix)]
+            else:
+                self._always.append(index)
+        self._gate = get_keyword_matcher(gate_groups) if gate_groups else None
+
+    def _fold(self, text: str) -> str:
+        return text.translate(_CASE_EQUIVALENTS).lower() if self._ignorecase else text
+
+    def search(self, text: str) -> Optional[str]:
+        """Первый (в порядке списка) паттерн, совпавший с текстом, или None."""
+        candidates = list(self._always)
+        if self._gate is not None and text:
+            candidates.extend(int(index) for index in self._gate.find(self._fold(text)))
+        for index in sorted(candidates):
+            if self._compiled[index].search(text):
+                return self.patterns[index]
+        return None
+
+
+_matchers: Dict[Tuple, KeywordMatcher] = {}
+_matchers_lock = threading.Lock()
+
+
+def get_keyword_matcher(groups: Mapping[str, Iterable[str]]) -> KeywordMatcher:
+    """
+    Общий KeywordMatcher для набора групп.
+
+    Одинаковые наборы (например, у нескольких экземпляров LocalPredictor)
+    компилируются один раз.
+    """
+    groups = {name: tuple(words or ()) for name, words in groups.items()}
+    key = tuple(sorted(groups.items()))
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is None:
+            if len(_matchers) >= MAX_CACHED_MATCHERS:
+                _matchers.pop(next(iter(_matchers)))
+            matcher = _matchers[key] = KeywordMatcher(groups)
+            logger.debug(f"Compiled {len(matcher)} keywords into {matcher.backend} matcher")
+        return matcher
+
+
+class RulesFileWatcher:
+    """
+    Отслеживает изменение YAML-файла правил.
+
+    changed() делает stat() не чаще раза в check_interval секунд и возвращает
+    True, если mtime или размер файла изменились с прошлой проверки.
+    """
+
+    def __init__(self, path, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._signature = self._stat()
+        self._checked_at = time.monotonic()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
@@ -7,14 +7,45 @@ Supports both rule-based scoring and self-tuning ML models.
 """
 
 import logging
-from typing import Dict
+from typing import Dict, List, Optional
 from dataclasses import dataclass
 
 import yaml
 from pathlib import Path
 
+from ai_modules.keyword_matcher import get_keyword_matcher
+
 logger = logging.getLogger("local_predictor")
 
+# Word frequency features for the ML models
+IMPORTANT_WORDS = [
+    "breaking",
+    "urgent",
+    "exclusive",
+    "analysis",
+    "report",
+    "official",
+    "confirmed",
+    "announced",
+    "released",
+    "launched",
+]
+
+SPAM_WORDS = [
+    "click",
+    "here",
+    "free",
+    "giveaway",
+    "scam",
+    "sponsored",
+    "advertisement",
+    "advertorial",
+    "opinion",
+    "prediction",
+]
+
+GENERIC_DOMAINS = [".com", ".org", ".net"]
+
 
 @dataclass
 class PredictionResult:
@@ -115,6 +146,20 @@ class LocalPredictor:
             "hearsay",
         ]
 
+        # All keyword lists compiled once into a shared matcher
+        self.keyword_matcher = get_keyword_matcher(
+            {
+                "high_impact": self.high_impact_keywords,
+                "credibility_positive": self.credibility_positive,
+                "credibility_negative": self.credibility_negative,
+                "important_words": IMPORTANT_WORDS,
+                "spam_words": SPAM_WORDS,
+            }
+        )
+        self.source_matcher = get_keyword_matcher(
+            {"source_reputation": list(self.source_reputation), "generic_domain": GENERIC_DOMAINS}
+        )
+
     def _load_config(self, config_path: str = None) -> Dict:
         """Load configuration from YAML file."""
         if config_path is None:
@@ -140,38 +185,60 @@ class LocalPredictor:
         Returns:
             PredictionResult with importance, credibility, and confidence scores
         """
+        return self.predict_batch([news_item])[0]
+
+    def predict_batch(self, news_items: List[Dict]) -> List[PredictionResult]:
+        """
+        Predict importance and credibility scores for a batch of news items.
+
+        ML models are called once for the whole batch (e.g. all items of a
+        source), which is much cheaper than one call per item.
+
+        Args:
+            news_items: List of news item dictionaries
+
+        Returns:
+            List of PredictionResult in the order of news_items
+        """
         # Try self-tuning ML models first if available
         if self.self_tuning_enabled and self.self_tuning_trainer:
             try:
-                return self._predict_with_ml_models(news_item)
+                return self._predict_with_ml_models(news_items)
             except Exception as e:
                 logger.warning(f"ML model prediction failed, falling back to rules: {e}")
 
         # Fallback to rule-based prediction
-        return self._predict_with_rules(news_item)
+        return [self._predict_with_rules(news_item) for news_item in news_items]
 
-    def _predict_with_ml_models(self, news_item: Dict) -> PredictionResult:
+    def _predict_with_ml_models(self, news_items: List[Dict]) -> List[PredictionResult]:
         """
         Predict using self-tuning ML models.
 
         Args:
-            news_item: Dictionary containing news item data
+            news_items: List of news item dictionaries
 
         Returns:
-            PredictionResult with ML model predictions
+            List of PredictionResult with ML model predictions
         """
         # Extract features using the same logic as the collector
-        features = self._extract_features_for_ml(news_item)
+        features = [self._extract_features_for_ml(news_item) for news_item in news_items]
 
-        # Make predictions using ML models
-        importance_score, credibility_score = self.self_tuning_trainer.predict(features)
+        # One scaler / model call for the whole batch
+        scores = self.self_tuning_trainer.predict_batch(features)
 
-        # Calculate confidence based on feature completeness
-        confidence = self._calculate_ml_confidence(features, news_item)
+        results = []
+        for item_features, news_item, (importance_score, credibility_score) in zip(features, news_items, scores):
+            # Calculate confidence based on feature completeness
+            confidence = self._calculate_ml_confidence(item_features, news_item)
+            results.append(
+                PredictionResult(
+                    importance=float(importance_score), credibility=float(credibility_score), confidence=confidence
+                )
+            )
 
-        logger.debug(f"ML prediction: importance={importance_score:.3f}, credibility={credibility_score:.3f}")
+        logger.debug(f"ML prediction for {len(results)} items")
 
-        return PredictionResult(importance=importance_score, credibility=credibility_score, confidence=confidence)
+        return results
 
     def _extract_features_for_ml(self, news_item: Dict) -> Dict[str, float]:
         """
@@ -237,44 +304,18 @@ class LocalPredictor:
         words = text.split()
         features["total_words"] = len(words)
 
-        # Word frequency features
-        important_words = [
-            "breaking",
-            "urgent",
-            "exclusive",
-            "analysis",
-            "report",
-            "official",
-            "confirmed",
-            "announced",
-            "released",
-            "launched",
-        ]
-
-        spam_words = [
-            "click",
-            "here",
-            "free",
-            "giveaway",
-            "scam",
-            "sponsored",
-            "advertisement",
-            "advertorial",
-            "opinion",
-            "prediction",
-        ]
-
         # Count important and spam words
-        important_count = sum(1 for word in important_words if word in text)
-        spam_count = sum(1 for word in spam_words if word in text)
+        counts = self.keyword_matcher.count(text)
+        important_count = counts["important_words"]
+        spam_count = counts["spam_words"]
 
         features["important_words_ratio"] = important_count / max(len(words), 1)
         features["spam_words_ratio"] = spam_count / max(len(words), 1)
 
         # Title-specific features
         title_words = title.lower().split()
-        features["title_important_words"] = sum(1 for word in title_words if word in important_words)
-        features["title_spam_words"] = sum(1 for word in title_words if word in spam_words)
+        features["title_important_words"] = sum(1 for word in title_words if word in IMPORTANT_WORDS)
+        features["title_spam_words"] = sum(1 for word in title_words if word in SPAM_WORDS)
 
         return features
 
@@ -333,7 +374,8 @@ class LocalPredictor:
         title_score = self._score_title_length(title)
         source_score = self._score_source_reputation(source)
         category_score = self._score_category_relevance(category)
-        keyword_score = self._score_keywords(title, content)
+        counts = self.keyword_matcher.count(f"{title} {content}".lower())
+        keyword_score = self._score_keywords(title, content, counts)
 
         # Calculate importance using weighted combination
         importance = (
@@ -344,7 +386,7 @@ class LocalPredictor:
         )
 
         # Calculate credibility
-        credibility = self._score_credibility(title, content, source)
+        credibility = self._score_credibility(title, content, source, counts)
 
         # Calculate confidence based on how many signals we have
         confidence = self._calculate_confidence(news_item)
@@ -376,15 +418,14 @@ class LocalPredictor:
         if not source:
             return 0.5  # Neutral for unknown sources
 
-        source_lower = source.lower()
+        hits = self.source_matcher.find(source.lower())
 
         # Check for exact matches first
-        for known_source, score in self.source_reputation.items():
-            if known_source in source_lower:
-                return score
+        if "source_reputation" in hits:
+            return self.source_reputation[hits["source_reputation"][0]]
 
         # Check for partial matches
-        if any(domain in source_lower for domain in [".com", ".org", ".net"]):
+        if "generic_domain" in hits:
             return 0.6  # Generic domain
 
         return 0.4  # Unknown source
@@ -395,33 +436,34 @@ class LocalPredictor:
         # This can be extended with category-specific scoring
         return 0.8
 
-    def _score_keywords(self, title: str, content: str) -> float:
+    def _score_keywords(self, title: str, content: str, counts: Optional[Dict[str, int]] = None) -> float:
         """Score based on keyword presence."""
-        text = f"{title} {content}".lower()
+        if counts is None:
+            counts = self.keyword_matcher.count(f"{title} {content}".lower())
 
         score = 0.0
-        for keyword in self.high_impact_keywords:
-            if keyword in text:
-                score += 0.2
+        for _ in range(counts["high_impact"]):
+            score += 0.2
 
         return min(1.0, score)
 
-    def _score_credibility(self, title: str, content: str, source: str) -> float:
+    def _score_credibility(
+        self, title: str, content: str, source: str, counts: Optional[Dict[str, int]] = None
+    ) -> float:
         """Score based on credibility indicators."""
-        text = f"{title} {content}".lower()
+        if counts is None:
+            counts = self.keyword_matcher.count(f"{title} {content}".lower())
 
         # Start with source reputation
         credibility = self._score_source_reputation(source)
 
         # Adjust based on positive indicators
-        for indicator in self.credibility_positive:
-            if indicator in text:
-                credibility += 0.1
+        for _ in range(counts["credibility_positive"]):
+            credibility += 0.1
 
         # Adjust based on negative indicators
-        for indicator in self.credibility_negative:
-            if indicator in text:
-                credibility -= 0.2
+        for _ in range(counts["credibility_negative"]):
+            credibility -= 0.2
 
         # Check for excessive capitalization (spam indicator)
         if len(title) > 0:
@@ -485,3 +527,20 @@ def predict_news_item(news_item: Dict) -> PredictionResult:
         return PredictionResult(importance=0.5, credibility=0.5, confidence=0.0)
 
     return predictor.predict(news_item)
+
+
+def predict_news_batch(news_items: List[Dict]) -> List[PredictionResult]:
+    """
+    Convenience function to predict a batch of news items at once.
+
+    Args:
+        news_items: List of news item dictionaries
+
+    Returns:
+        List of PredictionResult in the order of news_items
+    """
+    predictor = get_predictor()
+    if not predictor.is_enabled():
+        return [PredictionResult(importance=0.5, credibility=0.5, confidence=0.0) for _ in news_items]
+
+    return predictor.predict_batch(news_items)
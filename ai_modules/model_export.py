@@ -0,0 +1,219 @@
+"""
+Pickle-free model artifacts for the local predictor.
+
+export_model_arrays() turns the fitted scikit-learn objects (StandardScaler,
+LogisticRegression, RandomForestClassifier) into plain numpy arrays: scaler
+mean/scale, linear weights, and the node arrays of all trees concatenated.
+They are saved as an uncompressed .npz and opened with load_model_arrays(),
+which maps the file read-only and returns zero-copy views into it: processes
+loading the same version (web workers, bot, parser) share the pages through
+the page cache instead of each unpickling a private copy.
+
+NumpyScaler / NumpyLinearModel / NumpyForestModel reproduce transform() and
+predict_proba() of the original estimators with numpy only, so inference does
+not touch scikit-learn at all.
+"""
+
+import io
+import mmap
+import struct
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+ARRAYS_FORMAT_VERSION = 1
+
+KIND_LINEAR = "linear"
+KIND_FOREST = "forest"
+
+_LOCAL_HEADER = struct.Struct("<4s5H3I2H")  # заголовок записи zip (30 байт)
+
+
+def _export_scaler(scaler, n_features: int) -> Dict[str, np.ndarray]:
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    return {
+        "scaler.mean": np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        "scaler.scale": np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+    }
+
+
+def _check_binary(model, name: str) -> None:
+    classes = list(getattr(model, "classes_", []))
+    if len(classes) != 2:
+        raise ValueError(f"{name}: only binary classifiers can be exported, classes={classes}")
+
+
+def _export_model(model, name: str) -> Dict[str, np.ndarray]:
+    _check_binary(model, name)
+
+    if hasattr(model, "coef_") and hasattr(model, "intercept_"):
+        return {
+            f"{name}.kind": np.array(KIND_LINEAR),
+            f"{name}.coef": np.asarray(model.coef_, dtype=np.float64).reshape(-1),
+            f"{name}.intercept": np.asarray(model.intercept_, dtype=np.float64).reshape(-1)[:1],
+        }
+
+    if hasattr(model, "estimators_") and all(hasattr(tree, "tree_") for tree in model.estimators_):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        left, right = [], []
+        for tree, offset in zip(trees, offsets):
+            # Индексы детей - в общем массиве узлов; у листьев -1
+            left.append(np.where(tree.children_left >= 0, tree.children_left + offset, -1))
+            right.append(np.where(tree.children_right >= 0, tree.children_right + offset, -1))
+        values = np.concatenate([tree.value[:, 0, :] for tree in trees]).astype(np.float64)
+        totals = values.sum(axis=1)
+        return {
+            f"{name}.kind": np.array(KIND_FOREST),
+            f"{name}.roots": offsets[:-1].astype(np.int64),
+            f"{name}.feature": np.concatenate([tree.feature for tree in trees]).astype(np.int64),
+            f"{name}.threshold": np.concatenate([tree.threshold for tree in trees]).astype(np.float64),
+            f"{name}.left": np.concatenate(left).astype(np.int64),
+            f"{name}.right": np.concatenate(right).astype(np.int64),
+            f"{name}.proba": np.divide(values[:, 1], totals, out=np.zeros_like(totals), where=totals > 0),
+            f"{name}.depth": np.array(max(tree.max_depth for tree in trees), dtype=np.int64),
+        }
+
+    raise ValueError(f"{name}: unsupported model type {type(model).__name__}")
+
+
+def export_model_arrays(
+    importance_model, credibility_model, scaler, feature_columns: Sequence[str]
+) -> Dict[str, np.ndarray]:
+    """
+    Convert fitted models and scaler into plain numpy arrays.
+
+    Raises:
+        ValueError: Model type cannot be exported (callers keep the pickles)
+    """
+    arrays = {
+        "format_version": np.array(ARRAYS_FORMAT_VERSION, dtype=np.int64),
+        "feature_columns": np.array(list(feature_columns), dtype=str),
+    }
+    arrays.update(_export_scaler(scaler, len(feature_columns)))
+    arrays.update(_export_model(importance_model, "importance"))
+    arrays.update(_export_model(credibility_model, "credibility"))
+    return arrays
+
+
+def save_model_arrays(path: Path, arrays: Dict[str, np.ndarray]) -> None:
+    """Save arrays as an uncompressed .npz (members must stay mappable)."""
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_model_arrays(path: Path) -> Dict[str, np.ndarray]:
+    """
+    Open an .npz written by save_model_arrays() as read-only views of a file mapping.
+
+    Returns:
+        Array name -> read-only ndarray backed by the shared mapping
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: member {info.filename} is compressed and cannot be mapped")
+
+            header = _LOCAL_HEADER.unpack_from(mapping, info.header_offset)
+            name_length, extra_length = header[-2], header[-1]
+            start = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+
+            # Заголовок .npy: форма, dtype и порядок; данные идут сразу после него
+            stream = io.BytesIO(mapping[start : start + min(info.file_size, 4096)])
+            version = np.lib.format.read_magic(stream)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+            if dtype.hasobject:
+                raise ValueError(f"{path}: member {info.filename} contains Python objects")
+
+            arrays[info.filename[: -len(".npy")]] = np.ndarray(
+                shape, dtype=dtype, buffer=mapping, offset=start + stream.tell(), order="F" if fortran_order else "C"
+            )
+    return arrays
+
+
+class NumpyScaler:
+    """StandardScaler.transform() on exported arrays."""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean = mean
+        self.scale = scale
+        self.n_features_in_ = len(mean)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (X - self.mean) / self.scale
+
+
+class NumpyLinearModel:
+    """Binary LogisticRegression.predict_proba() on exported arrays."""
+
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray):
+        self.coef = coef
+        self.intercept = float(intercept[0])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        decision = X @ self.coef + self.intercept
+        positive = np.exp(-np.logaddexp(0.0, -decision))  # expit без переполнения
+        return np.column_stack([1.0 - positive, positive])
+
+
+class NumpyForestModel:
+    """Binary RandomForestClassifier.predict_proba() on exported arrays."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], name: str):
+        self.roots = arrays[f"{name}.roots"]
+        self.feature = arrays[f"{name}.feature"]
+        self.threshold = arrays[f"{name}.threshold"]
+        self.left = arrays[f"{name}.left"]
+        self.right = arrays[f"{name}.right"]
+        self.proba = arrays[f"{name}.proba"]
+        self.depth = int(arrays[f"{name}.depth"])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        # Деревья scikit-learn сравнивают признаки во float32
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[None, :]
+        nodes = np.repeat(self.roots[:, None], len(X), axis=1)  # (деревья x объекты)
+        for _ in range(self.depth):
+            left = self.left[nodes]
+            inner = left >= 0
+            if not inner.any():
+                break
+            go_left = X[rows, np.where(inner, self.feature[nodes], 0)] <= self.threshold[nodes]
+            nodes = np.where(inner, np.where(go_left, left, self.right[nodes]), nodes)
+        positive = self.proba[nodes].mean(axis=0)
+        return np.column_stack([1.0 - positive, positive])
+
+
+def numpy_models(arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Build numpy inference objects from exported arrays.
+
+    Returns:
+        Dict with "importance", "credibility", "scaler" and "feature_columns"
+    """
+    if int(arrays["format_version"]) != ARRAYS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model arrays format: {int(arrays['format_version'])}")
+
+    models: Dict[str, Any] = {
+        "scaler": NumpyScaler(arrays["scaler.mean"], arrays["scaler.scale"]),
+        "feature_columns": tuple(str(name) for name in arrays["feature_columns"]),
+    }
+    for name in ("importance", "credibility"):
+        kind = str(arrays[f"{name}.kind"])
+        if kind == KIND_LINEAR:
+            models[name] = NumpyLinearModel(arrays[f"{name}.coef"], arrays[f"{name}.intercept"])
+        elif kind == KIND_FOREST:
+            models[name] = NumpyForestModel(arrays, name)
+        else:
+            raise ValueError(f"{name}: unknown model kind {kind}")
+    return models
@@ -0,0 +1,227 @@
+"""
+Versioned model artifacts for the self-tuning local predictor.
+
+Every training run publishes a complete set of artifacts (models, scaler)
+into its own directory::
+
+    models/
+        manifest.json              <- текущая версия
+        versions/
+            v0009/
+                importance.pkl
+                credibility.pkl
+                scaler.pkl
+                model.npz          <- те же параметры без pickle (model_export.py)
+                manifest.json      <- копия манифеста этой версии
+
+The version directory is written under a temporary name and renamed when
+complete; the top-level manifest is replaced atomically with os.replace().
+Readers therefore see either the previous or the new version, never a
+half-written pickle. The manifest stores a SHA-256 checksum of every file,
+verified before unpickling.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ai_modules.model_export import load_model_arrays, save_model_arrays
+
+logger = logging.getLogger("model_registry")
+
+MANIFEST_NAME = "manifest.json"
+VERSIONS_DIR = "versions"
+ARRAYS_ARTIFACT = "arrays"  # model.npz, загружается через mmap
+DEFAULT_KEEP_VERSIONS = 5
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Записывает файл через временный файл + os.replace()."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """
+    Publishes and loads versioned model artifacts.
+
+    Example:
+        registry = ModelRegistry(Path("models"))
+        registry.publish({"importance": model, "scaler": scaler}, metadata)
+        artifacts, manifest = registry.load()
+    """
+
+    def __init__(self, models_dir: Path, keep_versions: int = DEFAULT_KEEP_VERSIONS):
+        self.models_dir = Path(models_dir)
+        self.versions_dir = self.models_dir / VERSIONS_DIR
+        self.manifest_path = self.models_dir / MANIFEST_NAME
+        self.keep_versions = max(1, keep_versions)
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        """Текущий манифест или None, если версий ещё нет."""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Error reading model manifest: {e}")
+            return None
+
+    def list_versions(self) -> List[int]:
+        """Номера опубликованных версий по возрастанию."""
+        if not self.versions_dir.exists():
+            return []
+        versions = []
+        for path in self.versions_dir.iterdir():
+            if path.is_dir() and path.name.startswith("v") and path.name[1:].isdigit():
+                versions.append(int(path.name[1:]))
+        return sorted(versions)
+
+    def publish(
+        self, artifacts: Dict[str, Any], metadata: Dict[str, Any], arrays: Optional[Dict[str, np.ndarray]] = None
+    ) -> Dict[str, Any]:
+        """
+        Publish a new version and make it current.
+
+        Args:
+            artifacts: Name -> picklable object (e.g. "importance", "scaler")
+            arrays: Pickle-free export of the same models, saved as model.npz
+            metadata: Training metadata stored in the manifest; its "version"
+                is used as the version number unless already taken
+
+        Returns:
+            Manifest of the published version
+        """
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        payloads = {name: pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL) for name, obj in artifacts.items()}
+
+        tmp_dir = self.versions_dir / f".tmp-{os.getpid()}-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        tmp_dir.mkdir()
+        try:
+            files = {}
+            for name, data in payloads.items():
+                file_name = f"{name}.pkl"
+                with open(tmp_dir / file_name, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                files[name] = {"file": file_name, "sha256": _sha256(data), "size": len(data)}
+            if arrays is not None:
+                save_model_arrays(tmp_dir / "model.npz", arrays)
+                files[ARRAYS_ARTIFACT] = {
+                    "file": "model.npz",
+                    "sha256": _file_sha256(tmp_dir / "model.npz"),
+                    "size": (tmp_dir / "model.npz").stat().st_size,
+                }
+
+            # Запрошенный номер, если он свободен, иначе следующий после существующих
+            version = max([metadata.get("version", 1) - 1, *self.list_versions()])
+            while True:
+                version += 1
+                manifest = {
+                    "version": version,
+                    "path": f"{VERSIONS_DIR}/v{version:04d}",
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "files": files,
+                    "metadata": {**metadata, "version": version},
+                }
+                (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, default=str), encoding="utf-8")
+                try:
+                    # Переименование каталога атомарно; занятый номер - другой процесс успел раньше
+                    os.rename(tmp_dir, self.models_dir / manifest["path"])
+                    break
+                except OSError:
+                    if not (self.models_dir / manifest["path"]).exists():
+                        raise
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        _write_atomic(self.manifest_path, json.dumps(manifest, indent=2, default=str).encode("utf-8"))
+        logger.info(f"Published model version {version}: {manifest['path']}")
+
+        self.prune()
+        return manifest
+
+    def load(
+        self, manifest: Optional[Dict[str, Any]] = None, names: Optional[Iterable[str]] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Load the artifacts of a version (the current one by default).
+
+        Args:
+            manifest: Version to load
+            names: Artifacts to load (all by default); "arrays" is returned as
+                a dict of read-only arrays mapped from model.npz
+
+        Raises:
+            FileNotFoundError: No published version
+            ValueError: Checksum mismatch
+        """
+        manifest = manifest or self.read_manifest()
+        if manifest is None:
+            raise FileNotFoundError(f"No model manifest in {self.models_dir}")
+
+        version_dir = self.models_dir / manifest["path"]
+        artifacts = {}
+        for name, info in manifest["files"].items():
+            if names is not None and name not in names:
+                continue
+            path = version_dir / info["file"]
+            if name == ARRAYS_ARTIFACT:
+                if _file_sha256(path) != info["sha256"]:
+                    raise ValueError(f"Checksum mismatch for {path}")
+                artifacts[name] = load_model_arrays(path)
+                continue
+            data = path.read_bytes()
+            if _sha256(data) != info["sha256"]:
+                raise ValueError(f"Checksum mismatch for {path}")
+            artifacts[name] = pickle.loads(data)
+        return artifacts, manifest
+
+    def prune(self) -> List[Path]:
+        """
+        Remove old versions beyond keep_versions.
+
+        The current version is never removed.
+
+        Returns:
+            Removed version directories
+        """
+        manifest = self.read_manifest()
+        current = manifest.get("version") if manifest else None
+        removed = []
+        for version in self.list_versions()[: -self.keep_versions]:
+            if version == current:
+                continue
+            path = self.versions_dir / f"v{version:04d}"
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+        if removed:
+            logger.info(f"Pruned {len(removed)} old model versions")
+        return removed
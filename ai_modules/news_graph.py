@@ -2,27 +2,392 @@
 News Graph System - связывание новостей и создание контекста историй.
 
 Создаёт граф связей между новостями и предоставляет контекст для дайджестов.
+
+Ключевые слова и сущности извлекаются один раз при сохранении новости
+(колонки ``news.keywords`` / ``news.entities``). ``NewsTermIndex`` держит
+инвертированный индекс по ним за скользящее окно (по умолчанию 30 дней),
+догружает только новые строки и вытесняет устаревшие, поэтому поиск связанных
+новостей - это обход posting-листов вместо выборки и разбора сотни строк.
 """
 
 import logging
-from typing import Dict, List, Any
+import re
+import threading
+import time
+from typing import Dict, List, Any, Optional, Set, Tuple
 from datetime import datetime, timedelta, timezone
-from collections import Counter
+from collections import Counter, defaultdict
 
 logger = logging.getLogger(__name__)
 
+STOP_WORDS = {
+    "the",
+    "and",
+    "or",
+    "but",
+    "in",
+    "on",
+    "at",
+    "to",
+    "for",
+    "of",
+    "with",
+    "by",
+    "а",
+    "и",
+    "или",
+    "но",
+    "в",
+    "на",
+    "к",
+    "для",
+    "о",
+    "с",
+    "по",
+}
+
+_ENTITY_RE = re.compile(r"\b[A-ZА-Я][a-zа-я]+\b")
+
+SIMILARITY_THRESHOLD = 0.3
+DEFAULT_WINDOW_DAYS = 30
+LINKS_BATCH_SIZE = 500
+
+# Поля новости, которые индекс хранит для выдачи (без content)
+INDEXED_NEWS_FIELDS = (
+    "id",
+    "title",
+    "link",
+    "source",
+    "category",
+    "subcategory",
+    "importance",
+    "credibility",
+    "published_at",
+    "created_at",
+)
+
+
+def extract_keywords(news_item: Dict) -> List[str]:
+    """Извлекает ключевые слова из новости (10 самых частых слов длиннее 3 символов)."""
+    text = f"{news_item.get('title', '')} {news_item.get('content', '')}".lower()
+
+    # Простое извлечение ключевых слов (можно улучшить)
+    words = text.split()
+    # Убираем стоп-слова и короткие слова
+    keywords = [w for w in words if len(w) > 3 and w not in STOP_WORDS]
+
+    # Возвращаем наиболее частые слова
+    return [word for word, count in Counter(keywords).most_common(10)]
+
+
+def extract_entities(news_item: Dict) -> List[str]:
+    """Извлекает именованные сущности из новости."""
+    # Простая реализация - можно улучшить с помощью NER
+    text = f"{news_item.get('title', '')} {news_item.get('content', '')}"
+
+    # Извлекаем слова с заглавной буквы как потенциальные сущности
+    entities = _ENTITY_RE.findall(text)
+    return list(set(entities[:10]))  # Убираем дубликаты и ограничиваем
+
+
+def extract_news_terms(news_item: Dict) -> Dict[str, List[str]]:
+    """
+    Термины новости для сохранения при ingest.
+
+    Returns:
+        {"keywords": [...], "entities": [...]} - готово для записи в строку news
+    """
+    return {"keywords": extract_keywords(news_item), "entities": extract_entities(news_item)}
+
+
+def _parse_ts(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _similarity(
+    keyword_overlap: int,
+    keyword_total: int,
+    entity_overlap: int,
+    entity_total: int,
+    same_category: bool,
+    same_source: bool,
+) -> float:
+    """Взвешенная схожесть по размерам пересечений и объединений множеств."""
+    keyword_sim = keyword_overlap / keyword_total if keyword_total > 0 else 0
+    entity_sim = entity_overlap / entity_total if entity_total > 0 else 0
+    category_sim = 1.0 if same_category else 0.0
+    source_sim = 1.0 if same_source else 0.0
+
+    similarity = keyword_sim * 0.4 + entity_sim * 0.3 + category_sim * 0.2 + source_sim * 0.1
+    return min(similarity, 1.0)
+
+
+class NewsTermIndex:
+    """
+    Инвертированный индекс ключевых слов и сущностей за скользящее окно.
+
+    - первая загрузка: keyset-пагинация по ``created_at`` за всё окно;
+    - далее ``refresh()`` догружает только строки новее водяной отметки
+      (не чаще ``refresh_interval`` секунд) и вытесняет вышедшие из окна;
+    - для старых строк без сохранённых терминов они извлекаются один раз при загрузке.
+
+    Потокобезопасен: поиск вызывается из пула потоков генерации дайджестов.
+    """
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, supabase_client, window_days: int = DEFAULT_WINDOW_DAYS, refresh_interval: float = 60.0):
+        self.supabase = supabase_client
+        self.window_days = window_days
+        self.refresh_interval = refresh_interval
+
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._keywords: Dict[Any, Set[str]] = {}
+        self._entities: Dict[Any, Set[str]] = {}
+        self._created: Dict[Any, datetime] = {}
+        self._keyword_postings: Dict[str, Set[Any]] = defaultdict(set)
+        self._entity_postings: Dict[str, Set[Any]] = defaultdict(set)
+
+        self._watermark: Optional[str] = None
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # --- Обновление ---
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Добавить (или обновить) новость в индексе."""
+        news_id = row.get("id")
+        if news_id is None:
+            return
+
+        keywords = row.get("keywords")
+        entities = row.get("entities")
+        if keywords is None or entities is None:
+            terms = extract_news_terms(row)
+            keywords = terms["keywords"] if keywords is None else keywords
+            entities = terms["entities"] if entities is None else entities
+
+        with self._lock:
+            self.remove(news_id)
+            self._docs[news_id] = {field: row.get(field) for field in INDEXED_NEWS_FIELDS}
+            self._keywords[news_id] = set(keywords)
+            self._entities[news_id] = set(entities)
+            self._created[news_id] = _parse_ts(row.get("created_at")) or datetime.now(timezone.utc)
+            for keyword in self._keywords[news_id]:
+                self._keyword_postings[keyword].add(news_id)
+            for entity in self._entities[news_id]:
+                self._entity_postings[entity].add(news_id)
+
+    def remove(self, news_id: Any) -> None:
+        """Удалить новость из индекса."""
+        with self._lock:
+            if news_id not in self._docs:
+                return
+            for keyword in self._keywords.pop(news_id, ()):
+                self._discard(self._keyword_postings, keyword, news_id)
+            for entity in self._entities.pop(news_id, ()):
+                self._discard(self._entity_postings, entity, news_id)
+            self._docs.pop(news_id, None)
+            self._created.pop(news_id, None)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[Any]], term: str, news_id: Any) -> None:
+        posting = postings.get(term)
+        if posting is not None:
+            posting.discard(news_id)
+            if not posting:
+                del postings[term]
+
+    def evict_older_than(self, cutoff: datetime) -> int:
+        """Вытеснить новости, созданные раньше cutoff."""
+        with self._lock:
+            expired = [news_id for news_id, created in self._created.items() if created < cutoff]
+            for news_id in expired:
+                self.remove(news_id)
+        return len(expired)
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Догрузить новые строки из БД и вытеснить устаревшие.
+
+        Returns:
+            Количество загруженных строк
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._watermark is not None and now - self._last_refresh < self.refresh_interval:
+                return 0
+
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.window_days)
+            since = self._watermark or cutoff.isoformat()
+            loaded = 0
+
+            while True:
+                rows = (
+                    self.supabase.table("news")
+                    .select(",".join(INDEXED_NEWS_FIELDS + ("content", "keywords", "entities")))
+                    .gte("created_at", since)
+                    .order("created_at")
+                    .limit(self.PAGE_SIZE)
+                    .execute()
+                ).data or []
+
+                new_rows = [row for row in rows if row.get("id") not in self._docs or row.get("created_at") != since]
+                for row in new_rows:
+                    self.add(row)
+                loaded += len(new_rows)
+
+                if rows:
+                    since = rows[-1].get("created_at") or since
+                if len(rows) < self.PAGE_SIZE or not new_rows:
+                    break
+
+            self._watermark = since
+            self._last_refresh = now
+            evicted = self.evict_older_than(cutoff)
+
+        if loaded or evicted:
+            logger.info(f"News term index: +{loaded} / -{evicted}, size={len(self._docs)}")
+        return loaded
+
+    # --- Поиск ---
+
+    def news_since(self, cutoff: datetime) -> List[Dict[str, Any]]:
+        """Новости индекса, созданные не раньше cutoff (с их терминами), новые первыми."""
+        with self._lock:
+            ids = sorted(
+                (news_id for news_id, created in self._created.items() if created >= cutoff),
+                key=lambda news_id: self._created[news_id],
+                reverse=True,
+            )
+            return [
+                {
+                    **self._docs[news_id],
+                    "keywords": list(self._keywords[news_id]),
+                    "entities": list(self._entities[news_id]),
+                }
+                for news_id in ids
+            ]
+
+    def find_related(
+        self,
+        news_item: Dict,
+        keywords: List[str],
+        entities: List[str],
+        cutoff: Optional[datetime] = None,
+        max_results: int = 5,
+        threshold: float = SIMILARITY_THRESHOLD,
+    ) -> List[Dict[str, Any]]:
+        """
+        Связанные новости через posting-листы общих ключевых слов и сущностей.
+
+        Кандидаты - только новости, с которыми есть хотя бы один общий термин.
+        """
+        keywords_set, entities_set = set(keywords), set(entities)
+        exclude_id = news_item.get("id")
+
+        with self._lock:
+            keyword_hits: Counter = Counter()
+            for keyword in keywords_set:
+                keyword_hits.update(self._keyword_postings.get(keyword, ()))
+            entity_hits: Counter = Counter()
+            for entity in entities_set:
+                entity_hits.update(self._entity_postings.get(entity, ()))
+
+            scored: List[Tuple[float, Any]] = []
+            for news_id in keyword_hits.keys() | entity_hits.keys():
+                if news_id == exclude_id:
+                    continue
+                if cutoff is not None and self._created[news_id] < cutoff:
+                    continue
+
+                doc = self._docs[news_id]
+                k_overlap, e_overlap = keyword_hits[news_id], entity_hits[news_id]
+                score = _similarity(
+                    k_overlap,
+                    len(keywords_set) + len(self._keywords[news_id]) - k_overlap,
+                    e_overlap,
+                    len(entities_set) + len(self._entities[news_id]) - e_overlap,
+                    news_item.get("category") == doc.get("category"),
+                    news_item.get("source") == doc.get("source"),
+                )
+                if score > threshold:
+                    scored.append((score, news_id))
+
+            top = sorted(scored, key=lambda x: (-x[0], -self._created[x[1]].timestamp()))[:max_results]
+
+            results = []
+            for score, news_id in top:
+                keyword_overlap = list(keywords_set & self._keywords[news_id])
+                entity_overlap = list(entities_set & self._entities[news_id])
+                results.append(
+                    {
+                        **self._docs[news_id],
+                        "similarity_score": score,
+                        "keywords_overlap": {
+                            "overlap_count": len(keyword_overlap),
+                            "overlap_words": keyword_overlap[:5],
+                        },
+                        "entities_overlap": {
+                            "overlap_count": len(entity_overlap),
+                            "overlap_entities": entity_overlap[:5],
+                        },
+                    }
+                )
+            return results
+
+
+# Индексы по клиенту Supabase (один на процесс)
+_term_indexes: Dict[int, NewsTermIndex] = {}
+_term_indexes_lock = threading.Lock()
+
+
+def get_term_index(supabase_client, window_days: int = DEFAULT_WINDOW_DAYS) -> NewsTermIndex:
+    """Общий индекс терминов для клиента Supabase (окно расширяется при необходимости)."""
+    with _term_indexes_lock:
+        index = _term_indexes.get(id(supabase_client))
+        if index is None or index.supabase is not supabase_client:
+            index = NewsTermIndex(supabase_client, window_days=window_days)
+            _term_indexes[id(supabase_client)] = index
+        elif window_days > index.window_days:
+            index.window_days = window_days
+            index._watermark = None  # Полная догрузка расширенного окна
+        return index
+
 
 class NewsGraphBuilder:
     """Строит граф связей между новостями."""
 
-    def __init__(self, supabase_client):
+    def __init__(self, supabase_client, term_index: Optional[NewsTermIndex] = None):
         self.supabase = supabase_client
+        self._term_index = term_index
+
+    @property
+    def term_index(self) -> NewsTermIndex:
+        """Общий инвертированный индекс терминов (создаётся лениво)."""
+        if self._term_index is None:
+            self._term_index = get_term_index(self.supabase)
+        return self._term_index
 
     def find_related_news(
-        self, current_news: Dict, lookback_days: int = 30, max_results: int = 5
+        self, current_news: Dict, lookback_days: int = DEFAULT_WINDOW_DAYS, max_results: int = 5
     ) -> List[Dict[str, Any]]:
         """
-        Находит связанные новости по ключевым словам и семантике.
+        Находит связанные новости по ключевым словам и сущностям.
+
+        Поиск идёт по инвертированному индексу за всё окно lookback_days:
+        кандидаты - новости, разделяющие с текущей хотя бы один термин.
 
         Args:
             current_news: Текущая новость (словарь с полями title, content, etc.)
@@ -33,57 +398,27 @@ class NewsGraphBuilder:
             Список связанных новостей с метриками схожести
         """
         try:
-            # Получаем новости за последние N дней
-            start_date = (datetime.now(timezone.utc) - timedelta(days=lookback_days)).isoformat()
-
-            # Исключаем текущую новость если у неё есть ID
-            query = (
-                self.supabase.table("news")
-                .select("*")
-                .gte("created_at", start_date)
-                .order("created_at", desc=True)
-                .limit(100)
-            )  # Ограничиваем для производительности
+            index = self.term_index
+            if lookback_days > index.window_days:
+                index = self._term_index = get_term_index(self.supabase, window_days=lookback_days)
+            index.refresh()
 
-            if current_news.get("id"):
-                query = query.neq("id", current_news["id"])
-
-            result = query.execute()
-            candidates = result.data or []
-
-            if not candidates:
+            if not len(index):
                 logger.info("No news candidates found for graph building")
                 return []
 
-            # Вычисляем схожесть
-            scored_news = []
-            current_keywords = self._extract_keywords(current_news)
-            current_entities = self._extract_entities(current_news)
+            keywords = current_news.get("keywords")
+            entities = current_news.get("entities")
+            if keywords is None:
+                keywords = self._extract_keywords(current_news)
+            if entities is None:
+                entities = self._extract_entities(current_news)
 
-            for news_item in candidates:
-                similarity_score = self._calculate_similarity(
-                    current_news, news_item, current_keywords, current_entities
-                )
+            cutoff = datetime.now(timezone.utc) - timedelta(days=lookback_days)
+            related = index.find_related(current_news, keywords, entities, cutoff=cutoff, max_results=max_results)
 
-                if similarity_score > 0.3:  # Порог схожести
-                    scored_news.append(
-                        {
-                            **news_item,
-                            "similarity_score": similarity_score,
-                            "keywords_overlap": self._get_keywords_overlap(
-                                current_keywords, self._extract_keywords(news_item)
-                            ),
-                            "entities_overlap": self._get_entities_overlap(
-                                current_entities, self._extract_entities(news_item)
-                            ),
-                        }
-                    )
-
-            # Сортируем по схожести и возвращаем топ результаты
-            scored_news.sort(key=lambda x: x["similarity_score"], reverse=True)
-
-            logger.info(f"Found {len(scored_news)} related news items for story context")
-            return scored_news[:max_results]
+            logger.info(f"Found {len(related)} related news items for story context")
+            return related
 
         except Exception as e:
             logger.error(f"Error finding related news: {e}")
@@ -147,103 +482,85 @@ class NewsGraphBuilder:
         Returns:
             True если успешно сохранено
         """
-        try:
-            # Обеспечиваем правильный порядок ID для уникальности
-            if news_id_1 > news_id_2:
-                news_id_1, news_id_2 = news_id_2, news_id_1
-
-            link_data = {
-                "news_id_1": news_id_1,
-                "news_id_2": news_id_2,
-                "link_type": link_type,
-                "similarity_score": similarity_score,
-                "keywords_overlap": keywords_overlap or {},
-                "entities_overlap": entities_overlap or {},
-            }
+        link = {
+            "news_id_1": news_id_1,
+            "news_id_2": news_id_2,
+            "link_type": link_type,
+            "similarity_score": similarity_score,
+            "keywords_overlap": keywords_overlap,
+            "entities_overlap": entities_overlap,
+        }
+        return self.save_news_links_batch([link]) == 1
 
-            # Используем upsert чтобы избежать дубликатов
-            self.supabase.table("news_links").upsert(link_data, on_conflict="news_id_1,news_id_2").execute()
+    def save_news_links_batch(self, links: List[Dict[str, Any]], batch_size: int = LINKS_BATCH_SIZE) -> int:
+        """
+        Сохраняет пачку связей одним upsert на batch_size строк.
 
-            logger.info(f"Saved news link: {news_id_1} <-> {news_id_2} (score: {similarity_score:.3f})")
-            return True
+        Пары нормализуются (news_id_1 < news_id_2), дубликаты внутри пачки
+        схлопываются с сохранением максимальной оценки.
 
-        except Exception as e:
-            logger.error(f"Error saving news link: {e}")
-            return False
+        Returns:
+            Количество сохранённых связей
+        """
+        rows: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for link in links:
+            id_1, id_2 = str(link["news_id_1"]), str(link["news_id_2"])
+            if id_1 == id_2:
+                continue
+            # Обеспечиваем правильный порядок ID для уникальности
+            if id_1 > id_2:
+                id_1, id_2 = id_2, id_1
+
+            row = {
+                "news_id_1": id_1,
+                "news_id_2": id_2,
+                "link_type": link.get("link_type", "related"),
+                "similarity_score": link.get("similarity_score", 0.0),
+                "keywords_overlap": link.get("keywords_overlap") or {},
+                "entities_overlap": link.get("entities_overlap") or {},
+            }
+            existing = rows.get((id_1, id_2))
+            if existing is None or row["similarity_score"] > existing["similarity_score"]:
+                rows[(id_1, id_2)] = row
+
+        batch = list(rows.values())
+        saved = 0
+        for start in range(0, len(batch), batch_size):
+            chunk = batch[start : start + batch_size]
+            try:
+                # Используем upsert чтобы избежать дубликатов
+                self.supabase.table("news_links").upsert(chunk, on_conflict="news_id_1,news_id_2").execute()
+                saved += len(chunk)
+            except Exception as e:
+                logger.error(f"Error saving news links batch ({len(chunk)} rows): {e}")
+
+        if saved:
+            logger.info(f"Saved {saved} news links")
+        return saved
 
     def _extract_keywords(self, news_item: Dict) -> List[str]:
         """Извлекает ключевые слова из новости."""
-        text = f"{news_item.get('title', '')} {news_item.get('content', '')}".lower()
-
-        # Простое извлечение ключевых слов (можно улучшить)
-        words = text.split()
-        # Убираем стоп-слова и короткие слова
-        stop_words = {
-            "the",
-            "and",
-            "or",
-            "but",
-            "in",
-            "on",
-            "at",
-            "to",
-            "for",
-            "of",
-            "with",
-            "by",
-            "а",
-            "и",
-            "или",
-            "но",
-            "в",
-            "на",
-            "к",
-            "для",
-            "о",
-            "с",
-            "по",
-        }
-        keywords = [w for w in words if len(w) > 3 and w not in stop_words]
-
-        # Возвращаем наиболее частые слова
-        return [word for word, count in Counter(keywords).most_common(10)]
+        return extract_keywords(news_item)
 
     def _extract_entities(self, news_item: Dict) -> List[str]:
         """Извлекает именованные сущности из новости."""
-        # Простая реализация - можно улучшить с помощью NER
-        text = f"{news_item.get('title', '')} {news_item.get('content', '')}"
-
-        # Извлекаем слова с заглавной буквы как потенциальные сущности
-        import re
-
-        entities = re.findall(r"\b[A-ZА-Я][a-zа-я]+\b", text)
-        return list(set(entities[:10]))  # Убираем дубликаты и ограничиваем
+        return extract_entities(news_item)
 
     def _calculate_similarity(self, news1: Dict, news2: Dict, keywords1: List[str], entities1: List[str]) -> float:
         """Вычисляет схожесть между двумя новостями."""
         keywords2 = self._extract_keywords(news2)
         entities2 = self._extract_entities(news2)
 
-        # Схожесть по ключевым словам
-        keyword_overlap = len(set(keywords1) & set(keywords2))
-        keyword_total = len(set(keywords1) | set(keywords2))
-        keyword_sim = keyword_overlap / keyword_total if keyword_total > 0 else 0
-
-        # Схожесть по сущностям
-        entity_overlap = len(set(entities1) & set(entities2))
-        entity_total = len(set(entities1) | set(entities2))
-        entity_sim = entity_overlap / entity_total if entity_total > 0 else 0
-
-        # Схожесть по категории
-        category_sim = 1.0 if news1.get("category") == news2.get("category") else 0.0
-
-        # Схожесть по источнику
-        source_sim = 1.0 if news1.get("source") == news2.get("source") else 0.0
-
-        # Взвешенная сумма
-        similarity = keyword_sim * 0.4 + entity_sim * 0.3 + category_sim * 0.2 + source_sim * 0.1
-
-        return min(similarity, 1.0)
+        keywords1, keywords2 = set(keywords1), set(keywords2)
+        entities1, entities2 = set(entities1), set(entities2)
+        return _similarity(
+            len(keywords1 & keywords2),
+            len(keywords1 | keywords2),
+            len(entities1 & entities2),
+            len(entities1 | entities2),
+            news1.get("category") == news2.get("category"),
+            news1.get("source") == news2.get("source"),
+        )
 
     def _get_keywords_overlap(self, keywords1: List[str], keywords2: List[str]) -> Dict:
         """Возвращает пересечение ключевых слов."""
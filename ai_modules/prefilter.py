@@ -11,8 +11,24 @@ from pathlib import Path
 from typing import Dict, Optional
 from dataclasses import dataclass
 
+from ai_modules.keyword_matcher import RulesFileWatcher, get_keyword_matcher
+
 logger = logging.getLogger("prefilter")
 
+# Boost score for certain high-impact keywords
+HIGH_IMPACT_KEYWORDS = [
+    "breaking",
+    "urgent",
+    "critical",
+    "major",
+    "significant",
+    "unprecedented",
+    "historic",
+    "record",
+    "first",
+    "new",
+]
+
 
 @dataclass
 class PrefilterResult:
@@ -33,11 +49,32 @@ class Prefilter:
 
     def __init__(self, config_path: Optional[str] = None):
         """Initialize prefilter with configuration."""
-        self.config = self._load_config(config_path)
+        if config_path is None:
+            config_path = Path(__file__).parent.parent / "config" / "ai_optimization.yaml"
+        self.config_path = config_path
+        self._rules_watcher = RulesFileWatcher(config_path)
+        self._apply_config(self._load_config(config_path))
+
+    def _apply_config(self, config: Dict) -> None:
+        """Apply configuration and compile all marker lists into one matcher."""
+        self.config = config
         self.stop_markers = set(self.config.get("prefilter", {}).get("stop_markers", []))
         self.importance_markers = self.config.get("prefilter", {}).get("importance_markers", {})
         self.min_title_words = self.config.get("prefilter", {}).get("min_title_words", 6)
 
+        groups = {"stop": sorted(self.stop_markers), "high_impact": HIGH_IMPACT_KEYWORDS}
+        for category, markers in (self.importance_markers or {}).items():
+            groups[f"importance:{category}"] = [marker.lower() for marker in markers or []]
+        self.matcher = get_keyword_matcher(groups)
+
+    def reload_if_changed(self) -> bool:
+        """Reload rules if the YAML file changed on disk."""
+        if not self._rules_watcher.changed():
+            return False
+        self._apply_config(self._load_config(self.config_path))
+        logger.info(f"Prefilter rules reloaded from {self.config_path}")
+        return True
+
     def _load_config(self, config_path: Optional[str] = None) -> Dict:
         """Load configuration from YAML file."""
         if config_path is None:
@@ -63,6 +100,8 @@ class Prefilter:
         Returns:
             PrefilterResult with pass/fail decision and reason
         """
+        self.reload_if_changed()
+
         title = news_item.get("title", "").strip()
         content = news_item.get("content", "") or news_item.get("summary", "")
         category = news_item.get("category", "").lower()
@@ -71,13 +110,11 @@ class Prefilter:
         if len(title.split()) < self.min_title_words:
             return PrefilterResult(passed=False, reason="pre_filter", score=0.0)
 
-        # Check for stop markers
-        title_lower = title.lower()
-        content_lower = content.lower()
-
-        for marker in self.stop_markers:
-            if marker in title_lower or marker in content_lower:
-                return PrefilterResult(passed=False, reason="pre_filter", score=0.0)
+        # Check for stop markers (title and content are scanned in one pass;
+        # "\x00" keeps markers from matching across the boundary)
+        hits = self.matcher.find(f"{title.lower()}\x00{content.lower()}")
+        if hits.get("stop"):
+            return PrefilterResult(passed=False, reason="pre_filter", score=0.0)
 
         # Calculate relevance score based on importance markers
         score = self._calculate_relevance_score(title, content, category)
@@ -104,37 +141,16 @@ class Prefilter:
         score = 0.2
         text = f"{title} {content}".lower()
 
-        # Get category-specific markers
-        markers = self.importance_markers.get(category, [])
-
-        # Count marker matches
-        matches = 0
-        for marker in markers:
-            if marker.lower() in text:
-                matches += 1
+        # Category-specific marker matches and high-impact keywords in one pass
+        counts = self.matcher.count(text)
+        matches = counts.get(f"importance:{category}", 0)
 
         # Calculate score based on matches
         if matches > 0:
             score = min(0.8, 0.3 + (matches * 0.1))  # Base 0.3 + 0.1 per match
 
-        # Boost score for certain high-impact keywords
-        high_impact_keywords = [
-            "breaking",
-            "urgent",
-            "critical",
-            "major",
-            "significant",
-            "unprecedented",
-            "historic",
-            "record",
-            "first",
-            "new",
-        ]
-
-        for keyword in high_impact_keywords:
-            if keyword in text:
-                score = min(1.0, score + 0.2)
-                break
+        if counts["high_impact"]:
+            score = min(1.0, score + 0.2)
 
         return score
 
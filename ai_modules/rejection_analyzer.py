@@ -3,20 +3,119 @@ Rejection Analyzer for Auto-Learning Filter.
 
 This module analyzes rejected news items from logs/rejected.log
 to identify patterns and generate recommendations for rule updates.
+
+The log is not re-read on every analysis: running counters by category,
+source, reason and title word are kept in logs/rejection_state.json together
+with a checkpoint (inode + byte offset) of the log, and only lines appended
+since the previous run are parsed. Delete the state file to recount the
+whole log.
 """
 
 import json
 import logging
+import os
 import re
 from collections import Counter, defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import yaml
 
+from utils.system.log_tail import TailCheckpoint, follow_lines
+
 logger = logging.getLogger("rejection_analyzer")
 
+STATE_VERSION = 1
+DEFAULT_MAX_TRACKED_WORDS = 20000
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class RejectionAggregates:
+    """Running counters over all rejected items seen so far."""
+
+    total: int = 0
+    categories: Counter = field(default_factory=Counter)
+    sources: Counter = field(default_factory=Counter)
+    reasons: Counter = field(default_factory=Counter)
+    words: Counter = field(default_factory=Counter)
+    source_categories: Dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    first_timestamp: Optional[str] = None
+    last_timestamp: Optional[str] = None
+    timestamps: int = 0
+
+    def add(self, item: Dict, words: Iterable[str]) -> None:
+        category = item.get("category", "unknown")
+        source = item.get("source", "unknown")
+
+        self.total += 1
+        self.categories[category] += 1
+        self.sources[source] += 1
+        self.reasons[item.get("reason", "unknown")] += 1
+        self.source_categories[source][category] += 1
+        self.words.update(words)
+
+        dt = _parse_timestamp(item.get("timestamp", ""))
+        if dt is not None:
+            self.timestamps += 1
+            if self.first_timestamp is None or dt < datetime.fromisoformat(self.first_timestamp):
+                self.first_timestamp = dt.isoformat()
+            if self.last_timestamp is None or dt > datetime.fromisoformat(self.last_timestamp):
+                self.last_timestamp = dt.isoformat()
+
+    def prune_words(self, max_words: int) -> None:
+        """Keep the state small: drop the rarest words once there are more than ``max_words``."""
+        if len(self.words) > max_words:
+            self.words = Counter(dict(self.words.most_common(max_words // 2)))
+
+    def period_days(self) -> int:
+        if not self.total:
+            return 0
+        if self.timestamps < 2:
+            return 1
+        first = datetime.fromisoformat(self.first_timestamp)
+        last = datetime.fromisoformat(self.last_timestamp)
+        return max(1, (last - first).days + 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "categories": dict(self.categories),
+            "sources": dict(self.sources),
+            "reasons": dict(self.reasons),
+            "words": dict(self.words),
+            "source_categories": {source: dict(counter) for source, counter in self.source_categories.items()},
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+            "timestamps": self.timestamps,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RejectionAggregates":
+        source_categories = defaultdict(Counter)
+        for source, counter in data.get("source_categories", {}).items():
+            source_categories[source] = Counter(counter)
+        return cls(
+            total=data.get("total", 0),
+            categories=Counter(data.get("categories", {})),
+            sources=Counter(data.get("sources", {})),
+            reasons=Counter(data.get("reasons", {})),
+            words=Counter(data.get("words", {})),
+            source_categories=source_categories,
+            first_timestamp=data.get("first_timestamp"),
+            last_timestamp=data.get("last_timestamp"),
+            timestamps=data.get("timestamps", 0),
+        )
+
 
 class RejectionAnalyzer:
     """
@@ -31,12 +130,16 @@ class RejectionAnalyzer:
         self.config = self._load_config(config_path)
         self.rejected_log_path = Path("logs/rejected.log")
         self.analysis_output_path = Path("logs/rejection_analysis.json")
+        self.state_path = Path("logs/rejection_state.json")
 
         # Configuration parameters
         self.top_words_limit = self.config.get("rejection_analysis", {}).get("top_words_limit", 50)
         self.top_sources_limit = self.config.get("rejection_analysis", {}).get("top_sources_limit", 20)
         self.frequency_threshold = self.config.get("rejection_analysis", {}).get("frequency_threshold", 0.02)
         self.min_samples = self.config.get("features", {}).get("auto_learn_min_samples", 100)
+        self.max_tracked_words = self.config.get("rejection_analysis", {}).get(
+            "max_tracked_words", DEFAULT_MAX_TRACKED_WORDS
+        )
 
     def _load_config(self, config_path: Optional[str] = None) -> Dict:
         """Load configuration from YAML file."""
@@ -53,44 +156,82 @@ class RejectionAnalyzer:
             logger.error(f"Error loading config: {e}")
             return {}
 
-    def _parse_rejected_log(self) -> List[Dict]:
+    def _iter_new_items(self, checkpoint: TailCheckpoint) -> Iterator[Dict]:
         """
-        Parse rejected.log and extract structured data.
+        Parse lines appended to rejected.log since ``checkpoint``.
 
         Expected log format:
         [timestamp] REJECTED: reason=pre_filter category=crypto source=example.com title="Bitcoin price..."
 
+        Yields:
+            Dictionaries with parsed rejection data
+        """
+        for line in follow_lines(self.rejected_log_path, checkpoint):
+            line = line.strip()
+            if not line or not line.startswith("["):
+                continue
+
+            try:
+                # Parse log line format
+                parsed = self._parse_log_line(line)
+                if parsed:
+                    yield parsed
+            except Exception as e:
+                logger.warning(f"Error parsing line at offset {checkpoint.offset}: {e}")
+                continue
+
+    def _load_state(self) -> Tuple[TailCheckpoint, RejectionAggregates]:
+        """Checkpoint and running aggregates from the previous run."""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") == STATE_VERSION:
+                return TailCheckpoint.from_dict(state.get("checkpoint")), RejectionAggregates.from_dict(state)
+            logger.info("Rejection state has another version, recounting rejected.log")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Error reading rejection state, recounting rejected.log: {e}")
+        return TailCheckpoint(), RejectionAggregates()
+
+    def _save_state(self, checkpoint: TailCheckpoint, aggregates: RejectionAggregates) -> None:
+        """Save checkpoint and aggregates together (atomically, so they always match)."""
+        try:
+            self.state_path.parent.mkdir(exist_ok=True)
+            state = {"version": STATE_VERSION, "checkpoint": checkpoint.to_dict(), **aggregates.to_dict()}
+            tmp_path = self.state_path.with_name(f".{self.state_path.name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Error saving rejection state: {e}")
+
+    def update_aggregates(self) -> RejectionAggregates:
+        """
+        Add lines appended to rejected.log since the last run to the running aggregates.
+
         Returns:
-            List of dictionaries with parsed rejection data
+            Aggregates over the whole log history
         """
-        rejected_items = []
+        checkpoint, aggregates = self._load_state()
 
-        if not self.rejected_log_path.exists():
+        if not self.rejected_log_path.exists() and not checkpoint.inode:
             logger.warning("rejected.log not found, returning empty analysis")
-            return rejected_items
+            return aggregates
 
+        new_items = 0
         try:
-            with open(self.rejected_log_path, "r", encoding="utf-8") as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if not line or not line.startswith("["):
-                        continue
-
-                    try:
-                        # Parse log line format
-                        parsed = self._parse_log_line(line)
-                        if parsed:
-                            rejected_items.append(parsed)
-                    except Exception as e:
-                        logger.warning(f"Error parsing line {line_num}: {e}")
-                        continue
-
-            logger.info(f"Parsed {len(rejected_items)} rejected items from log")
-
+            for item in self._iter_new_items(checkpoint):
+                aggregates.add(item, self._extract_words_from_title(item.get("title", "")))
+                new_items += 1
         except Exception as e:
+            # Уже учтённые строки сохраняем вместе с их смещением
             logger.error(f"Error reading rejected.log: {e}")
 
-        return rejected_items
+        aggregates.prune_words(self.max_tracked_words)
+        self._save_state(checkpoint, aggregates)
+        logger.info(f"Parsed {new_items} new rejected items from log ({aggregates.total} total)")
+        return aggregates
 
     def _parse_log_line(self, line: str) -> Optional[Dict]:
         """
@@ -212,45 +353,25 @@ class RejectionAnalyzer:
         """
         logger.info("Starting rejection analysis...")
 
-        # Parse rejected items from log
-        rejected_items = self._parse_rejected_log()
+        # Count items appended to the log since the last run
+        aggregates = self.update_aggregates()
 
-        if len(rejected_items) < self.min_samples:
-            logger.info(f"Not enough samples for analysis: {len(rejected_items)} < {self.min_samples}")
+        if aggregates.total < self.min_samples:
+            logger.info(f"Not enough samples for analysis: {aggregates.total} < {self.min_samples}")
             return self._create_empty_analysis()
 
-        # Initialize counters
-        category_counter = Counter()
-        source_counter = Counter()
-        reason_counter = Counter()
-        word_counter = Counter()
-        source_category_counter = defaultdict(Counter)
-
-        # Analyze each rejected item
-        for item in rejected_items:
-            category = item.get("category", "unknown")
-            source = item.get("source", "unknown")
-            reason = item.get("reason", "unknown")
-            title = item.get("title", "")
-
-            # Count categories, sources, reasons
-            category_counter[category] += 1
-            source_counter[source] += 1
-            reason_counter[reason] += 1
-            source_category_counter[source][category] += 1
-
-            # Extract and count words from title
-            words = self._extract_words_from_title(title)
-            for word in words:
-                word_counter[word] += 1
-
-        total_items = len(rejected_items)
+        category_counter = aggregates.categories
+        source_counter = aggregates.sources
+        reason_counter = aggregates.reasons
+        word_counter = aggregates.words
+        source_category_counter = aggregates.source_categories
+        total_items = aggregates.total
 
         # Calculate statistics
         analysis = {
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "total_rejected_items": total_items,
-            "analysis_period_days": self._calculate_analysis_period(rejected_items),
+            "analysis_period_days": aggregates.period_days(),
             # Top categories by rejection count
             "top_rejected_categories": dict(category_counter.most_common(10)),
             # Top sources by rejection count
@@ -262,7 +383,7 @@ class RejectionAnalyzer:
             # Word frequency analysis
             "word_frequency_analysis": self._analyze_word_frequency(word_counter, total_items),
             # Source-category patterns
-            "source_category_patterns": dict(source_category_counter),
+            "source_category_patterns": {source: dict(counter) for source, counter in source_category_counter.items()},
             # Recommendations
             "recommendations": self._generate_recommendations(
                 word_counter, source_counter, reason_counter, total_items
@@ -277,37 +398,6 @@ class RejectionAnalyzer:
 
         return analysis
 
-    def _calculate_analysis_period(self, rejected_items: List[Dict]) -> int:
-        """Calculate analysis period in days."""
-        if not rejected_items:
-            return 0
-
-        try:
-            # Get earliest and latest timestamps
-            timestamps = []
-            for item in rejected_items:
-                timestamp_str = item.get("timestamp", "")
-                if timestamp_str:
-                    # Try to parse timestamp
-                    try:
-                        dt = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-                        timestamps.append(dt)
-                    except BaseException:
-                        continue
-
-            if len(timestamps) < 2:
-                return 1
-
-            earliest = min(timestamps)
-            latest = max(timestamps)
-            period = (latest - earliest).days + 1
-
-            return max(1, period)
-
-        except Exception as e:
-            logger.warning(f"Error calculating analysis period: {e}")
-            return 1
-
     def _analyze_word_frequency(self, word_counter: Counter, total_items: int) -> Dict:
         """Analyze word frequency patterns."""
         frequency_analysis = {}
@@ -15,6 +15,8 @@ from typing import Dict, List, Optional, Any
 
 import yaml
 
+from ai_modules.feature_schema import FEATURE_COLUMNS
+
 logger = logging.getLogger("self_tuning_collector")
 
 
@@ -524,8 +526,8 @@ class SelfTuningCollector:
         if not examples:
             return
 
-        # Get all feature keys from first example
-        feature_keys = list(examples[0]["features"].keys())
+        # Frozen schema order (see ai_modules/feature_schema.py)
+        feature_keys = list(FEATURE_COLUMNS)
 
         # Define CSV columns
         columns = [
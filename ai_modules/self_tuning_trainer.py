@@ -3,14 +3,27 @@ Self-Tuning Model Trainer for Local Predictor.
 
 This module trains and manages the local predictor model using
 collected training data.
+
+Trained models are published as versioned artifacts (see
+ai_modules/model_registry.py). Long-running predictors notice a new
+manifest and load it in a background thread, swapping the whole model set
+at once, so inference never waits for a reload or sees a mix of versions.
+TrainingWorker runs the training itself in a separate process.
+
+Each version also carries model.npz (ai_modules/model_export.py): with
+artifact_format "npz" predictors map it read-only and run pure-numpy
+inference, so processes share the parameters instead of unpickling copies.
 """
 
 import json
 import logging
+import multiprocessing
 import pickle
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Tuple, Optional, Any
+from typing import Dict, List, Mapping, Sequence, Tuple, Optional, Any
 
 import pandas as pd
 import numpy as np
@@ -22,10 +35,32 @@ from sklearn.preprocessing import StandardScaler
 
 import yaml
 
+from ai_modules.feature_schema import FEATURE_COLUMNS, FEATURE_SCHEMA_VERSION, feature_matrix
+from ai_modules.keyword_matcher import RulesFileWatcher
 from ai_modules.metrics import get_metrics
+from ai_modules.model_export import export_model_arrays, numpy_models
+from ai_modules.model_registry import ARRAYS_ARTIFACT, DEFAULT_KEEP_VERSIONS, ModelRegistry
 
 logger = logging.getLogger("self_tuning_trainer")
 
+DEFAULT_RELOAD_INTERVAL = 5.0  # секунд между проверками манифеста
+
+# Формат, из которого предикторы загружают модели
+ARTIFACT_NPZ = "npz"  # model.npz через mmap, инференс на numpy
+ARTIFACT_PICKLE = "pickle"  # объекты scikit-learn
+
+
+@dataclass(frozen=True)
+class LoadedModels:
+    """Model set used for inference; replaced as a whole on reload."""
+
+    importance_model: Any = None
+    credibility_model: Any = None
+    scaler: Any = field(default_factory=StandardScaler)
+    feature_columns: Tuple[str, ...] = FEATURE_COLUMNS
+    feature_schema_version: int = FEATURE_SCHEMA_VERSION
+    version: int = 0
+
 
 class SelfTuningTrainer:
     """
@@ -35,29 +70,65 @@ class SelfTuningTrainer:
     prediction based on collected training data.
     """
 
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None, models_dir: Optional[Path] = None):
         """Initialize model trainer with configuration."""
+        self.config_path = config_path
         self.config = self._load_config(config_path)
-        self.models_dir = Path("models")
+        self.models_dir = Path(models_dir or "models")
         self.models_dir.mkdir(exist_ok=True)
 
-        # Model paths
+        # Legacy flat model files (before versioned artifacts)
         self.importance_model_path = self.models_dir / "local_predictor_importance.pkl"
         self.credibility_model_path = self.models_dir / "local_predictor_credibility.pkl"
         self.metadata_path = self.models_dir / "local_predictor_meta.json"
 
         # Configuration
-        self.model_type = self.config.get("self_tuning", {}).get("model_type", "logreg")
-        self.replace_threshold = self.config.get("self_tuning", {}).get("replace_threshold", 0.01)
-        self.backup_enabled = self.config.get("self_tuning", {}).get("backup_enabled", True)
+        self_tuning = self.config.get("self_tuning", {})
+        self.model_type = self_tuning.get("model_type", "logreg")
+        self.replace_threshold = self_tuning.get("replace_threshold", 0.01)
+        self.backup_enabled = self_tuning.get("backup_enabled", True)
+        self.keep_versions = self_tuning.get("keep_versions", DEFAULT_KEEP_VERSIONS) if self.backup_enabled else 1
+        self.artifact_format = self_tuning.get("artifact_format", ARTIFACT_NPZ)
 
         # Metrics
         self.metrics = get_metrics()
 
+        # Versioned artifacts and hot reload
+        self.registry = ModelRegistry(self.models_dir, keep_versions=self.keep_versions)
+        self._manifest_watcher = RulesFileWatcher(
+            self.registry.manifest_path, check_interval=self_tuning.get("reload_interval", DEFAULT_RELOAD_INTERVAL)
+        )
+        self._reload_lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+
         # Model instances
-        self.importance_model = None
-        self.credibility_model = None
-        self.scaler = StandardScaler()
+        self._models = LoadedModels()
+
+    @property
+    def importance_model(self):
+        return self._models.importance_model
+
+    @property
+    def credibility_model(self):
+        return self._models.credibility_model
+
+    @property
+    def scaler(self):
+        return self._models.scaler
+
+    @property
+    def feature_columns(self) -> List[str]:
+        """Column order the loaded scaler and models were fitted on."""
+        return list(self._models.feature_columns)
+
+    @property
+    def feature_schema_version(self) -> int:
+        return self._models.feature_schema_version
+
+    @property
+    def version(self) -> int:
+        """Version of the loaded models (0 - legacy files or nothing loaded)."""
+        return self._models.version
 
     def _load_config(self, config_path: Optional[str] = None) -> Dict:
         """Load configuration from YAML file."""
@@ -122,7 +193,13 @@ class SelfTuningTrainer:
                 ]
             ]
 
-            features_df = df[feature_columns].fillna(0)
+            unknown = [col for col in feature_columns if col not in FEATURE_COLUMNS]
+            missing = [col for col in FEATURE_COLUMNS if col not in feature_columns]
+            if unknown or missing:
+                logger.warning(f"Dataset columns differ from feature schema: unknown={unknown}, missing={missing}")
+
+            # Columns in schema order, not in CSV order
+            features_df = df.reindex(columns=list(FEATURE_COLUMNS)).fillna(0)
             labels_df = df[["importance_label", "credibility_label"]]
 
             logger.info(f"Loaded dataset: {len(df)} examples, {len(feature_columns)} features")
@@ -181,33 +258,27 @@ class SelfTuningTrainer:
             logger.error(f"Error evaluating {task_name} model: {e}")
             return {"f1_score": 0.0, "accuracy": 0.0, "auc": 0.0}
 
-    def _create_backup(self, model_path: Path) -> Optional[Path]:
+    def _prune_legacy_backups(self) -> List[Path]:
         """
-        Create backup of existing model.
+        Remove old ``*_backup_*.pkl`` copies of the legacy flat model files.
 
-        Args:
-            model_path: Path to model file
+        Keeps the newest keep_versions backups per model.
 
         Returns:
-            Path to backup file or None
+            Removed backup files
         """
-        if not self.backup_enabled or not model_path.exists():
-            return None
-
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = model_path.parent / f"{model_path.stem}_backup_{timestamp}.pkl"
-
-            import shutil
-
-            shutil.copy2(model_path, backup_path)
-            logger.info(f"Model backup created: {backup_path}")
-
-            return backup_path
-
-        except Exception as e:
-            logger.error(f"Error creating model backup: {e}")
-            return None
+        removed = []
+        for model_path in (self.importance_model_path, self.credibility_model_path):
+            backups = sorted(model_path.parent.glob(f"{model_path.stem}_backup_*.pkl"))
+            for backup_path in backups[: -self.keep_versions]:
+                try:
+                    backup_path.unlink()
+                    removed.append(backup_path)
+                except OSError as e:
+                    logger.warning(f"Error removing model backup {backup_path}: {e}")
+        if removed:
+            logger.info(f"Pruned {len(removed)} legacy model backups")
+        return removed
 
     def _load_existing_metadata(self) -> Dict[str, Any]:
         """
@@ -216,6 +287,10 @@ class SelfTuningTrainer:
         Returns:
             Dictionary with existing metadata
         """
+        manifest = self.registry.read_manifest()
+        if manifest is not None:
+            return manifest.get("metadata", {})
+
         if not self.metadata_path.exists():
             return {}
 
@@ -226,26 +301,13 @@ class SelfTuningTrainer:
             logger.warning(f"Error loading metadata: {e}")
             return {}
 
-    def _save_metadata(self, metadata: Dict[str, Any]) -> None:
-        """
-        Save model metadata.
-
-        Args:
-            metadata: Metadata to save
-        """
-        try:
-            with open(self.metadata_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, indent=2, default=str)
-
-            logger.info(f"Model metadata saved: {self.metadata_path}")
-
-        except Exception as e:
-            logger.error(f"Error saving metadata: {e}")
-
     def train_models(self, dataset_path: Path) -> Dict[str, Any]:
         """
         Train importance and credibility models.
 
+        The result is published as a new model version; models that are not
+        replaced are carried over from the current version.
+
         Args:
             dataset_path: Path to training dataset
 
@@ -255,6 +317,9 @@ class SelfTuningTrainer:
         logger.info("Starting model training...")
 
         try:
+            # Current models are needed to carry over the ones that are not replaced
+            current = self._load_pickled_models()
+
             # Load dataset
             features_df, labels_df = self._load_dataset(dataset_path)
 
@@ -263,9 +328,11 @@ class SelfTuningTrainer:
                 features_df, labels_df, test_size=0.2, random_state=42, stratify=labels_df["importance_label"]
             )
 
-            # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Scale features (plain arrays: column order is kept in metadata["features"]).
+            # Новый scaler: загруженный продолжает обслуживать предсказания
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train.to_numpy())
+            X_test_scaled = scaler.transform(X_test.to_numpy())
 
             results = {
                 "success": True,
@@ -278,39 +345,52 @@ class SelfTuningTrainer:
             }
 
             # Train importance model
-            importance_result = self._train_importance_model(
-                X_train_scaled, X_test_scaled, y_train["importance_label"], y_test["importance_label"]
+            importance_result, importance_model = self._train_importance_model(
+                X_train_scaled,
+                X_test_scaled,
+                y_train["importance_label"],
+                y_test["importance_label"],
+                current.importance_model,
             )
             results["models_trained"].append("importance")
             results["improvements"]["importance"] = importance_result
 
             # Train credibility model
-            credibility_result = self._train_credibility_model(
-                X_train_scaled, X_test_scaled, y_train["credibility_label"], y_test["credibility_label"]
+            credibility_result, credibility_model = self._train_credibility_model(
+                X_train_scaled,
+                X_test_scaled,
+                y_train["credibility_label"],
+                y_test["credibility_label"],
+                current.credibility_model,
             )
             results["models_trained"].append("credibility")
             results["improvements"]["credibility"] = credibility_result
 
-            # Save scaler (ВАЖНО для использования моделей!)
-            scaler_path = self.models_dir / "scaler.pkl"
-            try:
-                with open(scaler_path, "wb") as f:
-                    pickle.dump(self.scaler, f)
-                logger.info(f"✅ Feature scaler saved: {scaler_path}")
-            except Exception as e:
-                logger.error(f"❌ Error saving scaler: {e}")
-
-            # Save metadata
+            # Publish models, scaler (ВАЖНО для использования моделей!) and metadata as one version
             metadata = {
                 "timestamp": datetime.now(timezone.utc).isoformat(),
                 "dataset_size": len(features_df),
                 "model_type": self.model_type,
                 "features": list(features_df.columns),
+                "feature_schema_version": FEATURE_SCHEMA_VERSION,
                 "importance_model": importance_result,
                 "credibility_model": credibility_result,
                 "version": self._get_next_version(),
             }
-            self._save_metadata(metadata)
+            manifest = self.registry.publish(
+                {"importance": importance_model, "credibility": credibility_model, "scaler": scaler},
+                metadata,
+                arrays=self._export_arrays(importance_model, credibility_model, scaler, list(features_df.columns)),
+            )
+            self._models = LoadedModels(
+                importance_model=importance_model,
+                credibility_model=credibility_model,
+                scaler=scaler,
+                feature_columns=tuple(features_df.columns),
+                version=manifest["version"],
+            )
+            self._prune_legacy_backups()
+            results["version"] = manifest["version"]
 
             # Update metrics
             self.metrics.increment_self_tuning_runs()
@@ -320,7 +400,7 @@ class SelfTuningTrainer:
             if total_improvements > 0:
                 self.metrics.increment_self_tuning_models_replaced()
 
-            logger.info("Model training completed successfully")
+            logger.info(f"Model training completed successfully (version {manifest['version']})")
             return results
 
         except Exception as e:
@@ -328,8 +408,13 @@ class SelfTuningTrainer:
             return {"success": False, "error": str(e), "dataset_size": 0, "models_trained": []}
 
     def _train_importance_model(
-        self, X_train: np.ndarray, X_test: np.ndarray, y_train: pd.Series, y_test: pd.Series
-    ) -> Dict[str, Any]:
+        self,
+        X_train: np.ndarray,
+        X_test: np.ndarray,
+        y_train: pd.Series,
+        y_test: pd.Series,
+        current_model: Any = None,
+    ) -> Tuple[Dict[str, Any], Any]:
         """
         Train importance prediction model.
 
@@ -338,56 +423,22 @@ class SelfTuningTrainer:
             X_test: Test features
             y_train: Training labels
             y_test: Test labels
+            current_model: Current model, kept if the new one is not better
 
         Returns:
-            Dictionary with training results
+            Tuple of (training results, model to publish)
         """
         logger.info("Training importance model...")
-
-        # Load existing model for comparison
-        existing_metrics = self._get_existing_model_metrics("importance")
-
-        # Create and train new model
-        model = self._create_model(self.model_type)
-        model.fit(X_train, y_train)
-
-        # Evaluate new model
-        new_metrics = self._evaluate_model(model, X_test, y_test, "Importance")
-
-        # Check if improvement is significant
-        improvement = 0.0
-        should_replace = False
-
-        if existing_metrics:
-            improvement = new_metrics["f1_score"] - existing_metrics.get("f1_score", 0.0)
-            should_replace = improvement >= self.replace_threshold
-            logger.info(f"Importance model improvement: {improvement:.3f} (threshold: {self.replace_threshold})")
-        else:
-            should_replace = True  # No existing model
-            logger.info("No existing importance model found, using new model")
-
-        if should_replace:
-            # Create backup
-            self._create_backup(self.importance_model_path)
-
-            # Save new model
-            self._save_model(model, self.importance_model_path)
-            self.importance_model = model
-
-            logger.info(f"[SELF-TUNING] Importance model replaced (F1: {new_metrics['f1_score']:.3f})")
-        else:
-            logger.info("[SELF-TUNING] Importance model not replaced (improvement too small)")
-
-        return {
-            "f1_score": new_metrics["f1_score"],
-            "improvement": improvement,
-            "replaced": should_replace,
-            "model_type": self.model_type,
-        }
+        return self._train_model("importance", current_model, X_train, X_test, y_train, y_test)
 
     def _train_credibility_model(
-        self, X_train: np.ndarray, X_test: np.ndarray, y_train: pd.Series, y_test: pd.Series
-    ) -> Dict[str, Any]:
+        self,
+        X_train: np.ndarray,
+        X_test: np.ndarray,
+        y_train: pd.Series,
+        y_test: pd.Series,
+        current_model: Any = None,
+    ) -> Tuple[Dict[str, Any], Any]:
         """
         Train credibility prediction model.
 
@@ -396,52 +447,60 @@ class SelfTuningTrainer:
             X_test: Test features
             y_train: Training labels
             y_test: Test labels
+            current_model: Current model, kept if the new one is not better
 
         Returns:
-            Dictionary with training results
+            Tuple of (training results, model to publish)
         """
         logger.info("Training credibility model...")
-
+        return self._train_model("credibility", current_model, X_train, X_test, y_train, y_test)
+
+    def _train_model(
+        self,
+        task: str,
+        current_model: Any,
+        X_train: np.ndarray,
+        X_test: np.ndarray,
+        y_train: pd.Series,
+        y_test: pd.Series,
+    ) -> Tuple[Dict[str, Any], Any]:
+        """Train one model and decide whether it replaces the current one."""
         # Load existing model for comparison
-        existing_metrics = self._get_existing_model_metrics("credibility")
+        existing_metrics = self._get_existing_model_metrics(task)
 
         # Create and train new model
         model = self._create_model(self.model_type)
         model.fit(X_train, y_train)
 
         # Evaluate new model
-        new_metrics = self._evaluate_model(model, X_test, y_test, "Credibility")
+        new_metrics = self._evaluate_model(model, X_test, y_test, task.capitalize())
 
         # Check if improvement is significant
         improvement = 0.0
         should_replace = False
 
-        if existing_metrics:
+        if existing_metrics and current_model is not None:
             improvement = new_metrics["f1_score"] - existing_metrics.get("f1_score", 0.0)
             should_replace = improvement >= self.replace_threshold
-            logger.info(f"Credibility model improvement: {improvement:.3f} (threshold: {self.replace_threshold})")
+            logger.info(
+                f"{task.capitalize()} model improvement: {improvement:.3f} (threshold: {self.replace_threshold})"
+            )
         else:
             should_replace = True  # No existing model
-            logger.info("No existing credibility model found, using new model")
+            logger.info(f"No existing {task} model found, using new model")
 
         if should_replace:
-            # Create backup
-            self._create_backup(self.credibility_model_path)
-
-            # Save new model
-            self._save_model(model, self.credibility_model_path)
-            self.credibility_model = model
-
-            logger.info(f"[SELF-TUNING] Credibility model replaced (F1: {new_metrics['f1_score']:.3f})")
+            logger.info(f"[SELF-TUNING] {task.capitalize()} model replaced (F1: {new_metrics['f1_score']:.3f})")
         else:
-            logger.info("[SELF-TUNING] Credibility model not replaced (improvement too small)")
+            logger.info(f"[SELF-TUNING] {task.capitalize()} model not replaced (improvement too small)")
 
-        return {
+        result = {
             "f1_score": new_metrics["f1_score"],
             "improvement": improvement,
             "replaced": should_replace,
             "model_type": self.model_type,
         }
+        return result, model if should_replace else current_model
 
     def _get_existing_model_metrics(self, model_type: str) -> Optional[Dict[str, float]]:
         """
@@ -456,23 +515,6 @@ class SelfTuningTrainer:
         metadata = self._load_existing_metadata()
         return metadata.get(f"{model_type}_model", {}).get("metrics")
 
-    def _save_model(self, model, model_path: Path) -> None:
-        """
-        Save trained model to file.
-
-        Args:
-            model: Trained model
-            model_path: Path to save model
-        """
-        try:
-            with open(model_path, "wb") as f:
-                pickle.dump(model, f)
-
-            logger.info(f"Model saved: {model_path}")
-
-        except Exception as e:
-            logger.error(f"Error saving model: {e}")
-
     def _get_next_version(self) -> int:
         """
         Get next version number for model.
@@ -488,71 +530,265 @@ class SelfTuningTrainer:
         """
         Load existing trained models.
 
+        Loads the current published version; without a manifest falls back to
+        the legacy flat files (local_predictor_*.pkl, scaler.pkl).
+
         Returns:
             True if models loaded successfully, False otherwise
         """
         try:
-            # Load importance model
-            if self.importance_model_path.exists():
-                with open(self.importance_model_path, "rb") as f:
-                    self.importance_model = pickle.load(f)
-                logger.info("Importance model loaded successfully")
-            else:
-                logger.warning("Importance model not found")
+            manifest = self.registry.read_manifest()
+            models = self._load_version(manifest) if manifest is not None else self._load_legacy_models()
+            self._models = models
+            return models.importance_model is not None and models.credibility_model is not None
+
+        except Exception as e:
+            logger.error(f"Error loading models: {e}")
+            return False
+
+    def _load_version(self, manifest: Dict[str, Any], arrays: Optional[bool] = None) -> LoadedModels:
+        """
+        Load a published version (checksums are verified by the registry).
+
+        Args:
+            manifest: Version manifest
+            arrays: Load model.npz for numpy inference (default: artifact_format == "npz");
+                versions without model.npz are loaded from the pickles
+        """
+        if arrays is None:
+            arrays = self.artifact_format == ARTIFACT_NPZ
+
+        if arrays and ARRAYS_ARTIFACT in manifest["files"]:
+            artifacts, manifest = self.registry.load(manifest, names=[ARRAYS_ARTIFACT])
+            exported = numpy_models(artifacts[ARRAYS_ARTIFACT])
+            models = self._make_model_set(
+                exported["importance"],
+                exported["credibility"],
+                exported["scaler"],
+                {**manifest.get("metadata", {}), "features": list(exported["feature_columns"])},
+                manifest["version"],
+            )
+            logger.info(f"Models loaded: version {manifest['version']} (numpy arrays)")
+            return models
+
+        pickled = [name for name in manifest["files"] if name != ARRAYS_ARTIFACT]
+        artifacts, manifest = self.registry.load(manifest, names=pickled)
+        models = self._make_model_set(
+            artifacts.get("importance"),
+            artifacts.get("credibility"),
+            artifacts.get("scaler", StandardScaler()),
+            manifest.get("metadata", {}),
+            manifest["version"],
+        )
+        logger.info(f"Models loaded: version {manifest['version']}")
+        return models
+
+    def _load_pickled_models(self) -> LoadedModels:
+        """Current models as scikit-learn objects (empty set if there are none yet)."""
+        try:
+            manifest = self.registry.read_manifest()
+            if manifest is None:
+                return self._load_legacy_models()
+            return self._load_version(manifest, arrays=False)
+        except Exception as e:
+            logger.warning(f"Current models cannot be loaded, training from scratch: {e}")
+            return LoadedModels()
+
+    def _export_arrays(
+        self, importance_model, credibility_model, scaler, feature_columns: List[str]
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Pickle-free export of the models (None if a model type cannot be exported)."""
+        try:
+            return export_model_arrays(importance_model, credibility_model, scaler, feature_columns)
+        except ValueError as e:
+            logger.warning(f"Models are published without model.npz: {e}")
+            return None
+
+    def export_current_models(self) -> Optional[Dict[str, Any]]:
+        """
+        Republish the current models together with model.npz.
+
+        Converts versions published before the numpy export (and the legacy
+        flat files) without retraining.
+
+        Returns:
+            Manifest of the new version or None if there is nothing to export
+        """
+        current = self._load_pickled_models()
+        if current.importance_model is None or current.credibility_model is None:
+            logger.warning("No trained models to export")
+            return None
+
+        arrays = self._export_arrays(
+            current.importance_model, current.credibility_model, current.scaler, list(current.feature_columns)
+        )
+        if arrays is None:
+            return None
 
-            # Load credibility model
-            if self.credibility_model_path.exists():
-                with open(self.credibility_model_path, "rb") as f:
-                    self.credibility_model = pickle.load(f)
-                logger.info("Credibility model loaded successfully")
+        metadata = {
+            **self._load_existing_metadata(),
+            "features": list(current.feature_columns),
+            "feature_schema_version": current.feature_schema_version,
+            "exported_from_version": current.version,
+            "version": self._get_next_version(),
+        }
+        return self.registry.publish(
+            {
+                "importance": current.importance_model,
+                "credibility": current.credibility_model,
+                "scaler": current.scaler,
+            },
+            metadata,
+            arrays=arrays,
+        )
+
+    def _load_legacy_models(self) -> LoadedModels:
+        """Load the flat model files written before versioned artifacts."""
+        loaded = {}
+        for name, path in (
+            ("importance", self.importance_model_path),
+            ("credibility", self.credibility_model_path),
+            ("scaler", self.models_dir / "scaler.pkl"),
+        ):
+            if path.exists():
+                with open(path, "rb") as f:
+                    loaded[name] = pickle.load(f)
+                logger.info(f"Legacy {name} file loaded: {path}")
             else:
-                logger.warning("Credibility model not found")
+                logger.warning(f"Legacy {name} file not found: {path}")
+
+        return self._make_model_set(
+            loaded.get("importance"),
+            loaded.get("credibility"),
+            loaded.get("scaler", StandardScaler()),
+            self._load_existing_metadata(),
+            0,
+        )
+
+    def _make_model_set(
+        self, importance_model, credibility_model, scaler, metadata: Dict[str, Any], version: int
+    ) -> LoadedModels:
+        """
+        Bundle models with the column order stored in their metadata.
 
-            # Load scaler
-            scaler_path = self.models_dir / "scaler.pkl"
-            if scaler_path.exists():
-                with open(scaler_path, "rb") as f:
-                    self.scaler = pickle.load(f)
-                logger.info("Feature scaler loaded successfully")
+        Models trained before the schema was versioned store only the column
+        list; without metadata the current schema is assumed.
+        """
+        feature_columns = tuple(metadata.get("features") or FEATURE_COLUMNS)
+
+        unknown = [col for col in feature_columns if col not in FEATURE_COLUMNS]
+        if unknown:
+            logger.warning(f"Models use features outside of the current schema (filled with 0): {unknown}")
+
+        expected = getattr(scaler, "n_features_in_", len(feature_columns))
+        if expected != len(feature_columns):
+            logger.error(f"Scaler expects {expected} features, metadata lists {len(feature_columns)}")
+
+        return LoadedModels(
+            importance_model=importance_model,
+            credibility_model=credibility_model,
+            scaler=scaler,
+            feature_columns=feature_columns,
+            feature_schema_version=metadata.get("feature_schema_version", FEATURE_SCHEMA_VERSION),
+            version=version,
+        )
+
+    def reload_if_changed(self, wait: bool = False) -> bool:
+        """
+        Pick up a newly published version without blocking inference.
 
-            return self.importance_model is not None and self.credibility_model is not None
+        The manifest is checked at most once per reload_interval. A new
+        version is loaded in a background thread; predictions keep using the
+        current models until the new set is swapped in.
 
-        except Exception as e:
-            logger.error(f"Error loading models: {e}")
+        Args:
+            wait: Wait for the reload to finish (tests, CLI tools)
+
+        Returns:
+            True if a reload was started
+        """
+        if not self._manifest_watcher.changed():
             return False
 
-    def predict(self, features: Dict[str, float]) -> Tuple[float, float]:
+        manifest = self.registry.read_manifest()
+        if manifest is None or manifest.get("version") == self.version:
+            return False
+
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(
+                target=self._reload, args=(manifest,), name="model-reload", daemon=True
+            )
+            self._reload_thread.start()
+
+        if wait:
+            self._reload_thread.join()
+        return True
+
+    def _reload(self, manifest: Dict[str, Any]) -> None:
+        try:
+            models = self._load_version(manifest)
+        except Exception as e:
+            logger.error(f"Error reloading models (version {manifest.get('version')}): {e}")
+            return
+
+        if models.importance_model is None or models.credibility_model is None:
+            logger.error(f"Model version {manifest.get('version')} is incomplete, keeping version {self.version}")
+            return
+
+        self._models = models
+        logger.info(f"[SELF-TUNING] Switched to model version {models.version}")
+
+    def predict_batch(self, features: Sequence[Mapping[str, float]]) -> np.ndarray:
         """
-        Make predictions using loaded models.
+        Make predictions for a batch of news items.
+
+        Builds one (N x F) matrix in the column order of the loaded models and
+        calls the scaler and both models once for the whole batch.
 
         Args:
-            features: Dictionary with feature values
+            features: Feature dictionaries, one per news item
 
         Returns:
-            Tuple of (importance_score, credibility_score)
+            Array of shape (N, 2) with importance and credibility scores
         """
-        try:
-            if not self.importance_model or not self.credibility_model:
-                logger.warning("Models not loaded, using fallback predictions")
-                return 0.5, 0.5
+        fallback = np.full((len(features), 2), 0.5)
+        if not features:
+            return fallback
 
-            # Convert features to array
-            # This assumes features are in the same order as training
-            feature_values = list(features.values())
-            feature_array = np.array(feature_values).reshape(1, -1)
+        try:
+            self.reload_if_changed()
 
-            # Scale features
-            feature_array_scaled = self.scaler.transform(feature_array)
+            # Один снимок на пакет: перезагрузка подменяет набор моделей целиком
+            models = self._models
+            if not models.importance_model or not models.credibility_model:
+                logger.warning("Models not loaded, using fallback predictions")
+                return fallback
 
-            # Make predictions
-            importance_score = self.importance_model.predict_proba(feature_array_scaled)[0][1]
-            credibility_score = self.credibility_model.predict_proba(feature_array_scaled)[0][1]
+            feature_array_scaled = models.scaler.transform(feature_matrix(features, models.feature_columns))
 
-            return float(importance_score), float(credibility_score)
+            scores = np.empty((len(features), 2))
+            scores[:, 0] = models.importance_model.predict_proba(feature_array_scaled)[:, 1]
+            scores[:, 1] = models.credibility_model.predict_proba(feature_array_scaled)[:, 1]
+            return scores
 
         except Exception as e:
             logger.error(f"Error making predictions: {e}")
-            return 0.5, 0.5
+            return fallback
+
+    def predict(self, features: Dict[str, float]) -> Tuple[float, float]:
+        """
+        Make predictions for a single news item.
+
+        Args:
+            features: Dictionary with feature values
+
+        Returns:
+            Tuple of (importance_score, credibility_score)
+        """
+        importance_score, credibility_score = self.predict_batch([features])[0]
+        return float(importance_score), float(credibility_score)
 
     def is_enabled(self) -> bool:
         """Check if self-tuning is enabled."""
@@ -573,6 +809,9 @@ class SelfTuningTrainer:
             "model_type": self.model_type,
             "last_training": metadata.get("timestamp"),
             "version": metadata.get("version", 0),
+            "loaded_version": self.version,
+            "artifact_format": self.artifact_format,
+            "feature_schema_version": self.feature_schema_version,
             "dataset_size": metadata.get("dataset_size", 0),
         }
 
@@ -589,9 +828,106 @@ def get_self_tuning_trainer() -> SelfTuningTrainer:
     return _trainer_instance
 
 
+def _training_worker_main(dataset_path: str, config_path: Optional[str], models_dir: Optional[str], conn) -> None:
+    """Entry point of the training process."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    try:
+        trainer = SelfTuningTrainer(config_path, Path(models_dir) if models_dir else None)
+        result = trainer.train_models(Path(dataset_path))
+    except Exception as e:
+        result = {"success": False, "error": str(e), "dataset_size": 0, "models_trained": []}
+    conn.send(result)
+    conn.close()
+
+
+class TrainingWorker:
+    """
+    Trains models in a separate process.
+
+    The worker publishes a new model version; predictors in other processes
+    (and in this one) pick it up through the manifest.
+
+    Example:
+        worker = TrainingWorker(Path("data/self_tuning_dataset.csv")).start()
+        result = worker.join()
+    """
+
+    def __init__(self, dataset_path: Path, config_path: Optional[str] = None, models_dir: Optional[Path] = None):
+        self.dataset_path = Path(dataset_path)
+        self.config_path = config_path
+        self.models_dir = Path(models_dir) if models_dir else None
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+
+    def start(self) -> "TrainingWorker":
+        receiver, sender = self._context.Pipe(duplex=False)
+        self._process = self._context.Process(
+            target=_training_worker_main,
+            args=(
+                str(self.dataset_path),
+                self.config_path,
+                str(self.models_dir) if self.models_dir else None,
+                sender,
+            ),
+            name="self-tuning-trainer",
+            daemon=True,
+        )
+        self._process.start()
+        sender.close()
+        self._conn = receiver
+        logger.info(f"Training worker started (pid {self._process.pid})")
+        return self
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def join(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait for the training result.
+
+        Returns:
+            Training results (``success=False`` if the process failed or timed out)
+        """
+        if self._process is None:
+            raise RuntimeError("Training worker is not started")
+
+        result = None
+        try:
+            if self._conn.poll(timeout):
+                result = self._conn.recv()
+        except EOFError:
+            pass  # Процесс завершился, не отправив результат
+        self._process.join(0 if result is None and timeout is not None else None)
+
+        if result is None:
+            if self._process.is_alive():
+                return {"success": False, "error": "Training timed out", "dataset_size": 0, "models_trained": []}
+            error = f"Training process exited with code {self._process.exitcode}"
+            return {"success": False, "error": error, "dataset_size": 0, "models_trained": []}
+        return result
+
+
+def train_models_in_worker(
+    dataset_path: Path, config_path: Optional[str] = None, timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Train models in a separate process and wait for the result.
+
+    Args:
+        dataset_path: Path to training dataset
+        config_path: Path to configuration (defaults to config/ai_optimization.yaml)
+        timeout: Seconds to wait for the result
+
+    Returns:
+        Dictionary with training results
+    """
+    return TrainingWorker(dataset_path, config_path).start().join(timeout)
+
+
 def train_models(dataset_path: Path) -> Dict[str, Any]:
     """
-    Convenience function to train models.
+    Convenience function to train models in a separate process.
 
     Args:
         dataset_path: Path to training dataset
@@ -604,4 +940,4 @@ def train_models(dataset_path: Path) -> Dict[str, Any]:
         logger.info("Self-tuning is disabled, skipping model training")
         return {"success": False, "error": "Self-tuning disabled"}
 
-    return trainer.train_models(dataset_path)
+    return train_models_in_worker(dataset_path, trainer.config_path)
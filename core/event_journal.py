@@ -0,0 +1,228 @@
+"""
+Журнал событий Reactor в формате NDJSON.
+
+emit() только кладёт запись в очередь (без сериализации и дискового I/O в
+event loop). Фоновый поток забирает записи пачками, сериализует их, пишет
+одной операцией и ротирует файл по размеру (path, path.1 ... path.N, как
+RotatingFileHandler). replay_events() читает журнал по диапазону времени.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 0.2  # секунд
+DEFAULT_QUEUE_SIZE = 100_000
+MTIME_SLACK = timedelta(seconds=2)
+
+_STOP = object()
+
+
+def _to_naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def journal_files(path: str, backup_count: int = DEFAULT_BACKUP_COUNT) -> List[Path]:
+    """Файлы журнала от самого старого к текущему."""
+    base = Path(path)
+    files = [Path(f"{base}.{i}") for i in range(backup_count, 0, -1)] + [base]
+    return [file for file in files if file.exists()]
+
+
+def replay_events(
+    path: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    names: Optional[Iterable[str]] = None,
+    backup_count: int = DEFAULT_BACKUP_COUNT,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Прочитать события из журнала (включая ротированные файлы) по диапазону времени.
+
+    Args:
+        path: Путь к текущему файлу журнала
+        start: Начало диапазона (включительно), naive UTC или aware
+        end: Конец диапазона (включительно)
+        names: Только события с этими именами
+
+    Yields:
+        Записи в порядке записи (dict из ReactorEvent.to_dict() + "mode")
+    """
+    start = _to_naive_utc(start) if start else None
+    end = _to_naive_utc(end) if end else None
+    names = set(names) if names else None
+
+    for file in journal_files(path, backup_count):
+        # Файл, последний раз дописанный до начала диапазона, целиком старше него
+        # (с запасом: mtime берётся из грубых часов ядра)
+        if start and datetime.utcfromtimestamp(file.stat().st_mtime) + MTIME_SLACK < start:
+            continue
+        with open(file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    timestamp = datetime.fromisoformat(record["timestamp"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # Недописанная при падении строка
+                if (start and timestamp < start) or (end and timestamp > end):
+                    continue
+                if names and record.get("name") not in names:
+                    continue
+                yield record
+
+
+class EventJournal:
+    """
+    Неблокирующий писатель журнала событий.
+
+    write() не ждёт диск: при переполнении очереди запись отбрасывается и
+    учитывается в ``dropped``, чтобы всплеск событий не останавливал loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backup_count: int = DEFAULT_BACKUP_COUNT,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """Поставить запись в очередь; False - очередь переполнена, запись отброшена."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Дождаться записи всего, что уже в очереди."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Дописать очередь и остановить поток."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def replay(self, start=None, end=None, names=None) -> Iterator[Dict[str, Any]]:
+        """Записи журнала по диапазону времени (см. replay_events)."""
+        return replay_events(self.path, start, end, names, self.backup_count)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "queued": self._queue.qsize(),
+        }
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="reactor-journal", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        stream = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                batch, waiters, stop = [], [], False
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    if stop or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    stream = self._write_batch(stream, batch)
+                for waiter in waiters:
+                    waiter.set()
+                if stop:
+                    return
+        finally:
+            stream.close()
+
+    def _write_batch(self, stream, batch: List[Dict[str, Any]]):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            except (TypeError, ValueError) as e:
+                logger.error(f"Не удалось сериализовать событие {record.get('name')}: {e}")
+        if not lines:
+            return stream
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+            self.written += len(lines)
+            self.batches += 1
+            if stream.tell() >= self.max_bytes:
+                stream = self._rotate(stream)
+        except OSError as e:
+            logger.error(f"Ошибка записи журнала событий {self.path}: {e}")
+        return stream
+
+    def _rotate(self, stream):
+        stream.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            open(self.path, "w").close()
+        self.rotations += 1
+        return open(self.path, "a", encoding="utf-8")
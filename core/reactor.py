@@ -1,17 +1,41 @@
 """
 Reactor Core - асинхронный event bus для PulseAI.
 Обеспечивает реактивную архитектуру с событиями и WebSocket интеграцией.
+
+Режимы доставки:
+- sequential (по умолчанию): emit() по очереди ждёт каждый обработчик;
+- concurrent: у каждого обработчика своя ограниченная очередь и фоновая задача,
+  emit() только раскладывает событие по очередям. При переполнении emit() ждёт
+  место (backpressure) или вытесняет самое старое событие (drop_oldest); у
+  обработчика может быть таймаут, ошибка одного не мешает остальным.
+
+Каждое событие пишется в NDJSON-журнал (core.event_journal) фоновым потоком,
+текстовый reactor.log тоже пишется через QueueHandler/QueueListener.
 """
 
 import asyncio
-import json
+import inspect
 import logging
+import logging.handlers
+import queue
+import statistics
+import time
+from collections import deque
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
 from pathlib import Path
 
+from core.event_journal import EventJournal
+
 logger = logging.getLogger(__name__)
 
+DISPATCH_SEQUENTIAL = "sequential"
+DISPATCH_CONCURRENT = "concurrent"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+DEFAULT_QUEUE_SIZE = 1000
+LATENCY_WINDOW = 1024  # Последние N замеров для p50/p99
+
 
 class ReactorEvent:
     """Событие Reactor с метаданными."""
@@ -34,6 +58,137 @@ class ReactorEvent:
         }
 
 
+class LatencyStats:
+    """Задержки в скользящем окне последних замеров и общий счётчик."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        return {
+            "count": self.count,
+            "p50_ms": round(statistics.median(samples) * 1000, 3),
+            "p99_ms": round(p99 * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class HandlerWorker:
+    """
+    Очередь и фоновая задача одного обработчика в concurrent-режиме.
+
+    Задача создаётся лениво в текущем event loop (и пересоздаётся, если loop
+    сменился), события обрабатываются по одному в порядке поступления.
+    """
+
+    def __init__(
+        self,
+        event_name: str,
+        callback: Callable,
+        timeout: Optional[float],
+        queue_size: int,
+        overflow: str,
+        stats: LatencyStats,
+    ):
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.event_name = event_name
+        self.callback = callback
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.stats = stats
+        self.processed = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = loop.create_task(self._run(self._queue), name=f"reactor:{self.event_name}")
+        return self._queue
+
+    async def put(self, event: ReactorEvent) -> None:
+        """Поставить событие в очередь обработчика с учётом политики переполнения."""
+        queue = self._ensure_started()
+        item = (event, time.perf_counter())
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            if queue.full():
+                queue.get_nowait()
+                queue.task_done()
+                self.dropped += 1
+            queue.put_nowait(item)
+        else:
+            await queue.put(item)
+
+    async def join(self) -> None:
+        """Дождаться обработки всего, что уже стоит в очереди."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            event, enqueued_at = await queue.get()
+            try:
+                await self._call(event)
+            finally:
+                self.processed += 1
+                self.stats.add(time.perf_counter() - enqueued_at)
+                queue.task_done()
+
+    async def _call(self, event: ReactorEvent) -> None:
+        try:
+            result = self.callback(event)
+            if not inspect.isawaitable(result):
+                return
+
+            # asyncio.wait, а не wait_for: в 3.11 wait_for может потерять cancel() из stop()
+            task = asyncio.ensure_future(result)
+            try:
+                done, _ = await asyncio.wait({task}, timeout=self.timeout)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            if not done:
+                task.cancel()
+                self.timeouts += 1
+                logger.warning(f"Обработчик события '{self.event_name}' превысил таймаут {self.timeout}s")
+                return
+            task.result()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Ошибка в обработчике события '{self.event_name}': {e}")
+
+
 class ReactorCore:
     """
     Асинхронный event bus для реактивной архитектуры PulseAI.
@@ -41,29 +196,56 @@ class ReactorCore:
     Основные возможности:
     - Подписка на события через on(event_name, callback)
     - Эмиссия событий через emit(event_name, **data)
-    - Логирование всех событий в logs/reactor.log
-    - Метрики и статистика событий
+    - Журнал всех событий (NDJSON, logs/reactor.events.ndjson) и replay по времени
+    - Метрики и статистика событий (задержка доставки, глубина очередей)
+    - Режим concurrent: обработчики в своих очередях, с таймаутами и изоляцией
     """
 
-    def __init__(self, log_file: Optional[str] = None):
+    def __init__(
+        self,
+        log_file: Optional[str] = None,
+        dispatch: str = DISPATCH_SEQUENTIAL,
+        handler_timeout: Optional[float] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = OVERFLOW_BLOCK,
+        journal_file: Optional[str] = None,
+        journal: bool = True,
+    ):
+        if dispatch not in (DISPATCH_SEQUENTIAL, DISPATCH_CONCURRENT):
+            raise ValueError(f"Unknown dispatch mode: {dispatch}")
         self._listeners: Dict[str, List[Callable]] = {}
+        self._workers: Dict[str, Dict[Callable, HandlerWorker]] = {}
         self._metrics: Dict[str, int] = {}
+        self._emit_latency: Dict[str, LatencyStats] = {}
+        self._handler_latency: Dict[str, LatencyStats] = {}
+        self.dispatch = dispatch
+        self.handler_timeout = handler_timeout
+        self.queue_size = queue_size
+        self.overflow = overflow
         self._log_file = log_file or "logs/reactor.log"
         self._setup_logging()
+        self.journal: Optional[EventJournal] = None
+        if journal:
+            self.journal = EventJournal(journal_file or str(Path(self._log_file).with_suffix(".events.ndjson")))
 
         # Запускаем фоновую задачу для периодических событий
         self._background_task = None
         self._running = False
 
     def _setup_logging(self):
-        """Настройка логирования Reactor."""
+        """Настройка логирования Reactor (запись в файл - в фоновом потоке)."""
         reactor_logger = logging.getLogger("reactor")
         reactor_logger.setLevel(logging.INFO)
+        self._logger = reactor_logger
 
         # Создаем директорию logs если её нет
         log_path = Path(self._log_file)
         log_path.parent.mkdir(exist_ok=True)
 
+        # Один хендлер на файл, сколько бы экземпляров ReactorCore ни создавалось
+        if any(getattr(handler, "reactor_log_path", None) == str(log_path) for handler in reactor_logger.handlers):
+            return
+
         # Файловый хендлер для Reactor
         file_handler = logging.FileHandler(log_path, encoding="utf-8")
         file_handler.setLevel(logging.INFO)
@@ -71,20 +253,51 @@ class ReactorCore:
         formatter = logging.Formatter("%(asctime)s | %(name)s | %(levelname)s | %(message)s")
         file_handler.setFormatter(formatter)
 
-        reactor_logger.addHandler(file_handler)
-        self._logger = reactor_logger
-
-    def on(self, event_name: str, callback: Callable[[ReactorEvent], None]):
+        log_queue: "queue.Queue" = queue.Queue(-1)
+        listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        listener.start()
+
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.reactor_log_path = str(log_path)
+        queue_handler.listener = listener
+        reactor_logger.addHandler(queue_handler)
+
+    def on(
+        self,
+        event_name: str,
+        callback: Callable[[ReactorEvent], None],
+        *,
+        concurrent: Optional[bool] = None,
+        timeout: Optional[float] = None,
+        queue_size: Optional[int] = None,
+        overflow: Optional[str] = None,
+    ):
         """
         Подписка на событие.
 
         Args:
             event_name: Название события для подписки
             callback: Функция-обработчик события
+            concurrent: Своя очередь и задача для обработчика (по умолчанию - по режиму reactor)
+            timeout: Таймаут async-обработчика в секундах
+            queue_size: Размер очереди обработчика
+            overflow: "block" (backpressure на emit) или "drop_oldest"
         """
         if event_name not in self._listeners:
             self._listeners[event_name] = []
 
+        if concurrent is None:
+            concurrent = self.dispatch == DISPATCH_CONCURRENT
+        if concurrent:
+            self._workers.setdefault(event_name, {})[callback] = HandlerWorker(
+                event_name,
+                callback,
+                timeout=timeout if timeout is not None else self.handler_timeout,
+                queue_size=queue_size or self.queue_size,
+                overflow=overflow or self.overflow,
+                stats=self._latency(self._handler_latency, event_name),
+            )
+
         self._listeners[event_name].append(callback)
         logger.debug(f"Подписка на событие '{event_name}' добавлена")
 
@@ -99,6 +312,9 @@ class ReactorCore:
         if event_name in self._listeners:
             try:
                 self._listeners[event_name].remove(callback)
+                worker = self._workers.get(event_name, {}).pop(callback, None)
+                if worker is not None:
+                    worker.stop()
                 logger.debug(f"Подписка на событие '{event_name}' удалена")
             except ValueError:
                 logger.warning(f"Попытка удалить несуществующую подписку на '{event_name}'")
@@ -114,17 +330,25 @@ class ReactorCore:
         Returns:
             ReactorEvent: Созданное событие
         """
+        started = time.perf_counter()
         event = ReactorEvent(event_name, data)
 
         # Обновляем метрики
         self._metrics[event_name] = self._metrics.get(event_name, 0) + 1
 
-        # Логируем событие
-        self._logger.info(f"EMIT: {event_name} | {json.dumps(data, ensure_ascii=False)}")
+        # Журналируем событие (сериализация и запись - в фоновом потоке)
+        self._journal(event, "emit")
 
         # Уведомляем всех подписчиков
         if event_name in self._listeners:
-            for callback in self._listeners[event_name]:
+            workers = self._workers.get(event_name, {})
+            for callback in list(self._listeners[event_name]):
+                worker = workers.get(callback)
+                if worker is not None:
+                    await worker.put(event)
+                    continue
+
+                callback_started = time.perf_counter()
                 try:
                     if asyncio.iscoroutinefunction(callback):
                         await callback(event)
@@ -132,6 +356,9 @@ class ReactorCore:
                         callback(event)
                 except Exception as e:
                     logger.error(f"Ошибка в обработчике события '{event_name}': {e}")
+                self._latency(self._handler_latency, event_name).add(time.perf_counter() - callback_started)
+
+        self._latency(self._emit_latency, event_name).add(time.perf_counter() - started)
 
         # PULSE-WS: WebSocket broadcast removed - not used in Flask app
         # WebSocket functionality was removed as it's not used in production
@@ -154,8 +381,8 @@ class ReactorCore:
         # Обновляем метрики
         self._metrics[event_name] = self._metrics.get(event_name, 0) + 1
 
-        # Логируем событие
-        self._logger.info(f"EMIT_SYNC: {event_name} | {json.dumps(data, ensure_ascii=False)}")
+        # Журналируем событие
+        self._journal(event, "emit_sync")
 
         # Уведомляем всех подписчиков (только синхронные)
         if event_name in self._listeners:
@@ -171,6 +398,63 @@ class ReactorCore:
 
         return event
 
+    def _journal(self, event: ReactorEvent, mode: str) -> None:
+        if self.journal is not None:
+            record = event.to_dict()
+            record["mode"] = mode
+            self.journal.write(record)
+
+    def replay(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        names: Optional[List[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        События из журнала за период (время - UTC).
+
+        Args:
+            start: Начало периода (включительно)
+            end: Конец периода (включительно)
+            names: Только события с этими именами
+        """
+        if self.journal is None:
+            return iter(())
+        return self.journal.replay(start, end, names)
+
+    async def drain(self):
+        """Дождаться, пока обработчики разберут свои очереди (concurrent)."""
+        for workers in list(self._workers.values()):
+            for worker in list(workers.values()):
+                await worker.join()
+
+    @staticmethod
+    def _latency(registry: Dict[str, LatencyStats], event_name: str) -> LatencyStats:
+        stats = registry.get(event_name)
+        if stats is None:
+            stats = registry[event_name] = LatencyStats()
+        return stats
+
+    def get_dispatch_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Метрики доставки по типам событий.
+
+        emit - сколько emit() держал вызывающий код; handler - от emit до конца
+        обработки (в concurrent-режиме вместе с ожиданием в очереди).
+        """
+        result = {}
+        for event_name in sorted(set(self._emit_latency) | set(self._workers)):
+            workers = list(self._workers.get(event_name, {}).values())
+            result[event_name] = {
+                "emit": self._latency(self._emit_latency, event_name).snapshot(),
+                "handler": self._latency(self._handler_latency, event_name).snapshot(),
+                "queue_depth": sum(worker.depth for worker in workers),
+                "dropped": sum(worker.dropped for worker in workers),
+                "timeouts": sum(worker.timeouts for worker in workers),
+                "errors": sum(worker.errors for worker in workers),
+            }
+        return result
+
     def get_metrics(self) -> Dict[str, Any]:
         """Получение метрик Reactor."""
         return {
@@ -179,6 +463,9 @@ class ReactorCore:
             "listeners_count": sum(len(listeners) for listeners in self._listeners.values()),
             "event_breakdown": self._metrics.copy(),
             "listeners_breakdown": {name: len(listeners) for name, listeners in self._listeners.items()},
+            "dispatch_mode": self.dispatch,
+            "dispatch": self.get_dispatch_metrics(),
+            "journal": self.journal.get_stats() if self.journal is not None else None,
         }
 
     def get_health(self) -> Dict[str, Any]:
@@ -206,6 +493,11 @@ class ReactorCore:
                 await self._background_task
             except asyncio.CancelledError:
                 pass
+        for workers in self._workers.values():
+            for worker in workers.values():
+                worker.stop()
+        if self.journal is not None:
+            await asyncio.to_thread(self.journal.flush)
         logger.info("Reactor Core остановлен")
 
     async def _background_loop(self):
@@ -227,9 +519,9 @@ reactor = ReactorCore()
 
 
 # Удобные функции для использования в модулях
-def on(event_name: str, callback: Callable[[ReactorEvent], None]):
-    """Подписка на событие через глобальный reactor."""
-    reactor.on(event_name, callback)
+def on(event_name: str, callback: Callable[[ReactorEvent], None], **options):
+    """Подписка на событие через глобальный reactor (options - см. ReactorCore.on)."""
+    reactor.on(event_name, callback, **options)
 
 
 def emit(event_name: str, **data) -> ReactorEvent:
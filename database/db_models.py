@@ -72,31 +72,46 @@ import logging
 import os
 import time
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional, Union
-from supabase import create_client, Client
+from typing import TYPE_CHECKING, List, Dict, Optional, Union
 
 from ai_modules.credibility import evaluate_credibility
 from ai_modules.importance import evaluate_importance
+from ai_modules.news_graph import extract_news_terms
 from config.core.settings import COUNTRY_MAP, SUPABASE_URL, SUPABASE_KEY
+from utils.auth.telegram_auth import invalidate_user_auth_cache
 from utils.system.dates import format_datetime, ensure_utc_iso
+from utils.system.lazy_import import lazy_from, lazy_object
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # --- ЛОГИРОВАНИЕ ---
 logger = logging.getLogger("database")
 
-supabase: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
+create_client = lazy_from("supabase", "create_client")
+
+
+def _create_supabase_client() -> Optional["Client"]:
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        logger.warning("⚠️ Supabase не инициализирован (нет ключей). Unit-тесты будут выполняться без БД.")
+        return None
     try:
         # Принудительно отключаем HTTP/2 для решения pseudo-header ошибки
         os.environ["HTTPX_NO_HTTP2"] = "1"
         os.environ["SUPABASE_HTTP2_DISABLED"] = "1"
 
         # Стандартная инициализация с отключенным HTTP/2
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        client = create_client(SUPABASE_URL, SUPABASE_KEY)
         logger.info("✅ Supabase client initialized with HTTP/2 disabled via environment")
+        return client
     except Exception as e:
         logger.error("❌ Ошибка инициализации Supabase: %s", e)
-else:
-    logger.warning("⚠️ Supabase не инициализирован (нет ключей). Unit-тесты будут выполняться без БД.")
+        return None
+
+
+# Клиент (и пакет supabase) создаётся при первом обращении; `if not supabase`
+# по-прежнему означает "клиент не инициализирован"
+supabase = lazy_object(_create_supabase_client, "supabase client")
 
 
 # --- SAFE EXECUTE (ретраи) ---
@@ -250,6 +265,8 @@ def upsert_news(items: List[Dict]):
                 "importance": enriched.get("importance"),
                 "created_at": datetime.now(timezone.utc).isoformat(),
             }
+            # Термины для графа новостей извлекаются один раз при сохранении
+            row.update(extract_news_terms(row))
             logger.debug("Prepared news row: %s", row)
             rows.append(row)
         except Exception as e:
@@ -476,6 +493,7 @@ def upsert_user_by_telegram(
 
         if new_user.data:
             user_id = new_user.data[0]["id"]
+            invalidate_user_auth_cache(telegram_id)
             logger.info(
                 "Создан новый пользователь: ID=%s, telegram_id=%d, first_name=%s",
                 user_id,
@@ -784,6 +802,7 @@ def create_user(
         )
 
         if result.data:
+            invalidate_user_auth_cache(telegram_id)
             logger.info(
                 f"Новый пользователь создан: ID={new_user_id}, telegram_id={telegram_id}, first_name={first_name}"
             )
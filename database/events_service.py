@@ -4,16 +4,32 @@ Events Service for PulseAI.
 This module provides services for managing events in the database.
 """
 
+import base64
 import logging
-import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional
-from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+from dataclasses import dataclass, field
 
 from database.db_models import supabase, safe_execute
 
 logger = logging.getLogger("events_service")
 
+EVENT_COLUMNS = (
+    "id, title, category, subcategory, starts_at, ends_at, importance, description, "
+    "location, organizer, source, link, group_name, metadata, status, created_at"
+)
+PAGE_SIZE = 1000
+
+# Кэш ответов API событий: короткий TTL + версия, которую поднимает sync job
+EVENTS_CACHE_TTL = 30.0
+EVENTS_CACHE_MAX_ENTRIES = 512
+EVENTS_VERSION_PATH = Path(os.getenv("EVENTS_CACHE_VERSION_PATH", "data/events_cache.version"))
+
 
 @dataclass
 class EventRecord:
@@ -34,6 +50,232 @@ class EventRecord:
     group_name: Optional[str]  # Название группы для умной группировки
     metadata: Optional[Dict]  # Метаданные в JSON формате
     created_at: datetime
+    status: Optional[str] = None
+
+
+def _parse_dt(value: Any) -> Optional[datetime]:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value
+
+
+def _row_to_event(event_data: Dict) -> EventRecord:
+    """Convert events_new row to EventRecord."""
+    return EventRecord(
+        id=event_data.get("id", 0),
+        title=event_data.get("title", ""),
+        category=event_data.get("category") or "general",
+        subcategory=event_data.get("subcategory", ""),
+        starts_at=_parse_dt(event_data.get("starts_at")),
+        ends_at=_parse_dt(event_data.get("ends_at")) if event_data.get("ends_at") else None,
+        source=event_data.get("source", ""),
+        link=event_data.get("link", ""),
+        importance=float(event_data.get("importance", 0.5)),  # Already 0.0-1.0 in events_new
+        description=event_data.get("description", ""),
+        location=event_data.get("location", ""),
+        organizer=event_data.get("organizer"),
+        group_name=event_data.get("group_name"),
+        metadata=event_data.get("metadata", {}),
+        created_at=_parse_dt(event_data.get("created_at") or datetime.now(timezone.utc).isoformat()),
+        status=event_data.get("status"),
+    )
+
+
+def encode_cursor(event: EventRecord) -> str:
+    """Opaque keyset cursor (starts_at, id) of the last returned event."""
+    raw = f"{event.starts_at.isoformat()}|{event.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        starts_at, event_id = raw.rsplit("|", 1)
+        return _parse_dt(starts_at), int(event_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _quote(value: Any) -> str:
+    """Value for a PostgREST logic tree (or=...)."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _in_list(values: Iterable[str]) -> str:
+    return "(" + ",".join(_quote(v) for v in values) + ")"
+
+
+@dataclass(frozen=True)
+class EventsFilter:
+    """
+    Normalized events filter.
+
+    All fields are pushed into the events_new query; the same normalized
+    tuple is used as the response cache key.
+
+    Attributes:
+        categories: Allowed categories (empty - any)
+        scoped_subcategories: ((category, (subcategory, ...)), ...) - events of
+            these subcategories are added to ``categories`` (subscription filter)
+        subcategory: Exact subcategory filter
+    """
+
+    from_date: datetime
+    to_date: datetime
+    categories: Tuple[str, ...] = ()
+    scoped_subcategories: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+    subcategory: Optional[str] = None
+    min_importance: float = 0.0
+    status: Optional[str] = None
+
+    @classmethod
+    def build(
+        cls,
+        from_date: datetime,
+        to_date: datetime,
+        categories: Optional[Iterable[str]] = None,
+        scoped_subcategories: Optional[Mapping[str, Iterable[str]]] = None,
+        subcategory: Optional[str] = None,
+        min_importance: float = 0.0,
+        status: Optional[str] = None,
+    ) -> "EventsFilter":
+        """Normalize filter values: UTC dates to the minute, sorted unique categories."""
+
+        def minute(dt: datetime) -> datetime:
+            dt = dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+            return dt.replace(second=0, microsecond=0)
+
+        scoped = tuple(
+            sorted(
+                (category, tuple(sorted(set(subcats))))
+                for category, subcats in (scoped_subcategories or {}).items()
+                if subcats
+            )
+        )
+        return cls(
+            from_date=minute(from_date),
+            to_date=minute(to_date),
+            categories=tuple(sorted({c for c in (categories or ()) if c})),
+            scoped_subcategories=scoped,
+            subcategory=subcategory or None,
+            min_importance=round(float(min_importance or 0.0), 3),
+            status=status or None,
+        )
+
+    def cache_key(self) -> Tuple:
+        return (
+            self.from_date.isoformat(),
+            self.to_date.isoformat(),
+            self.categories,
+            self.scoped_subcategories,
+            self.subcategory,
+            self.min_importance,
+            self.status,
+        )
+
+    def category_clause(self) -> Optional[str]:
+        """PostgREST or-clause for categories + scoped subcategories (None if only plain categories)."""
+        if not self.scoped_subcategories:
+            return None
+        parts = []
+        if self.categories:
+            parts.append(f"category.in.{_in_list(self.categories)}")
+        for category, subcats in self.scoped_subcategories:
+            parts.append(f"and(category.eq.{_quote(category)},subcategory.in.{_in_list(subcats)})")
+        return ",".join(parts)
+
+
+@dataclass
+class EventsPage:
+    """One page of events plus the keyset cursor for the next one."""
+
+    events: List[EventRecord] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None  # Оценка PostgREST (count=estimated), только если запрошена
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+class EventsResponseCache:
+    """
+    Short-TTL cache of API responses keyed by the normalized filter tuple.
+
+    Entries are also bound to the version stamp of ``version_path``: the events
+    sync job (another process) bumps it via ``invalidate_events_cache()``, so
+    every web worker drops stale responses on the next lookup.
+    """
+
+    def __init__(
+        self,
+        ttl: float = EVENTS_CACHE_TTL,
+        max_entries: int = EVENTS_CACHE_MAX_ENTRIES,
+        version_path: Path = EVENTS_VERSION_PATH,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_path = Path(version_path)
+        self._entries: "OrderedDict[Tuple, Tuple[float, Tuple, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self) -> Tuple:
+        try:
+            stat = self.version_path.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return ()
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        version = self.version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, entry_version, value = entry
+            if expires_at <= time.monotonic() or entry_version != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Tuple, value: Any) -> None:
+        version = self.version()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def bump_version(self) -> None:
+        """Invalidate entries of all processes sharing ``version_path``."""
+        try:
+            self.version_path.parent.mkdir(parents=True, exist_ok=True)
+            self.version_path.write_text(str(time.time_ns()))
+        except OSError as e:
+            logger.warning(f"Could not bump events cache version: {e}")
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_response_cache = EventsResponseCache()
+
+
+def get_events_response_cache() -> EventsResponseCache:
+    """Global events API response cache."""
+    return _response_cache
+
+
+def invalidate_events_cache() -> None:
+    """Drop cached events responses (called after the events table changes)."""
+    _response_cache.bump_version()
 
 
 class EventsService:
@@ -50,6 +292,99 @@ class EventsService:
         """Initialize events service."""
         logger.info("EventsService initialized")
 
+    def query_events(
+        self,
+        filters: EventsFilter,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        with_total: bool = False,
+    ) -> EventsPage:
+        """
+        One page of events with all filters, ordering and paging done by the database.
+
+        Ordering is (starts_at, id). With ``cursor`` the page starts right after
+        the cursor row (keyset); otherwise ``offset`` is used.
+
+        Args:
+            filters: Normalized filter
+            limit: Page size
+            cursor: Keyset cursor from a previous page (EventsPage.next_cursor)
+            offset: Row offset when no cursor is given
+            with_total: Also request an estimated total count
+
+        Returns:
+            EventsPage
+        """
+        if not supabase:
+            logger.warning("⚠️ Supabase не подключён, query_events не работает.")
+            return EventsPage()
+
+        query = (
+            supabase.table("events_new")
+            .select(EVENT_COLUMNS, count="estimated" if with_total else None)
+            .gte("starts_at", filters.from_date.isoformat())
+            .lte("starts_at", filters.to_date.isoformat())
+        )
+
+        clauses = []
+        category_clause = filters.category_clause()
+        if category_clause:
+            clauses.append(category_clause)
+        elif len(filters.categories) == 1:
+            query = query.eq("category", filters.categories[0])
+        elif filters.categories:
+            query = query.in_("category", list(filters.categories))
+
+        if filters.subcategory:
+            query = query.eq("subcategory", filters.subcategory)
+        if filters.min_importance > 0:
+            query = query.gte("importance", filters.min_importance)
+        if filters.status:
+            query = query.eq("status", filters.status)
+
+        if cursor:
+            cursor_starts_at, cursor_id = decode_cursor(cursor)
+            ts = _quote(cursor_starts_at.isoformat())
+            clauses.append(f"starts_at.gt.{ts},and(starts_at.eq.{ts},id.gt.{cursor_id})")
+
+        # Несколько or-условий объединяем в одно дерево: or=(and(or(...),or(...)))
+        if len(clauses) == 1:
+            query = query.or_(clauses[0])
+        elif clauses:
+            query = query.or_("and(" + ",".join(f"or({clause})" for clause in clauses) + ")")
+
+        query = query.order("starts_at", desc=False).order("id", desc=False)
+        # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+        if cursor:
+            query = query.limit(limit + 1)
+        else:
+            query = query.range(offset, offset + limit)
+
+        result = safe_execute(query)
+        rows = result.data or []
+
+        events = []
+        for event_data in rows[:limit]:
+            try:
+                events.append(_row_to_event(event_data))
+            except Exception as e:
+                logger.error(f"Error converting event data: {e}")
+
+        next_cursor = encode_cursor(events[-1]) if len(rows) > limit and events else None
+        total = getattr(result, "count", None) if with_total else None
+        return EventsPage(events=events, next_cursor=next_cursor, total=total)
+
+    def iter_events(self, filters: EventsFilter, page_size: int = PAGE_SIZE) -> Iterable[EventRecord]:
+        """All events matching ``filters``, fetched page by page with the keyset cursor."""
+        cursor = None
+        while True:
+            page = self.query_events(filters, limit=page_size, cursor=cursor)
+            yield from page.events
+            if not page.has_more:
+                return
+            cursor = page.next_cursor
+
     async def get_events_by_date_range(
         self,
         from_date: datetime,
@@ -67,81 +402,9 @@ class EventsService:
         Returns:
             List of EventRecord objects
         """
-        if not supabase:
-            logger.warning("⚠️ Supabase не подключён, get_events_by_date_range не работает.")
-            return []
-
         try:
-            # Build query - reading from events_new table
-            query = (
-                supabase.table("events_new")
-                .select(
-                    "id, title, category, subcategory, starts_at, ends_at, "
-                    "importance, description, location, organizer, source, link, group_name, metadata, created_at"
-                )
-                .gte("starts_at", from_date.isoformat())
-                .lte("starts_at", to_date.isoformat())
-            )
-
-            # Add category filter if specified
-            if category:
-                query = query.eq("category", category)
-
-            # Order by event time
-            query = query.order("starts_at", desc=False)
-
-            # Execute query
-            result = safe_execute(query)
-            events_data = result.data or []
-
-            # Convert to EventRecord objects
-            events = []
-            for event_data in events_data:
-                try:
-                    # Parse starts_at to datetime
-                    starts_at_str = event_data.get("starts_at")
-                    if isinstance(starts_at_str, str):
-                        starts_at = datetime.fromisoformat(starts_at_str.replace("Z", "+00:00"))
-                    else:
-                        starts_at = starts_at_str
-
-                    # Parse ends_at if available
-                    ends_at = None
-                    ends_at_str = event_data.get("ends_at")
-                    if ends_at_str:
-                        if isinstance(ends_at_str, str):
-                            ends_at = datetime.fromisoformat(ends_at_str.replace("Z", "+00:00"))
-                        else:
-                            ends_at = ends_at_str
-
-                    event = EventRecord(
-                        id=event_data.get("id", 0),
-                        title=event_data.get("title", ""),
-                        category=event_data.get("category") or "general",
-                        subcategory=event_data.get("subcategory", ""),
-                        starts_at=starts_at,
-                        ends_at=ends_at,
-                        source=event_data.get("source", ""),
-                        link=event_data.get("link", ""),
-                        importance=float(event_data.get("importance", 0.5)),  # Already 0.0-1.0 in events_new
-                        description=event_data.get("description", ""),
-                        location=event_data.get("location", ""),
-                        organizer=event_data.get("organizer"),
-                        group_name=event_data.get("group_name"),
-                        metadata=event_data.get("metadata", {}),
-                        created_at=datetime.fromisoformat(
-                            event_data.get(
-                                "created_at",
-                                datetime.now(timezone.utc).isoformat(),
-                            ).replace("Z", "+00:00")
-                        ),
-                    )
-                    events.append(event)
-
-                except Exception as e:
-                    logger.error(f"Error converting event data: {e}")
-                    continue
-
+            filters = EventsFilter.build(from_date, to_date, categories=[category] if category else None)
+            events = list(self.iter_events(filters))
             logger.info(f"Retrieved {len(events)} events from database")
             return events
 
@@ -166,16 +429,7 @@ class EventsService:
         Returns:
             List of EventRecord objects
         """
-        from_date = datetime.now(timezone.utc)
-        to_date = from_date + timedelta(days=days)
-
-        events = await self.get_events_by_date_range(from_date, to_date, category)
-
-        # Filter by importance
-        if min_importance > 0:
-            events = [e for e in events if e.importance >= min_importance]
-
-        return events
+        return self.get_upcoming_events_sync(days, category, min_importance)
 
     def get_upcoming_events_sync(
         self,
@@ -184,7 +438,7 @@ class EventsService:
         min_importance: float = 0.0,
     ) -> List[EventRecord]:
         """
-        Synchronous wrapper for get_upcoming_events.
+        Synchronous version of get_upcoming_events (no event loop needed).
 
         Args:
             days_ahead: Number of days to look ahead
@@ -194,13 +448,42 @@ class EventsService:
         Returns:
             List of EventRecord objects
         """
+        from_date = datetime.now(timezone.utc)
+        filters = EventsFilter.build(
+            from_date,
+            from_date + timedelta(days=days_ahead),
+            categories=[category] if category else None,
+            min_importance=min_importance,
+        )
         try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+            return list(self.iter_events(filters))
+        except Exception as e:
+            logger.error(f"Error fetching upcoming events: {e}")
+            return []
+
+    def count_events_by_category(self, from_date: datetime, to_date: datetime) -> Dict[str, int]:
+        """Event counts per category in a date range (only the category column is fetched)."""
+        if not supabase:
+            return {}
 
-        return loop.run_until_complete(self.get_upcoming_events(days_ahead, category, min_importance))
+        counts: Dict[str, int] = {}
+        offset = 0
+        while True:
+            query = (
+                supabase.table("events_new")
+                .select("category")
+                .gte("starts_at", from_date.isoformat())
+                .lte("starts_at", to_date.isoformat())
+                .order("id", desc=False)
+                .range(offset, offset + PAGE_SIZE - 1)
+            )
+            rows = safe_execute(query).data or []
+            for row in rows:
+                category = row.get("category") or "general"
+                counts[category] = counts.get(category, 0) + 1
+            if len(rows) < PAGE_SIZE:
+                return counts
+            offset += PAGE_SIZE
 
     async def insert_events(self, events_data: List[Dict]) -> int:
         """
@@ -301,6 +584,8 @@ class EventsService:
                     logger.debug(f"  Batch {i//BATCH_SIZE + 1}: вставлено {batch_inserted}/{len(batch)}")
 
                 logger.info(f"✅ Inserted {total_inserted} new events into events_new table")
+                if total_inserted:
+                    invalidate_events_cache()
                 return total_inserted
 
             except Exception as insert_error:
@@ -325,6 +610,8 @@ class EventsService:
                     total_inserted += batch_inserted
 
                 logger.info(f"✅ Inserted {total_inserted} events (without unique_hash)")
+                if total_inserted:
+                    invalidate_events_cache()
                 return total_inserted
 
         except Exception as e:
@@ -0,0 +1,33 @@
+-- Migration: News Terms for News Graph
+-- Date: 2025-10-28
+-- Purpose: Store keywords/entities extracted once at ingest for related-news lookup
+
+-- ==================================================================
+-- Keywords / entities extracted at ingest
+-- ==================================================================
+-- Filled by database.service / database.db_models upsert_news via
+-- ai_modules.news_graph.extract_news_terms. NewsTermIndex builds its
+-- in-process inverted index from these columns instead of re-parsing
+-- title/content of every candidate on each lookup.
+-- ==================================================================
+
+ALTER TABLE news ADD COLUMN IF NOT EXISTS keywords TEXT[];
+ALTER TABLE news ADD COLUMN IF NOT EXISTS entities TEXT[];
+
+-- GIN indexes allow DB-side overlap queries (keywords && ARRAY[...])
+CREATE INDEX IF NOT EXISTS idx_news_keywords_gin ON news USING GIN (keywords);
+CREATE INDEX IF NOT EXISTS idx_news_entities_gin ON news USING GIN (entities);
+
+-- Incremental loading of the 30-day window is keyed by created_at
+CREATE INDEX IF NOT EXISTS idx_news_created_at ON news(created_at);
+
+COMMENT ON COLUMN news.keywords IS 'Top keywords extracted at ingest (news graph)';
+COMMENT ON COLUMN news.entities IS 'Named entities extracted at ingest (news graph)';
+
+-- ==================================================================
+-- Backfill for existing rows
+-- ==================================================================
+-- Rows without terms are parsed once when NewsTermIndex loads them.
+-- To persist terms for old rows run:
+--   python tools/graph/update_news_links.py --backfill
+-- ==================================================================
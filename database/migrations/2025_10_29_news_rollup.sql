@@ -0,0 +1,117 @@
+-- Migration: News Metrics Rollup
+-- Date: 2025-10-29
+-- Purpose: Pre-aggregated news metrics for /admin/api/metrics/news
+
+-- ==================================================================
+-- Rollup table
+-- ==================================================================
+-- One row per (granularity, bucket, dimension, key):
+--   granularity: 'hour' | 'day' (UTC buckets by published_at)
+--   dimension:   'source' | 'category' | 'importance_band' | 'credibility_band'
+-- Dimensions are stored as separate rows (no cross product), so a week
+-- of metrics is a few hundred rows regardless of the size of news.
+-- Python side: database/news_rollup.py (same schema in SQLite for tests).
+-- ==================================================================
+
+CREATE TABLE IF NOT EXISTS news_rollup (
+    granularity VARCHAR(8) NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    dimension VARCHAR(32) NOT NULL,
+    key TEXT NOT NULL,
+    news_count INTEGER NOT NULL DEFAULT 0,
+    importance_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    importance_n INTEGER NOT NULL DEFAULT 0,
+    credibility_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    credibility_n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, bucket_start, dimension, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_news_rollup_bucket ON news_rollup(granularity, bucket_start);
+
+-- ==================================================================
+-- Incremental maintenance
+-- ==================================================================
+
+CREATE OR REPLACE FUNCTION news_score_band(value DOUBLE PRECISION)
+RETURNS TEXT AS $$
+DECLARE
+    idx INTEGER;
+BEGIN
+    IF value IS NULL THEN
+        RETURN 'unknown';
+    END IF;
+    idx := LEAST(GREATEST(FLOOR(value * 5)::INTEGER, 0), 4);
+    RETURN to_char(idx / 5.0, 'FM0.0') || '-' || to_char((idx + 1) / 5.0, 'FM0.0');
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION news_rollup_apply(
+    p_published_at TIMESTAMP WITH TIME ZONE,
+    p_source TEXT,
+    p_category TEXT,
+    p_importance DOUBLE PRECISION,
+    p_credibility DOUBLE PRECISION,
+    p_sign INTEGER
+) RETURNS VOID AS $$
+DECLARE
+    g TEXT;
+    bucket TIMESTAMP WITH TIME ZONE;
+BEGIN
+    IF p_published_at IS NULL THEN
+        RETURN;
+    END IF;
+
+    FOREACH g IN ARRAY ARRAY['hour', 'day'] LOOP
+        bucket := date_trunc(g, p_published_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+
+        INSERT INTO news_rollup AS r (
+            granularity, bucket_start, dimension, key,
+            news_count, importance_sum, importance_n, credibility_sum, credibility_n
+        )
+        SELECT g, bucket, d.dimension, d.key,
+               p_sign,
+               p_sign * COALESCE(p_importance, 0), CASE WHEN p_importance IS NULL THEN 0 ELSE p_sign END,
+               p_sign * COALESCE(p_credibility, 0), CASE WHEN p_credibility IS NULL THEN 0 ELSE p_sign END
+        FROM (VALUES
+            ('source', COALESCE(NULLIF(p_source, ''), 'unknown')),
+            ('category', COALESCE(NULLIF(p_category, ''), 'unknown')),
+            ('importance_band', news_score_band(p_importance)),
+            ('credibility_band', news_score_band(p_credibility))
+        ) AS d(dimension, key)
+        ON CONFLICT (granularity, bucket_start, dimension, key) DO UPDATE SET
+            news_count = r.news_count + EXCLUDED.news_count,
+            importance_sum = r.importance_sum + EXCLUDED.importance_sum,
+            importance_n = r.importance_n + EXCLUDED.importance_n,
+            credibility_sum = r.credibility_sum + EXCLUDED.credibility_sum,
+            credibility_n = r.credibility_n + EXCLUDED.credibility_n;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION news_rollup_trigger()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM news_rollup_apply(OLD.published_at, OLD.source, OLD.category, OLD.importance, OLD.credibility, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM news_rollup_apply(NEW.published_at, NEW.source, NEW.category, NEW.importance, NEW.credibility, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_news_rollup ON news;
+CREATE TRIGGER trg_news_rollup
+AFTER INSERT OR DELETE OR UPDATE OF published_at, source, category, importance, credibility ON news
+FOR EACH ROW EXECUTE FUNCTION news_rollup_trigger();
+
+-- ==================================================================
+-- Backfill from existing news (run once)
+-- ==================================================================
+
+TRUNCATE news_rollup;
+SELECT news_rollup_apply(published_at, source, category, importance, credibility, 1) FROM news;
+DELETE FROM news_rollup WHERE news_count <= 0;
+
+COMMENT ON TABLE news_rollup IS 'Hourly/daily news aggregates by source, category and score bands (admin metrics)';
@@ -0,0 +1,327 @@
+"""
+Module: database.news_rollup
+Purpose: Pre-aggregated news metrics (rollups) for the admin panel
+Location: database/news_rollup.py
+
+Description:
+    Агрегаты новостей по часам и по дням в разрезах:
+    source, category, importance band, credibility band.
+
+    Каждая строка rollup: (granularity, bucket_start, dimension, key) →
+    news_count, importance_sum/n, credibility_sum/n. Разрезы хранятся
+    отдельными строками (а не декартовым произведением), поэтому неделя
+    метрик - это несколько сотен строк независимо от размера таблицы news.
+
+    Бэкенды:
+        - SupabaseNewsRollup: таблица news_rollup, которую инкрементально
+          поддерживает триггер на news (migrations/2025_10_29_news_rollup.sql)
+        - SQLiteNewsRollup: локальное хранилище той же схемы (тесты, dev,
+          fallback при отсутствии таблицы), обновляется через add_news()
+
+Usage Example:
+    ```python
+    from database.news_rollup import get_news_rollup_store, summarize_rollup
+
+    store = get_news_rollup_store()
+    rows = store.fetch(datetime.now(timezone.utc) - timedelta(days=7))
+    metrics = summarize_rollup(rows)
+    ```
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("hour", "day")
+DIMENSIONS = ("source", "category", "importance_band", "credibility_band")
+BAND_COUNT = 5  # 0.0-0.2, 0.2-0.4, ... 0.8-1.0
+UNKNOWN = "unknown"
+
+ROLLUP_COLUMNS = (
+    "granularity",
+    "bucket_start",
+    "dimension",
+    "key",
+    "news_count",
+    "importance_sum",
+    "importance_n",
+    "credibility_sum",
+    "credibility_n",
+)
+
+RollupKey = Tuple[str, str, str, str]
+
+
+def score_band(value: Any) -> str:
+    """Полоса оценки 0..1 шагом 0.2 ("0.4-0.6"), "unknown" для пустых значений."""
+    if value is None:
+        return UNKNOWN
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return UNKNOWN
+    index = min(max(int(value * BAND_COUNT), 0), BAND_COUNT - 1)
+    return f"{index / BAND_COUNT:.1f}-{(index + 1) / BAND_COUNT:.1f}"
+
+
+def _parse_published_at(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    else:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def bucket_start(dt: datetime, granularity: str) -> str:
+    """Начало часа/дня (UTC) в ISO формате."""
+    dt = dt.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        dt = dt.replace(hour=0)
+    return dt.isoformat()
+
+
+def rollup_deltas(news_rows: Iterable[Dict[str, Any]], sign: int = 1) -> Dict[RollupKey, List[float]]:
+    """
+    Вклад новостей в rollup.
+
+    Returns:
+        {(granularity, bucket_start, dimension, key): [count, imp_sum, imp_n, cred_sum, cred_n]}
+    """
+    deltas: Dict[RollupKey, List[float]] = defaultdict(lambda: [0, 0.0, 0, 0.0, 0])
+
+    for item in news_rows:
+        published = _parse_published_at(item.get("published_at"))
+        if published is None:
+            continue
+
+        importance = item.get("importance")
+        credibility = item.get("credibility")
+        keys = {
+            "source": item.get("source") or UNKNOWN,
+            "category": item.get("category") or UNKNOWN,
+            "importance_band": score_band(importance),
+            "credibility_band": score_band(credibility),
+        }
+
+        for granularity in GRANULARITIES:
+            start = bucket_start(published, granularity)
+            for dimension, key in keys.items():
+                acc = deltas[(granularity, start, dimension, key)]
+                acc[0] += sign
+                if importance is not None:
+                    acc[1] += sign * float(importance)
+                    acc[2] += sign
+                if credibility is not None:
+                    acc[3] += sign * float(credibility)
+                    acc[4] += sign
+
+    return deltas
+
+
+def _fetch_ranges(since: datetime) -> Tuple[str, str]:
+    """
+    Границы выборки: часовые строки для неполного первого дня, дневные - дальше.
+
+    Returns:
+        (since_hour, first_full_day) в ISO формате
+    """
+    since_hour = since.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    first_day = since_hour.replace(hour=0)
+    if first_day < since_hour:
+        first_day += timedelta(days=1)
+    return since_hour.isoformat(), first_day.isoformat()
+
+
+class NewsRollupStore:
+    """Базовый интерфейс хранилища rollup."""
+
+    def _select(self, granularity: str, start: str, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def fetch(self, since: datetime) -> List[Dict[str, Any]]:
+        """Строки rollup, покрывающие период [since, now] с точностью до часа."""
+        since_hour, first_full_day = _fetch_ranges(since)
+        rows = []
+        if since_hour < first_full_day:
+            rows.extend(self._select("hour", since_hour, first_full_day))
+        rows.extend(self._select("day", first_full_day))
+        return rows
+
+
+class SQLiteNewsRollup(NewsRollupStore):
+    """Локальное rollup хранилище на SQLite (схема как у таблицы news_rollup)."""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS news_rollup (
+                granularity TEXT NOT NULL,
+                bucket_start TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                key TEXT NOT NULL,
+                news_count INTEGER NOT NULL DEFAULT 0,
+                importance_sum REAL NOT NULL DEFAULT 0,
+                importance_n INTEGER NOT NULL DEFAULT 0,
+                credibility_sum REAL NOT NULL DEFAULT 0,
+                credibility_n INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (granularity, bucket_start, dimension, key)
+            )
+            """)
+        self._conn.commit()
+
+    def add_news(self, news_rows: Iterable[Dict[str, Any]], sign: int = 1) -> int:
+        """
+        Инкрементально учесть новости (sign=-1 - вычесть удалённые).
+
+        Returns:
+            Количество затронутых строк rollup
+        """
+        deltas = rollup_deltas(news_rows, sign)
+        if not deltas:
+            return 0
+
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO news_rollup VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (granularity, bucket_start, dimension, key) DO UPDATE SET
+                    news_count = news_count + excluded.news_count,
+                    importance_sum = importance_sum + excluded.importance_sum,
+                    importance_n = importance_n + excluded.importance_n,
+                    credibility_sum = credibility_sum + excluded.credibility_sum,
+                    credibility_n = credibility_n + excluded.credibility_n
+                """,
+                [key + tuple(values) for key, values in deltas.items()],
+            )
+            self._conn.execute("DELETE FROM news_rollup WHERE news_count <= 0")
+            self._conn.commit()
+        return len(deltas)
+
+    def _select(self, granularity: str, start: str, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM news_rollup WHERE granularity = ? AND bucket_start >= ?"
+        params: List[Any] = [granularity, start]
+        if end is not None:
+            query += " AND bucket_start < ?"
+            params.append(end)
+
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            return [dict(zip(ROLLUP_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class SupabaseNewsRollup(NewsRollupStore):
+    """Rollup в таблице news_rollup (поддерживается триггером на news)."""
+
+    PAGE_SIZE = 1000
+
+    def __init__(self, client):
+        self.client = client
+
+    def _select(self, granularity: str, start: str, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            query = (
+                self.client.table("news_rollup")
+                .select(",".join(ROLLUP_COLUMNS))
+                .eq("granularity", granularity)
+                .gte("bucket_start", start)
+            )
+            if end is not None:
+                query = query.lt("bucket_start", end)
+            page = query.range(offset, offset + self.PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < self.PAGE_SIZE:
+                return rows
+            offset += self.PAGE_SIZE
+
+
+def get_news_rollup_store() -> NewsRollupStore:
+    """
+    Хранилище rollup по конфигурации.
+
+    NEWS_ROLLUP_BACKEND=sqlite переключает на локальный SQLite
+    (путь NEWS_ROLLUP_SQLITE_PATH, по умолчанию data/news_rollup.sqlite3).
+    """
+    if os.getenv("NEWS_ROLLUP_BACKEND", "supabase").lower() == "sqlite":
+        return SQLiteNewsRollup(os.getenv("NEWS_ROLLUP_SQLITE_PATH", "data/news_rollup.sqlite3"))
+
+    from database.service import get_sync_service
+
+    return SupabaseNewsRollup(get_sync_service().sync_client)
+
+
+def _avg(total: float, count: int) -> float:
+    return round(total / count, 2) if count else 0
+
+
+def summarize_rollup(rows: Iterable[Dict[str, Any]], top_sources: int = 10) -> Dict[str, Any]:
+    """
+    Метрики новостей для админ-панели из строк rollup.
+
+    Returns:
+        {timeline, by_category, by_source, by_importance_band, by_credibility_band, total_news}
+    """
+    stats: Dict[str, Dict[str, List[float]]] = {
+        dimension: defaultdict(lambda: [0, 0.0, 0, 0.0, 0]) for dimension in DIMENSIONS
+    }
+    timeline: Dict[str, int] = defaultdict(int)
+
+    for row in rows:
+        dimension = row["dimension"]
+        if dimension not in stats:
+            continue
+        acc = stats[dimension][row["key"]]
+        acc[0] += row["news_count"]
+        acc[1] += row["importance_sum"]
+        acc[2] += row["importance_n"]
+        acc[3] += row["credibility_sum"]
+        acc[4] += row["credibility_n"]
+        # Каждая новость ровно в одной категории - timeline считаем по этому разрезу
+        if dimension == "category":
+            timeline[row["bucket_start"][:10]] += row["news_count"]
+
+    by_category = [
+        {
+            "category": key,
+            "count": acc[0],
+            "avg_importance": _avg(acc[1], acc[2]),
+            "avg_credibility": _avg(acc[3], acc[4]),
+        }
+        for key, acc in stats["category"].items()
+    ]
+    by_category.sort(key=lambda x: x["count"], reverse=True)
+
+    by_source = [
+        {"source": key, "count": acc[0], "avg_credibility": _avg(acc[3], acc[4])}
+        for key, acc in stats["source"].items()
+    ]
+    by_source.sort(key=lambda x: x["count"], reverse=True)
+
+    def bands(dimension: str) -> List[Dict[str, Any]]:
+        return [{"band": key, "count": acc[0]} for key, acc in sorted(stats[dimension].items())]
+
+    return {
+        "timeline": [{"date": date, "count": count} for date, count in sorted(timeline.items())],
+        "by_category": by_category,
+        "by_source": by_source[:top_sources],
+        "by_importance_band": bands("importance_band"),
+        "by_credibility_band": bands("credibility_band"),
+        "total_news": sum(acc[0] for acc in stats["category"].values()),
+    }
@@ -24,6 +24,7 @@ Architecture:
 
         # Sync methods
         def get_latest_news()
+        def iter_news_pages()
         def upsert_news()
         def get_latest_events()
         def upsert_event()
@@ -98,27 +99,36 @@ import asyncio
 import logging
 import time
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, Iterator, List, Dict, Optional
 from pathlib import Path
 import sys
 import threading
 from queue import Queue, Empty
 
 import httpx
-from supabase import create_client, create_async_client, Client, AsyncClient
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from ai_modules.credibility import evaluate_credibility  # noqa: E402
 from ai_modules.importance import evaluate_importance  # noqa: E402
+from ai_modules.news_graph import extract_news_terms  # noqa: E402
+from utils.auth.telegram_auth import invalidate_user_auth_cache  # noqa: E402
 from utils.system.dates import ensure_utc_iso  # noqa: E402
+from utils.system.lazy_import import lazy_from  # noqa: E402
 
 # from utils.system.cache import get_news_cache, cached  # noqa: E402
 from config.core.settings import SUPABASE_URL, SUPABASE_KEY  # noqa: E402
 
 logger = logging.getLogger("database.service")
 
+if TYPE_CHECKING:
+    from supabase import AsyncClient, Client
+
+# supabase загружается при создании первого клиента, а не при импорте сервиса
+create_client = lazy_from("supabase", "create_client")
+create_async_client = lazy_from("supabase", "create_async_client")
+
 
 class DatabaseService:
     """
@@ -142,8 +152,8 @@ class DatabaseService:
             async_mode: If True, initializes async client. If False, sync client.
         """
         self.async_mode = async_mode
-        self.sync_client: Optional[Client] = None
-        self.async_client: Optional[AsyncClient] = None
+        self.sync_client: Optional["Client"] = None
+        self.async_client: Optional["AsyncClient"] = None
 
         # Инициализируем pool если нужно
         self._ensure_pool_initialized()
@@ -167,14 +177,14 @@ class DatabaseService:
                             logger.warning(f"Failed to create sync client for pool: {e}")
                     DatabaseService._pool_initialized = True
 
-    def _get_from_pool(self) -> Optional[Client]:
+    def _get_from_pool(self) -> Optional["Client"]:
         """Получить клиент из pool"""
         try:
             return DatabaseService._sync_pool.get_nowait()
         except Empty:
             return None
 
-    def _return_to_pool(self, client: Client):
+    def _return_to_pool(self, client: "Client"):
         """Вернуть клиент в pool"""
         try:
             DatabaseService._sync_pool.put_nowait(client)
@@ -204,7 +214,7 @@ class DatabaseService:
             except Exception as e:
                 logger.error("❌ Failed to initialize Sync Supabase: %s", e)
 
-    def _create_sync_client(self) -> Client:
+    def _create_sync_client(self) -> "Client":
         """Создать новый sync клиент"""
         return create_client(SUPABASE_URL, SUPABASE_KEY)
 
@@ -226,7 +236,7 @@ class DatabaseService:
         except Exception as e:
             logger.error("❌ Failed to prepare Async Supabase: %s", e)
 
-    async def _get_async_client(self) -> AsyncClient:
+    async def _get_async_client(self) -> "AsyncClient":
         """Get or initialize async client."""
         if self.async_client is None:
             if not SUPABASE_URL or not SUPABASE_KEY:
@@ -346,6 +356,44 @@ class DatabaseService:
             logger.error("❌ Error retrieving news: %s", e)
             return []
 
+    def iter_news_pages(
+        self,
+        columns: str = "id, title, source, category, credibility, importance",
+        page_size: int = 1000,
+    ) -> Iterator[List[Dict]]:
+        """
+        Iterate over the whole news table page by page (sync version).
+
+        Keyset pagination by primary key: every page is ``id > last_id`` ordered
+        by ``id``, so the cost of a page does not grow with the table size as it
+        does with ``range(offset, ...)``, and rows inserted meanwhile do not shift
+        the pages. Pages are requested lazily, one at a time.
+
+        Args:
+            columns: Columns to select (must include ``id``)
+            page_size: Rows per request
+
+        Yields:
+            Lists of news dictionaries (raw rows, no formatted dates)
+        """
+        if not self.sync_client:
+            logger.warning("⚠️ Sync Supabase client not available")
+            return
+
+        last_id = None
+        while True:
+            query = self.sync_client.table("news").select(columns)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            query = query.order("id", desc=False).limit(page_size)
+
+            rows = self.safe_execute(query).data or []
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]["id"]
+
     def count_news(
         self,
         source: Optional[str] = None,
@@ -674,6 +722,8 @@ class DatabaseService:
                     "importance": enriched.get("importance"),
                     "created_at": datetime.now(timezone.utc).isoformat(),
                 }
+                # Термины для графа новостей извлекаются один раз при сохранении
+                row.update(extract_news_terms(row))
 
                 rows.append(row)
                 logger.debug("Prepared news row: %s", row)
@@ -783,6 +833,7 @@ class DatabaseService:
 
             query = self.sync_client.table("users").upsert(user_data)
             result = self.safe_execute(query)
+            invalidate_user_auth_cache(telegram_id)
 
             if result.data and len(result.data) > 0:
                 return result.data[0]
@@ -5,16 +5,23 @@ This module contains the main DigestAIService class that handles:
 - News digest generation with AI analysis
 - Fallback to simple format when OpenAI API is not available
 - Date formatting and news limiting (max 8 items)
+
+Independent preparation steps (events fetch, RAG examples, story context)
+run concurrently before the prompt is built. ``stream_digest`` streams the
+standard pipeline token by token for SSE clients.
 """
 
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+from collections import Counter
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+from digests.stream_sanitizer import StreamingDigestSanitizer, finalize_digest_html
 from models.news import NewsItem
 from utils.text.formatters import format_date
-from utils.ai.ai_client import ask_async
+from utils.ai.ai_client import ask_async, ask_stream_async
 from digests.prompts import get_prompt_for_category, PROMPTS as LEGACY_PROMPTS
 
 try:
@@ -76,6 +83,9 @@ class DigestConfig:
     use_story_memory: bool = True  # Enable historical context from news graph
     use_feedback_loop: bool = True  # Enable feedback-based improvements
 
+    # Multistage: если полный конвейер не успел за N секунд, используем быстрый черновик (None - выключено)
+    multistage_speculative_after_sec: Optional[float] = None
+
 
 class DigestAIService:
     """
@@ -172,32 +182,10 @@ class DigestAIService:
         logger.info(f"  • Feedback Loop: {self.config.use_feedback_loop}")
         logger.info(f"  • Events: {self.config.use_events}")
 
-        # Prepare news data for AI
-        news_data = []
-        for item in news_items:
-            news_data.append(
-                {
-                    "title": item.title,
-                    "content": item.content or "",
-                    "published_at": item.published_at_fmt if item.published_at else "Unknown",
-                    "source": item.source or "Unknown",
-                    "credibility": item.credibility or 0.0,
-                    "importance": item.importance or 0.0,
-                    "subcategory": item.subcategory,  # Добавляем подкатегорию
-                }
-            )
+        news_data, subcategory = self._prepare_news_data(news_items)
 
-        # Определить наиболее частую подкатегорию из новостей
-        subcategory = None
-        if news_data:
-            from collections import Counter
-
-            subcats = [item.get("subcategory") for item in news_data if item.get("subcategory")]
-            if subcats:
-                subcategory = Counter(subcats).most_common(1)[0][0]
-
-        # Получить события с учетом подкатегории
-        events = await self._fetch_relevant_events(news_items, category, subcategory)
+        # Получить события с учетом подкатегории (загрузка идёт параллельно с остальной подготовкой)
+        events_task = asyncio.ensure_future(self._fetch_relevant_events(news_items, category, subcategory))
 
         # Try multi-stage generation if enabled and available
         if self.config.use_multistage and MULTISTAGE_AVAILABLE:
@@ -208,9 +196,10 @@ class DigestAIService:
                     category=category,
                     subcategory=subcategory,
                     style=style,
-                    events=events,
+                    events=events_task,
                     use_reasoning=True,
                     use_rag=self.config.use_rag,
+                    speculative_after_sec=self.config.multistage_speculative_after_sec,
                 )
 
                 logger.info(
@@ -221,12 +210,136 @@ class DigestAIService:
             except Exception as e:
                 logger.warning(f"Multi-stage generation failed, falling back to standard: {e}")
 
+        prompt = await self._build_standard_prompt(
+            news_items, news_data, events_task, style, category, length, subcategory
+        )
+        max_tokens, timeout_seconds = self._get_generation_limits(length)
+
+        # Call OpenAI API with timeout
+        try:
+            response = await asyncio.wait_for(
+                ask_async(prompt=prompt, style=style, max_tokens=max_tokens), timeout=timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"OpenAI API timeout after {timeout_seconds} seconds for length={length}")
+            raise  # Re-raise the timeout error instead of using fallback
+
+        logger.info(f"AI response length: {len(response) if response else 0}")
+        logger.info(f"AI response preview: {response[:200] if response else 'EMPTY'}")
+
+        # Don't add fallback section - let AI handle it naturally
+        return self._postprocess_response(response, news_data)
+
+    async def stream_digest(
+        self,
+        news_items: List[NewsItem],
+        style: str = "analytical",
+        category: str = "all",
+        length: str = "medium",
+        subcategory: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream AI digest generation.
+
+        Uses the standard (single-prompt) pipeline with the streaming chat API.
+        Multi-stage generation is not streamable and is skipped here.
+
+        Yields:
+            ``{"type": "delta", "text": ...}`` - sanitized HTML fragments as tokens arrive;
+            ``{"type": "done", "text": ...}`` - final post-processed digest (the one to persist).
+        """
+        if not news_items:
+            yield {"type": "done", "text": self._build_empty_digest()}
+            return
+
+        limited_news = news_items[: self.config.max_items]
+
+        if not self._openai_available:
+            logger.info("OpenAI API not available, using fallback digest")
+            yield {"type": "done", "text": self._build_fallback_digest(limited_news)}
+            return
+
+        news_data, subcategory = self._prepare_news_data(limited_news)
+        events_task = asyncio.ensure_future(self._fetch_relevant_events(limited_news, category, subcategory))
+        prompt = await self._build_standard_prompt(
+            limited_news, news_data, events_task, style, category, length, subcategory
+        )
+        max_tokens, _ = self._get_generation_limits(length)
+
+        sanitizer = StreamingDigestSanitizer()
+        async for token in ask_stream_async(prompt=prompt, style=style, max_tokens=max_tokens):
+            text = sanitizer.feed(token)
+            if text:
+                yield {"type": "delta", "text": text}
+
+        tail = sanitizer.flush()
+        if tail:
+            yield {"type": "delta", "text": tail}
+
+        response = sanitizer.raw_text
+        logger.info(f"AI streamed response length: {len(response)}")
+        yield {"type": "done", "text": self._postprocess_response(response, news_data)}
+
+    def _prepare_news_data(self, news_items: List[NewsItem]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Prepare news data for AI and detect the most common subcategory."""
+        news_data = []
+        for item in news_items:
+            news_data.append(
+                {
+                    "title": item.title,
+                    "content": item.content or "",
+                    "published_at": item.published_at_fmt if item.published_at else "Unknown",
+                    "source": item.source or "Unknown",
+                    "credibility": item.credibility or 0.0,
+                    "importance": item.importance or 0.0,
+                    "subcategory": item.subcategory,  # Добавляем подкатегорию
+                }
+            )
+
+        # Определить наиболее частую подкатегорию из новостей
+        subcategory = None
+        subcats = [item.get("subcategory") for item in news_data if item.get("subcategory")]
+        if subcats:
+            subcategory = Counter(subcats).most_common(1)[0][0]
+
+        return news_data, subcategory
+
+    async def _build_standard_prompt(
+        self,
+        news_items: List[NewsItem],
+        news_data: List[Dict[str, Any]],
+        events_task: "asyncio.Future[List[Dict[str, Any]]]",
+        style: str,
+        category: str,
+        length: str,
+        subcategory: Optional[str],
+    ) -> str:
+        """Build single-prompt digest request; events, RAG and story context are fetched concurrently."""
+        # События, RAG примеры и исторический контекст независимы - получаем параллельно
+        events, rag_context, story_context = await asyncio.gather(
+            events_task,
+            asyncio.to_thread(self._get_rag_context, category, subcategory, style, news_items),
+            asyncio.to_thread(self._get_story_context, news_items, category),
+        )
+
         # Create prompt based on style and category
-        prompt = await self._create_prompt(news_data, events, style, category, length, subcategory, news_items)
+        prompt = await self._create_prompt(
+            news_data,
+            events,
+            style,
+            category,
+            length,
+            subcategory,
+            news_items,
+            rag_context=rag_context,
+            story_context=story_context,
+        )
         logger.info(f"Created prompt length: {len(prompt)}")
         logger.info(f"News data count: {len(news_data)}")
+        return prompt
 
-        # Calculate max_tokens and timeout based on length and multistage
+    def _get_generation_limits(self, length: str) -> Tuple[int, float]:
+        """Calculate max_tokens and timeout based on length and multistage."""
         max_tokens = self._get_max_tokens_for_length(length)
 
         # Увеличиваем таймауты для multistage генерации (5 этапов требуют больше времени)
@@ -238,61 +351,18 @@ class DigestAIService:
         logger.info(
             f"Using max_tokens={max_tokens}, timeout={timeout_seconds}s for length={length}, multistage={self.config.use_multistage}"
         )
+        return max_tokens, timeout_seconds
 
-        # Call OpenAI API with timeout
-        import asyncio
-
-        try:
-            response = await asyncio.wait_for(
-                ask_async(prompt=prompt, style=style, max_tokens=max_tokens), timeout=timeout_seconds
-            )
-        except asyncio.TimeoutError:
-            logger.error(f"OpenAI API timeout after {timeout_seconds} seconds for length={length}")
-            raise  # Re-raise the timeout error instead of using fallback
-
-        logger.info(f"AI response length: {len(response) if response else 0}")
-        logger.info(f"AI response preview: {response[:200] if response else 'EMPTY'}")
+    def _postprocess_response(self, response: str, news_data: List[Dict[str, Any]]) -> str:
+        """Quality check, JSON → HTML conversion and HTML container cleanup of a complete response."""
+        if not response:
+            return response
 
         # 🚨 ПРОВЕРКА КАЧЕСТВА: убираем "воду" и выдуманную информацию
-        if response:
-            response = self._check_and_clean_response(response, news_data)
-
-        # Process response - check if it's JSON and convert to HTML
-        if response:
-            # Import JSON formatter
-            from digests.json_formatter import format_json_digest_to_html, clean_json_from_text
-
-            # Check if response is JSON
-            if response.strip().startswith("{") and response.strip().endswith("}"):
-                logger.info("Converting JSON response to HTML")
-                response = format_json_digest_to_html(response)
-            else:
-                # Clean any JSON blocks from text
-                response = clean_json_from_text(response)
-
-            # Clean HTML containers if AI generated them despite instructions
-            import re
-
-            # Remove HTML document structure
-            response = re.sub(r"<!DOCTYPE[^>]*>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"<html[^>]*>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"</html>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"<head[^>]*>.*?</head>", "", response, flags=re.DOTALL | re.IGNORECASE)
-            response = re.sub(r"<body[^>]*>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"</body>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"<style[^>]*>.*?</style>", "", response, flags=re.DOTALL | re.IGNORECASE)
-            # Remove problematic containers
-            response = re.sub(r"<div[^>]*>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"</div>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"<p[^>]*>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"</p>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"<span[^>]*>", "", response, flags=re.IGNORECASE)
-            response = re.sub(r"</span>", "", response, flags=re.IGNORECASE)
-            response = response.strip()
-
-        # Don't add fallback section - let AI handle it naturally
+        response = self._check_and_clean_response(response, news_data)
 
-        return response
+        # Convert JSON to HTML, clean JSON blocks and HTML containers
+        return finalize_digest_html(response)
 
     async def _fetch_relevant_events(
         self, news_items: List[NewsItem], category: str, subcategory: Optional[str] = None
@@ -369,8 +439,15 @@ class DigestAIService:
         length: str = "medium",
         subcategory: Optional[str] = None,
         news_items: Optional[List[NewsItem]] = None,
+        rag_context: Optional[str] = None,
+        story_context: Optional[str] = None,
     ) -> str:
-        """Create AI prompt based on news data, style, category, events, and RAG examples."""
+        """
+        Create AI prompt based on news data, style, category, events, and RAG examples.
+
+        ``rag_context`` and ``story_context`` may be prefetched by the caller;
+        when omitted they are looked up here.
+        """
 
         # 🚨 ПРОВЕРКА КАЧЕСТВА: фильтруем только достоверные новости
         filtered_news = [
@@ -399,24 +476,14 @@ class DigestAIService:
         )
 
         # Добавляем RAG контекст если включен
-        rag_context = ""
-        if self.config.use_rag and RAG_SYSTEM_AVAILABLE and news_items:
-            try:
-                rag_context = get_rag_context(
-                    category=category,
-                    subcategory=subcategory,
-                    style=style,
-                    news_items=news_items,
-                    max_samples=3,  # Возвращаем к 3 для качества, но с кэшированием это быстро
-                )
-                if rag_context:
-                    # Разумное ограничение RAG контекста для баланса скорости/качества
-                    if len(rag_context) > 3000:  # Увеличиваем с 2000 до 3000 для качества
-                        rag_context = rag_context[:3000] + "..."
-                    news_text = rag_context + "\n\n" + news_text
-                    logger.info(f"Added RAG context: {len(rag_context)} characters")
-            except Exception as e:
-                logger.warning(f"Failed to add RAG context: {e}")
+        if rag_context is None:
+            rag_context = self._get_rag_context(category, subcategory, style, news_items)
+        if rag_context:
+            # Разумное ограничение RAG контекста для баланса скорости/качества
+            if len(rag_context) > 3000:  # Увеличиваем с 2000 до 3000 для качества
+                rag_context = rag_context[:3000] + "..."
+            news_text = rag_context + "\n\n" + news_text
+            logger.info(f"Added RAG context: {len(rag_context)} characters")
 
         # Добавляем персонализацию если включена (упрощенная версия для скорости)
         personalization_context = ""
@@ -471,32 +538,11 @@ class DigestAIService:
         )
 
         # Добавляем исторический контекст если включена функция story memory
-        story_context = ""
-        if self.config.use_story_memory and SUPER_JOURNALIST_V3_AVAILABLE and news_items:
-            try:
-                from database.db_models import supabase
-
-                if supabase:
-                    context_manager = StoryContextManager(supabase)
-                    story_context = context_manager.get_historical_context_for_digest(
-                        news_items=[
-                            {
-                                "id": item.get("id"),
-                                "title": item.get("title", ""),
-                                "content": item.get("content", ""),
-                                "importance": item.get("importance", 0.5),
-                                "category": category,
-                            }
-                            for item in news_items
-                        ],
-                        category=category,
-                        lookback_days=30,
-                    )
-                    if story_context:
-                        news_text = story_context + "\n\n" + news_text
-                        logger.info(f"Added historical context: {len(story_context)} characters")
-            except Exception as e:
-                logger.warning(f"Failed to add story context: {e}")
+        if story_context is None:
+            story_context = self._get_story_context(news_items, category)
+        if story_context:
+            news_text = story_context + "\n\n" + news_text
+            logger.info(f"Added historical context: {len(story_context)} characters")
 
         # Используем новую систему prompts_v2 если доступна и стиль поддерживается
         if PROMPTS_V2_AVAILABLE and personalized_style in STYLE_CARDS and category in CATEGORY_CARDS:
@@ -613,6 +659,61 @@ class DigestAIService:
         logger.info(f"Final prompt size: {len(final_prompt)} characters")
         return final_prompt
 
+    def _get_rag_context(
+        self, category: str, subcategory: Optional[str], style: str, news_items: Optional[List[NewsItem]]
+    ) -> str:
+        """Подобрать RAG примеры для промпта (синхронно)."""
+        if not (self.config.use_rag and RAG_SYSTEM_AVAILABLE and news_items):
+            return ""
+
+        try:
+            return (
+                get_rag_context(
+                    category=category,
+                    subcategory=subcategory,
+                    style=style,
+                    news_items=news_items,
+                    max_samples=3,  # Возвращаем к 3 для качества, но с кэшированием это быстро
+                )
+                or ""
+            )
+        except Exception as e:
+            logger.warning(f"Failed to add RAG context: {e}")
+            return ""
+
+    def _get_story_context(self, news_items: Optional[List[NewsItem]], category: str) -> str:
+        """Получить исторический контекст из графа новостей (синхронно, делает запросы к БД)."""
+        if not (self.config.use_story_memory and SUPER_JOURNALIST_V3_AVAILABLE and news_items):
+            return ""
+
+        try:
+            from database.db_models import supabase
+
+            if not supabase:
+                return ""
+
+            context_manager = StoryContextManager(supabase)
+            return (
+                context_manager.get_historical_context_for_digest(
+                    news_items=[
+                        {
+                            "id": item.id,
+                            "title": item.title or "",
+                            "content": item.content or "",
+                            "importance": item.importance if item.importance is not None else 0.5,
+                            "category": category,
+                        }
+                        for item in news_items
+                    ],
+                    category=category,
+                    lookback_days=30,
+                )
+                or ""
+            )
+        except Exception as e:
+            logger.warning(f"Failed to add story context: {e}")
+            return ""
+
     def _build_fallback_digest(self, news_items: List[NewsItem]) -> str:
         """
         Build simple digest without AI when OpenAI is not available.
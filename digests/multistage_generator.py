@@ -7,13 +7,20 @@ This module implements a 5-stage generation process:
 2. Outline creation
 3. Text generation
 4. Editing and refinement
+
+Stages run as a DAG (see ``digests.stage_graph``): events fetch, RAG sample
+selection and fact extraction from news don't wait for reasoning, and
+reasoning-dependent stages start as soon as their inputs are ready.
 """
 
+import asyncio
+import inspect
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union, Awaitable
 from datetime import datetime
 
+from digests.stage_graph import StageGraph
 from models.news import NewsItem
 from utils.ai.ai_client import ask_async
 
@@ -39,40 +46,50 @@ class MultiStageGenerator:
         category: str,
         subcategory: Optional[str] = None,
         style: str = "analytical",
-        events: Optional[List[Dict[str, Any]]] = None,
+        events: Optional[Union[List[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]]] = None,
         use_reasoning: bool = True,
         use_rag: bool = True,
+        speculative_after_sec: Optional[float] = None,
     ) -> Dict[str, Any]:
-        """Генерация через 5 этапов с Chain-of-Thought."""
+        """
+        Генерация через 5 этапов с Chain-of-Thought.
+
+        Args:
+            events: Список событий или awaitable (например, уже запущенная задача
+                загрузки событий) - тогда загрузка идёт параллельно с RAG
+            speculative_after_sec: Если задано, параллельно запускается быстрый
+                черновик (один вызов LLM без reasoning). Если полный конвейер не
+                успел за это время, возвращается первый готовый результат,
+                остальное отменяется.
+        """
 
         start_time = datetime.utcnow()
         logger.info(f"Starting multi-stage generation for {category}/{subcategory}")
 
-        # Stage 0: Chain-of-Thought reasoning
-        reasoning = None
-        if use_reasoning:
-            reasoning = await self._reason_about_news(news_items, category, subcategory, events, use_rag)
-            logger.info("Stage 0: Reasoning completed")
-
-        # Stage 1: Extract facts
-        facts = await self._extract_facts(news_items, events, reasoning)
-        logger.info(f"Stage 1: Extracted {len(facts)} facts")
+        if inspect.isawaitable(events) and not isinstance(events, asyncio.Future):
+            events = asyncio.ensure_future(events)
 
-        # Stage 2: Create outline
-        outline = await self._create_outline(facts, category, subcategory, reasoning)
-        logger.info("Stage 2: Outline created")
+        graph = self._build_graph(news_items, category, subcategory, style, events, use_reasoning, use_rag)
 
-        # Stage 3: Generate text
-        text = await self._generate_text(facts, outline, category, subcategory, style, reasoning)
-        logger.info("Stage 3: Text generated")
+        speculative = False
+        if speculative_after_sec is None:
+            results = await graph.run()
+        else:
+            results, speculative = await self._run_with_speculation(
+                graph, news_items, category, subcategory, style, events, speculative_after_sec
+            )
 
-        # Stage 4: Edit and refine
-        final_text = await self._edit_text(text, facts, outline, category, subcategory)
-        logger.info("Stage 4: Text refined")
+        final_text = results["edit"]
+        reasoning = results.get("reasoning")
+        facts = results.get("facts") or results.get("base_facts") or []
+        outline = results.get("outline")
 
         end_time = datetime.utcnow()
         duration = (end_time - start_time).total_seconds()
 
+        stage_timings = graph.timings_ms()
+        logger.info(f"Multi-stage timings (ms): {stage_timings}")
+
         return {
             "text": final_text,
             "reasoning": reasoning,
@@ -83,10 +100,166 @@ class MultiStageGenerator:
                 "facts_count": len(facts),
                 "word_count": len(final_text.split()),
                 "generation_time_sec": duration,
+                "stage_timings_ms": stage_timings,
+                "speculative": speculative,
             },
             "stage_logs": self.stage_logs,
         }
 
+    def _build_graph(
+        self,
+        news_items: List[NewsItem],
+        category: str,
+        subcategory: Optional[str],
+        style: str,
+        events: Optional[Union[List[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]]],
+        use_reasoning: bool,
+        use_rag: bool,
+    ) -> StageGraph:
+        """Собрать DAG этапов генерации."""
+
+        graph = StageGraph()
+        graph.stage("events", lambda: self._resolve_events(events))
+
+        if use_reasoning and use_rag and RAG_AVAILABLE:
+            graph.stage("rag", lambda: self._select_rag_context(category, subcategory, news_items), blocking=True)
+        else:
+            graph.stage("rag", lambda: "")
+
+        # Stage 1a: факты из новостей и событий не зависят от reasoning
+        graph.stage("base_facts", lambda events: self._extract_base_facts(news_items, events), ["events"])
+
+        # Stage 0: Chain-of-Thought reasoning
+        if use_reasoning:
+            graph.stage(
+                "reasoning",
+                lambda events, rag: self._reason_about_news(
+                    news_items, category, subcategory, events, use_rag, rag_context=rag
+                ),
+                ["events", "rag"],
+            )
+        else:
+            graph.stage("reasoning", lambda: None)
+
+        # Stage 1b: добавляем выводы reasoning к фактам
+        graph.stage(
+            "facts",
+            lambda base_facts, reasoning: self._add_reasoning_facts(base_facts, reasoning),
+            ["base_facts", "reasoning"],
+        )
+
+        # Stage 2-4
+        graph.stage(
+            "outline",
+            lambda facts, reasoning: self._create_outline(facts, category, subcategory, reasoning),
+            ["facts", "reasoning"],
+        )
+        graph.stage(
+            "text",
+            lambda facts, outline, reasoning: self._generate_text(
+                facts, outline, category, subcategory, style, reasoning
+            ),
+            ["facts", "outline", "reasoning"],
+        )
+        graph.stage(
+            "edit",
+            lambda text, facts, outline: self._edit_text(text, facts, outline, category, subcategory),
+            ["text", "facts", "outline"],
+        )
+        return graph
+
+    async def _run_with_speculation(
+        self,
+        graph: StageGraph,
+        news_items: List[NewsItem],
+        category: str,
+        subcategory: Optional[str],
+        style: str,
+        events: Optional[Union[List[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]]],
+        cutoff_sec: float,
+    ) -> tuple:
+        """
+        Запустить полный конвейер и быстрый черновик параллельно.
+
+        Returns:
+            (результаты этапов, использован ли черновик)
+        """
+        full_task = asyncio.ensure_future(graph.run())
+        draft_task = asyncio.ensure_future(self._speculative_draft(news_items, category, subcategory, style, events))
+
+        try:
+            await asyncio.wait({full_task}, timeout=cutoff_sec)
+            if not full_task.done():
+                logger.info(f"Multi-stage pipeline exceeded {cutoff_sec}s, racing with speculative draft")
+                await asyncio.wait({full_task, draft_task}, return_when=asyncio.FIRST_COMPLETED)
+                if not full_task.done() and draft_task.exception() is not None:
+                    # Черновик не удался - остаётся только полный конвейер
+                    await asyncio.wait({full_task})
+
+            if full_task.done() and full_task.exception() is None:
+                return full_task.result(), False
+
+            # Полный конвейер не успел или упал - используем черновик
+            await asyncio.wait({draft_task})
+
+            draft = draft_task.result()
+            logger.info("Using speculative draft")
+            return {"edit": draft["text"], "base_facts": draft["facts"], "outline": draft["outline"]}, True
+        finally:
+            for task in (full_task, draft_task):
+                if not task.done():
+                    task.cancel()
+
+    async def _speculative_draft(
+        self,
+        news_items: List[NewsItem],
+        category: str,
+        subcategory: Optional[str],
+        style: str,
+        events: Optional[Union[List[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]]],
+    ) -> Dict[str, Any]:
+        """Быстрый черновик: один вызов LLM по фактам без reasoning и редактуры."""
+
+        facts = await self._extract_base_facts(news_items, await self._resolve_events(events))
+        outline = self._fallback_outline(facts, category)
+        text = await self._generate_text(facts, outline, category, subcategory, style, None)
+        return {"text": text, "facts": facts, "outline": outline}
+
+    async def _resolve_events(
+        self, events: Optional[Union[List[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]]]
+    ) -> List[Dict[str, Any]]:
+        """Получить список событий (с ожиданием, если передана задача загрузки)."""
+        if inspect.isawaitable(events):
+            try:
+                events = await events
+            except Exception as e:
+                logger.warning(f"Failed to fetch events for multi-stage generation: {e}")
+                return []
+        return events or []
+
+    def _select_rag_context(self, category: str, subcategory: Optional[str], news_items: List[NewsItem]) -> str:
+        """Подобрать RAG примеры для этапа reasoning (синхронно, выполняется в потоке)."""
+        try:
+            rag_context = get_rag_context(
+                category=category,
+                subcategory=subcategory,
+                style="analytical",
+                news_items=news_items,
+                max_samples=2,  # Меньше для reasoning этапа
+            )
+            if rag_context:
+                rag_context = (
+                    "\n\n🎯 ПРИМЕРЫ ВЫСОКОКАЧЕСТВЕННЫХ ДАЙДЖЕСТОВ:\n"
+                    + rag_context.split("ПРИМЕРЫ ВЫСОКОКАЧЕСТВЕННЫХ ДАЙДЖЕСТОВ:")[-1]
+                    if "ПРИМЕРЫ ВЫСОКОКАЧЕСТВЕННЫХ ДАЙДЖЕСТОВ:" in rag_context
+                    else rag_context
+                )
+                logger.info(f"Added RAG context to reasoning: {len(rag_context)} chars")
+            return rag_context or ""
+        except Exception as e:
+            logger.warning(f"Failed to add RAG context to reasoning: {e}")
+            return ""
+
     async def _reason_about_news(
         self,
         news_items: List[NewsItem],
@@ -94,6 +267,7 @@ class MultiStageGenerator:
         subcategory: Optional[str],
         events: Optional[List[Dict[str, Any]]] = None,
         use_rag: bool = True,
+        rag_context: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Stage 0: Chain-of-Thought reasoning."""
 
@@ -109,27 +283,11 @@ class MultiStageGenerator:
 
         subcategory_context = f"/{subcategory}" if subcategory else ""
 
-        # Добавляем RAG контекст если доступен
-        rag_context = ""
-        if use_rag and RAG_AVAILABLE:
-            try:
-                rag_context = get_rag_context(
-                    category=category,
-                    subcategory=subcategory,
-                    style="analytical",
-                    news_items=news_items,
-                    max_samples=2,  # Меньше для reasoning этапа
-                )
-                if rag_context:
-                    rag_context = (
-                        "\n\n🎯 ПРИМЕРЫ ВЫСОКОКАЧЕСТВЕННЫХ ДАЙДЖЕСТОВ:\n"
-                        + rag_context.split("ПРИМЕРЫ ВЫСОКОКАЧЕСТВЕННЫХ ДАЙДЖЕСТОВ:")[-1]
-                        if "ПРИМЕРЫ ВЫСОКОКАЧЕСТВЕННЫХ ДАЙДЖЕСТОВ:" in rag_context
-                        else rag_context
-                    )
-                    logger.info(f"Added RAG context to reasoning: {len(rag_context)} chars")
-            except Exception as e:
-                logger.warning(f"Failed to add RAG context to reasoning: {e}")
+        # Добавляем RAG контекст если доступен (в DAG он подбирается заранее)
+        if rag_context is None:
+            rag_context = ""
+            if use_rag and RAG_AVAILABLE:
+                rag_context = self._select_rag_context(category, subcategory, news_items)
 
         prompt = f"""Проанализируй эти новости и подумай вслух.
 
@@ -193,6 +351,14 @@ class MultiStageGenerator:
     ) -> List[Dict[str, Any]]:
         """Stage 1: Extract key facts from news items."""
 
+        facts = await self._extract_base_facts(news_items, events)
+        return await self._add_reasoning_facts(facts, reasoning)
+
+    async def _extract_base_facts(
+        self, news_items: List[NewsItem], events: Optional[List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Stage 1a: Facts from news items and events (independent of reasoning)."""
+
         facts = []
 
         for item in news_items:
@@ -223,7 +389,15 @@ class MultiStageGenerator:
                 }
                 facts.append(fact)
 
-        # Add reasoning insights as facts
+        return facts
+
+    async def _add_reasoning_facts(
+        self, base_facts: List[Dict[str, Any]], reasoning: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Stage 1b: Add reasoning insights as facts."""
+
+        facts = list(base_facts)
+
         if reasoning and reasoning.get("context_links"):
             for link in reasoning["context_links"][:2]:
                 fact = {
@@ -295,8 +469,11 @@ class MultiStageGenerator:
         except Exception as e:
             logger.error(f"Outline creation failed: {e}")
 
-        # Fallback outline
-        outline = {
+        return self._fallback_outline(facts, category)
+
+    def _fallback_outline(self, facts: List[Dict[str, Any]], category: str) -> Dict[str, Any]:
+        """Fallback outline without LLM."""
+        return {
             "title": f"Дайджест {category}",
             "dek": "Обзор важных событий",
             "sections": [
@@ -310,8 +487,6 @@ class MultiStageGenerator:
             "conclusion": "События развиваются по текущему сценарию",
         }
 
-        return outline
-
     async def _generate_text(
         self,
         facts: List[Dict[str, Any]],
@@ -427,9 +602,10 @@ async def generate_multistage_digest(
     category: str,
     subcategory: Optional[str] = None,
     style: str = "analytical",
-    events: Optional[List[Dict[str, Any]]] = None,
+    events: Optional[Union[List[Dict[str, Any]], Awaitable[List[Dict[str, Any]]]]] = None,
     use_reasoning: bool = True,
     use_rag: bool = True,
+    speculative_after_sec: Optional[float] = None,
 ) -> Dict[str, Any]:
     """Generate digest using multi-stage approach."""
 
@@ -442,4 +618,5 @@ async def generate_multistage_digest(
         events=events,
         use_reasoning=use_reasoning,
         use_rag=use_rag,
+        speculative_after_sec=speculative_after_sec,
     )
@@ -2,17 +2,202 @@
 RAG (Retrieval-Augmented Generation) система для дайджестов.
 
 Использует примеры высококачественных дайджестов для улучшения генерации.
+
+Поиск идёт по индексу, который строится при загрузке примеров:
+- бакеты индексов по category / subcategory / style;
+- инвертированный индекс слов текста дайджеста;
+- статическая часть оценки (источник, длина) посчитана заранее.
+Оценка считается векторно (numpy), топ-k выбирается частичной сортировкой.
+Файл примеров перечитывается только при изменении mtime/размера, а дописанные
+в конец примеры добавляются в индекс без полной перестройки.
 """
 
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import os
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import re
-from collections import Counter
+from bisect import bisect_right
+from collections import Counter, defaultdict
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Бонусы за высококачественные источники (подстрока в названии источника)
+SOURCE_BONUS = {
+    "The Bell": 5.0,
+    "Bloomberg": 5.0,
+    "Reuters": 4.0,
+    "CoinDesk": 3.0,
+    "TechCrunch": 4.0,
+    "WSJ": 5.0,
+}
+
+CATEGORY_WEIGHT = 30.0
+SUBCATEGORY_WEIGHT = 25.0
+STYLE_WEIGHT = 20.0
+KEYWORD_WEIGHT = 5.0
+
+_WORD_RE = re.compile(r"\b\w+\b")
+_MAX_KEYWORD_CACHE = 4096
+
+
+def _static_score(sample: Dict[str, Any]) -> float:
+    """Часть оценки, не зависящая от запроса: источник и длина."""
+    score = 0.0
+
+    source = sample.get("source", "").lower()
+    for high_quality_source, bonus in SOURCE_BONUS.items():
+        if high_quality_source.lower() in source:
+            score += bonus
+            break
+
+    word_count = sample.get("word_count", 0)
+    if 300 <= word_count <= 800:  # Оптимальная длина
+        score += 10.0
+    elif 200 <= word_count < 300:
+        score += 5.0
+
+    return score
+
+
+def extract_news_keywords(news_items: Optional[List[Any]]) -> List[str]:
+    """Ключевые слова из заголовков новостей (повторы сохраняются - каждое вхождение даёт бонус)."""
+    keywords = []
+    for item in news_items or []:
+        if hasattr(item, "title") and item.title:
+            words = _WORD_RE.findall(item.title.lower())
+            keywords.extend([w for w in words if len(w) > 3])
+    return keywords
+
+
+class SampleIndex:
+    """
+    Индекс примеров дайджестов.
+
+    Ключевое слово совпадает с примером, если оно является подстрокой текста
+    дайджеста. Ключевые слова состоят только из символов ``\\w``, поэтому такое
+    вхождение всегда лежит внутри одного слова текста: достаточно найти слова
+    словаря, содержащие ключевое слово, и объединить их posting-листы.
+    Поиск слов выполняется одним проходом regex по склеенному словарю,
+    результат расширения кэшируется по ключевому слову.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._static: List[float] = []
+        self._buckets: Dict[str, Dict[Any, List[int]]] = {
+            "category": defaultdict(list),
+            "subcategory": defaultdict(list),
+            "style": defaultdict(list),
+        }
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._static_array = np.zeros(0)
+        self._bucket_arrays: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._keyword_cache: Dict[str, np.ndarray] = {}
+        self._vocab_blob: Optional[str] = None
+        self._vocab_words: List[str] = []
+        self._vocab_starts: List[int] = []
+
+    def add(self, samples: List[Dict[str, Any]]) -> None:
+        """Добавить примеры в конец индекса."""
+        for sample in samples:
+            idx = self.size
+            self.size += 1
+            self._static.append(_static_score(sample))
+            for field, buckets in self._buckets.items():
+                buckets[sample.get(field)].append(idx)
+            for word in set(_WORD_RE.findall((sample.get("digest") or "").lower())):
+                self._postings[word].append(idx)
+
+        self._static_array = np.asarray(self._static, dtype=np.float64)
+        self._bucket_arrays.clear()
+        self._keyword_cache.clear()
+        self._vocab_blob = None
+
+    def _bucket(self, field: str, value: Any) -> np.ndarray:
+        key = (field, value)
+        arr = self._bucket_arrays.get(key)
+        if arr is None:
+            arr = np.asarray(self._buckets[field].get(value, ()), dtype=np.intp)
+            self._bucket_arrays[key] = arr
+        return arr
+
+    def _words_containing(self, keyword: str) -> List[str]:
+        """Слова словаря, содержащие keyword как подстроку."""
+        if self._vocab_blob is None:
+            self._vocab_words = list(self._postings)
+            self._vocab_starts = []
+            offset = 0
+            for word in self._vocab_words:
+                self._vocab_starts.append(offset)
+                offset += len(word) + 1
+            self._vocab_blob = "\n".join(self._vocab_words)
+
+        found = []
+        last = -1
+        for match in re.finditer(re.escape(keyword), self._vocab_blob):
+            pos = bisect_right(self._vocab_starts, match.start()) - 1
+            if pos != last:
+                found.append(self._vocab_words[pos])
+                last = pos
+        return found
+
+    def _keyword_matches(self, keyword: str) -> np.ndarray:
+        """Индексы примеров, в тексте которых встречается keyword (как подстрока)."""
+        matches = self._keyword_cache.get(keyword)
+        if matches is None:
+            hit = set()
+            for word in self._words_containing(keyword):
+                hit.update(self._postings[word])
+            matches = np.fromiter(hit, dtype=np.intp, count=len(hit))
+            if len(self._keyword_cache) >= _MAX_KEYWORD_CACHE:
+                self._keyword_cache.clear()
+            self._keyword_cache[keyword] = matches
+        return matches
+
+    def score(
+        self,
+        category: str,
+        subcategory: Optional[str],
+        style: str,
+        keywords: List[str],
+    ) -> np.ndarray:
+        """Вектор оценок всех примеров (та же формула, что _calculate_relevance_score)."""
+        scores = self._static_array.copy()
+        scores[self._bucket("category", category)] += CATEGORY_WEIGHT
+        if subcategory:
+            scores[self._bucket("subcategory", subcategory)] += SUBCATEGORY_WEIGHT
+        scores[self._bucket("style", style)] += STYLE_WEIGHT
+
+        for keyword, count in Counter(k.lower() for k in keywords).items():
+            matches = self._keyword_matches(keyword)
+            if matches.size:
+                scores[matches] += KEYWORD_WEIGHT * count
+
+        return scores
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> List[int]:
+        """
+        Индексы k лучших примеров с оценкой > 0.
+
+        Порядок как у стабильной сортировки по убыванию: при равных оценках
+        раньше идёт пример с меньшим индексом.
+        """
+        if k <= 0 or scores.size == 0:
+            return []
+
+        positive = np.flatnonzero(scores > 0)
+        if positive.size > k:
+            threshold = -np.partition(-scores[positive], k - 1)[k - 1]
+            positive = positive[scores[positive] >= threshold]
+
+        order = np.argsort(-scores[positive], kind="stable")
+        return positive[order[:k]].tolist()
+
 
 class DigestRAGSystem:
     """RAG система для поиска релевантных примеров дайджестов."""
@@ -20,27 +205,62 @@ class DigestRAGSystem:
     def __init__(self, samples_file: str = "data/digest_training/samples.json"):
         self.samples_file = Path(samples_file)
         self.samples = []
+        self._index = SampleIndex()
+        self._file_signature: Optional[Tuple[int, int]] = None
         self._load_samples()
 
+    def _current_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.samples_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     def _load_samples(self):
-        """Загрузить примеры дайджестов."""
+        """Загрузить примеры дайджестов и построить индекс."""
+        signature = self._current_signature()
         try:
-            if self.samples_file.exists():
+            if signature is not None:
                 with open(self.samples_file, "r", encoding="utf-8") as f:
-                    self.samples = json.load(f)
+                    samples = json.load(f)
+                self._apply_samples(samples)
                 logger.info(f"Loaded {len(self.samples)} digest samples")
             else:
                 logger.warning(f"Samples file not found: {self.samples_file}")
-                self.samples = []
+                self._apply_samples([])
         except Exception as e:
             logger.error(f"Failed to load samples: {e}")
-            self.samples = []
+            self._apply_samples([])
+        self._file_signature = signature
+
+    def _apply_samples(self, samples: List[Dict[str, Any]]) -> None:
+        """Обновить примеры; если старые - префикс новых, дописать только хвост в индекс."""
+        old_count = len(self.samples)
+        if old_count and len(samples) >= old_count and samples[:old_count] == self.samples:
+            self._index.add(samples[old_count:])
+        else:
+            self._index = SampleIndex()
+            self._index.add(samples)
+        self.samples = samples
 
     def reload_samples(self):
         """Перезагрузить примеры из файла."""
         logger.info("Reloading samples from file...")
         self._load_samples()
 
+    def reload_if_changed(self) -> bool:
+        """
+        Перечитать файл примеров, только если изменились его mtime или размер.
+
+        Returns:
+            True если примеры были перезагружены
+        """
+        if self._current_signature() == self._file_signature:
+            return False
+        logger.info("Samples file changed, reloading...")
+        self._load_samples()
+        return True
+
     def _calculate_relevance_score(
         self,
         sample: Dict[str, Any],
@@ -49,49 +269,34 @@ class DigestRAGSystem:
         target_style: str = "analytical",
         news_keywords: List[str] = None,
     ) -> float:
-        """Вычислить релевантность примера к целевым параметрам."""
+        """
+        Вычислить релевантность одного примера к целевым параметрам.
+
+        Эталонная (поэлементная) формула; поиск использует векторную версию SampleIndex.score.
+        """
 
         score = 0.0
 
         # Совпадение категории (+30)
         if sample.get("category") == target_category:
-            score += 30.0
+            score += CATEGORY_WEIGHT
 
         # Совпадение подкатегории (+25)
         if target_subcategory and sample.get("subcategory") == target_subcategory:
-            score += 25.0
+            score += SUBCATEGORY_WEIGHT
 
         # Совпадение стиля (+20)
         if sample.get("style") == target_style:
-            score += 20.0
+            score += STYLE_WEIGHT
 
         # Анализ ключевых слов в новостях
         if news_keywords and sample.get("digest"):
             digest_text = sample["digest"].lower()
             keyword_matches = sum(1 for keyword in news_keywords if keyword.lower() in digest_text)
-            score += keyword_matches * 5.0
-
-        # Приоритет по источнику (высококачественные источники)
-        source_bonus = {
-            "The Bell": 5.0,
-            "Bloomberg": 5.0,
-            "Reuters": 4.0,
-            "CoinDesk": 3.0,
-            "TechCrunch": 4.0,
-            "WSJ": 5.0,
-        }
-        source = sample.get("source", "").lower()
-        for high_quality_source, bonus in source_bonus.items():
-            if high_quality_source.lower() in source:
-                score += bonus
-                break
+            score += keyword_matches * KEYWORD_WEIGHT
 
-        # Бонус за длину (более информативные дайджесты)
-        word_count = sample.get("word_count", 0)
-        if 300 <= word_count <= 800:  # Оптимальная длина
-            score += 10.0
-        elif 200 <= word_count < 300:
-            score += 5.0
+        # Приоритет по источнику и бонус за длину
+        score += _static_score(sample)
 
         return score
 
@@ -121,35 +326,12 @@ class DigestRAGSystem:
             logger.warning("No samples available for RAG")
             return []
 
-        # Извлечь ключевые слова из новостей
-        news_keywords = []
-        if news_items:
-            for item in news_items:
-                if hasattr(item, "title") and item.title:
-                    # Простое извлечение ключевых слов
-                    words = re.findall(r"\b\w+\b", item.title.lower())
-                    news_keywords.extend([w for w in words if len(w) > 3])
-
-        # Рассчитать релевантность для каждого примера
-        scored_samples = []
-
-        for sample in self.samples:
-            score = self._calculate_relevance_score(
-                sample=sample,
-                target_category=category,
-                target_subcategory=subcategory,
-                target_style=style,
-                news_keywords=news_keywords,
-            )
+        news_keywords = extract_news_keywords(news_items)
 
-            if score > 0:  # Только релевантные примеры
-                scored_samples.append({"sample": sample, "score": score})
-
-        # Сортировать по релевантности
-        scored_samples.sort(key=lambda x: x["score"], reverse=True)
-
-        # Вернуть топ примеры
-        result = scored_samples[:max_samples]
+        scores = self._index.score(category, subcategory, style, news_keywords)
+        result = [
+            {"sample": self.samples[idx], "score": float(scores[idx])} for idx in self._index.top_k(scores, max_samples)
+        ]
 
         if result:
             logger.info(
@@ -278,9 +460,9 @@ def get_rag_context(
     """Получить RAG контекст для промпта."""
 
     rag_system = _get_rag_system()
-    # Перезагружаем примеры только если файл изменился (TODO: добавить проверку mtime)
+    # Перезагружаем примеры только если файл изменился
     try:
-        rag_system.reload_samples()
+        rag_system.reload_if_changed()
     except Exception as e:
         logger.warning(f"RAG reload failed, using cached: {e}")
 
@@ -296,8 +478,8 @@ def get_style_recommendations(
 ) -> Dict[str, Any]:
     """Получить рекомендации по стилю на основе примеров."""
 
-    rag_system = DigestRAGSystem()
+    rag_system = _get_rag_system()
     # Перезагружаем примеры для получения актуальных данных
-    rag_system.reload_samples()
+    rag_system.reload_if_changed()
 
     return rag_system.get_style_guidance(category=category, subcategory=subcategory, style=style)
@@ -0,0 +1,132 @@
+"""
+Stage graph for digest generation.
+
+Runs generation stages as a DAG: every stage starts as soon as all of its
+dependencies are done, so independent work (events fetch, RAG sample
+selection, story context, fact extraction) runs concurrently.
+Per-stage timings are collected for logging and stats.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """Single node of the stage graph."""
+
+    name: str
+    func: Callable[..., Any]
+    depends_on: List[str] = field(default_factory=list)
+    blocking: bool = False  # Синхронная функция с I/O - выполняется в отдельном потоке
+
+
+class StageGraph:
+    """
+    Minimal async DAG runner.
+
+    Each stage function receives results of its dependencies as keyword
+    arguments (by stage name) and may be sync or async. Blocking sync stages
+    are moved to a worker thread so they don't stall the event loop.
+    """
+
+    def __init__(self, stages: Optional[Iterable[Stage]] = None):
+        self._stages: Dict[str, Stage] = {}
+        self.timings: Dict[str, float] = {}
+        for stage in stages or []:
+            self.add(stage)
+
+    def add(self, stage: Stage) -> "StageGraph":
+        """Add stage to the graph."""
+        if stage.name in self._stages:
+            raise ValueError(f"Stage '{stage.name}' already registered")
+        self._stages[stage.name] = stage
+        return self
+
+    def stage(
+        self, name: str, func: Callable[..., Any], depends_on: Optional[List[str]] = None, blocking: bool = False
+    ) -> "StageGraph":
+        """Shortcut for ``add(Stage(...))``."""
+        return self.add(Stage(name=name, func=func, depends_on=list(depends_on or []), blocking=blocking))
+
+    def _validate(self) -> None:
+        for stage in self._stages.values():
+            for dep in stage.depends_on:
+                if dep not in self._stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+        # Проверка на циклы (DFS)
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected at stage '{name}'")
+            visiting.add(name)
+            for dep in self._stages[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self._stages:
+            visit(name)
+
+    async def _run_stage(self, stage: Stage, deps: Dict[str, Awaitable[Any]]) -> Any:
+        kwargs = {}
+        for dep_name, dep_task in deps.items():
+            kwargs[dep_name] = await dep_task
+
+        started = time.perf_counter()
+        try:
+            if stage.blocking:
+                result = await asyncio.to_thread(stage.func, **kwargs)
+            else:
+                result = stage.func(**kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+            return result
+        finally:
+            self.timings[stage.name] = time.perf_counter() - started
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Execute all stages.
+
+        Returns:
+            Dict {stage name: result}
+
+        Raises:
+            Exception of the first failed stage; remaining stages are cancelled.
+        """
+        self._validate()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        def schedule(name: str) -> asyncio.Task:
+            if name not in tasks:
+                stage = self._stages[name]
+                deps = {dep: schedule(dep) for dep in stage.depends_on}
+                tasks[name] = asyncio.ensure_future(self._run_stage(stage, deps))
+            return tasks[name]
+
+        for name in self._stages:
+            schedule(name)
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def timings_ms(self) -> Dict[str, float]:
+        """Per-stage timings in milliseconds."""
+        return {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
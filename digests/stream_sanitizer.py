@@ -0,0 +1,149 @@
+"""
+Очистка HTML ответа AI для дайджестов - целиком и потоково.
+
+- ``strip_html_containers``: удаляет структуру HTML документа и контейнеры
+  (<html>, <head>, <body>, <style>, <div>, <p>, <span>), которые модель
+  иногда генерирует вопреки инструкциям.
+- ``finalize_digest_html``: финальная обработка полного ответа
+  (JSON → HTML, очистка JSON блоков, удаление контейнеров).
+- ``StreamingDigestSanitizer``: инкрементальная версия для потока токенов -
+  отдаёт безопасный для показа текст, придерживая незакрытые теги.
+"""
+
+import re
+from typing import List, Pattern
+
+from digests.json_formatter import clean_json_from_text, format_json_digest_to_html
+
+# Порядок важен: повторяет исторический порядок замен в DigestAIService
+_CONTAINER_PATTERNS: List[Pattern] = [
+    re.compile(r"<!DOCTYPE[^>]*>", re.IGNORECASE),
+    re.compile(r"<html[^>]*>", re.IGNORECASE),
+    re.compile(r"</html>", re.IGNORECASE),
+    re.compile(r"<head[^>]*>.*?</head>", re.DOTALL | re.IGNORECASE),
+    re.compile(r"<body[^>]*>", re.IGNORECASE),
+    re.compile(r"</body>", re.IGNORECASE),
+    re.compile(r"<style[^>]*>.*?</style>", re.DOTALL | re.IGNORECASE),
+    re.compile(r"<div[^>]*>", re.IGNORECASE),
+    re.compile(r"</div>", re.IGNORECASE),
+    re.compile(r"<p[^>]*>", re.IGNORECASE),
+    re.compile(r"</p>", re.IGNORECASE),
+    re.compile(r"<span[^>]*>", re.IGNORECASE),
+    re.compile(r"</span>", re.IGNORECASE),
+]
+
+# Блоки, которые удаляются вместе с содержимым - в потоке их нужно дождаться целиком
+_BLOCK_OPEN_RE = re.compile(r"<(head|style)\b", re.IGNORECASE)
+
+
+def strip_html_containers(text: str) -> str:
+    """Удалить HTML структуру документа и контейнеры (без strip)."""
+    for pattern in _CONTAINER_PATTERNS:
+        text = pattern.sub("", text)
+    return text
+
+
+def _looks_like_json(text: str) -> bool:
+    stripped = text.strip()
+    return stripped.startswith("{") and stripped.endswith("}")
+
+
+def finalize_digest_html(response: str) -> str:
+    """
+    Финальная обработка полного ответа AI.
+
+    Args:
+        response: Ответ модели (HTML, текст или JSON)
+
+    Returns:
+        Очищенный HTML дайджеста
+    """
+    if not response:
+        return response
+
+    if _looks_like_json(response):
+        response = format_json_digest_to_html(response)
+    else:
+        response = clean_json_from_text(response)
+
+    return strip_html_containers(response).strip()
+
+
+class StreamingDigestSanitizer:
+    """
+    Инкрементальный санитайзер потока токенов.
+
+    ``feed()`` возвращает часть текста, которую уже безопасно показать:
+    незакрытый тег (``<div cla``) и незакрытые блоки ``<head>``/``<style>``
+    придерживаются до следующих фрагментов. Если ответ начинается как JSON
+    или ```` ``` ````-блок, он буферизуется целиком и форматируется в ``flush()``.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._raw: List[str] = []
+        self._mode = None  # None - ещё не определён, "html" или "json"
+        self._started = False
+
+    @property
+    def raw_text(self) -> str:
+        """Полный необработанный текст, полученный к текущему моменту."""
+        return "".join(self._raw)
+
+    def feed(self, chunk: str) -> str:
+        """Добавить фрагмент, вернуть готовый к показу текст (может быть пустым)."""
+        if not chunk:
+            return ""
+
+        self._raw.append(chunk)
+        self._pending += chunk
+
+        if self._mode is None:
+            head = self._pending.lstrip()
+            if not head:
+                return ""
+            if head.startswith("{") or head.startswith("```"):
+                self._mode = "json"
+            elif len(head) < 3 and "```".startswith(head[:3]):
+                return ""  # Ждём, не начало ли это ```-блока
+            else:
+                self._mode = "html"
+
+        if self._mode == "json":
+            return ""
+
+        cut = self._safe_cut(self._pending)
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return self._emit(strip_html_containers(ready))
+
+    def flush(self) -> str:
+        """Завершить поток и вернуть оставшийся текст."""
+        if self._mode == "json":
+            rest = finalize_digest_html(self._pending)
+        else:
+            rest = strip_html_containers(self._pending)
+        self._pending = ""
+        return self._emit(rest).rstrip()
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            if text:
+                self._started = True
+        return text
+
+    @staticmethod
+    def _safe_cut(text: str) -> int:
+        """Позиция, до которой текст можно обрабатывать без риска разрезать тег или блок."""
+        cut = len(text)
+
+        last_open = text.rfind("<")
+        if last_open != -1 and text.rfind(">") < last_open:
+            cut = last_open
+
+        for match in _BLOCK_OPEN_RE.finditer(text, 0, cut):
+            closing = re.compile(rf"</{match.group(1)}>", re.IGNORECASE)
+            if not closing.search(text, match.end()):
+                return match.start()
+
+        return cut
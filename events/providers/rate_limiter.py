@@ -97,6 +97,51 @@ class RateLimiter:
         }
 
 
+class TokenBucket:
+    """
+    Token bucket with reservations for concurrent senders.
+
+    Unlike RateLimiter, the lock is held only to reserve a slot: callers sleep
+    outside of it, so many coroutines can wait for their slots at once while
+    the long-run rate stays at ``rate`` and short bursts at most ``burst``.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Initialize token bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity (default: one second worth of tokens)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(burst) if burst is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens (the balance may go negative) and return how long to wait."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until ``tokens`` are available."""
+        async with self._lock:
+            wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def get_info(self) -> Dict[str, float]:
+        """Get token bucket information."""
+        return {"rate_per_second": self.rate, "burst": self.capacity}
+
+
 # Predefined rate limiters for common APIs
 RATE_LIMITERS = {
     # Sports